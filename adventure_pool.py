@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import re
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from pydantic import BaseModel, Field
+from config import config_from_env
+from core import generate_initial_state_async
+from story_generation import generate_adventure
+
+logger = logging.getLogger(__name__)
+
+_STOPWORDS = {"a", "an", "the", "of", "in", "on", "with", "and", "adventure", "story", "game", "quest", "about"}
+
+
+def normalize_prompt(text: str) -> str:
+    # "Space Pirates!", "the space pirates adventure" and "pirates in space" all map to "pirates space"
+    tokens = re.findall(r"[a-z0-9]+", text.lower())
+    return " ".join(sorted(set(tokens) - _STOPWORDS))
+
+
+class AdventurePoolConfig(BaseModel):
+    enabled: bool = False
+    themes: List[str] = Field(default_factory=lambda: ["Space pirates", "Medieval fantasy", "Cyberpunk detective"])
+    low_watermark: int = 1  # refill a theme when it has fewer ready adventures than this
+    high_watermark: int = 2  # and fill it back up to this many
+    max_concurrency: int = 2  # background generations running at once
+    max_interactive_inflight: int = 4  # pause refills while this many player requests are generating
+    refill_interval: float = 5.0
+
+    @classmethod
+    def from_env(cls) -> "AdventurePoolConfig":
+        return config_from_env(cls, "ADVENTURE_POOL", switch="ADVENTURE_POOL")
+
+
+class PreparedAdventure(BaseModel):
+    theme: str
+    adventure: Dict[str, Any]
+    adventure_usage: Tuple[int, int, int, int]
+    initial_state: Optional[Tuple[Any, int, int, int, int, float]] = None  # generate_initial_state_async result
+
+
+class AdventurePool:
+    def __init__(self, config: Optional[AdventurePoolConfig] = None):
+        self.config = config or AdventurePoolConfig.from_env()
+        self._ready: Dict[str, Deque[PreparedAdventure]] = {normalize_prompt(theme): deque() for theme in self.config.themes}
+        self._themes = {normalize_prompt(theme): theme for theme in self.config.themes}
+        self._filling: Dict[str, int] = {key: 0 for key in self._ready}
+        self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._fill_tasks = set()
+        self.interactive_inflight = 0
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+        self.failures = 0
+        self.duplicates = 0
+
+    def take(self, prompt: str) -> Optional[PreparedAdventure]:
+        ready = self._ready.get(normalize_prompt(prompt))
+        if ready:
+            self.hits += 1
+            return ready.popleft()
+        self.misses += 1
+        return None
+
+    @contextmanager
+    def interactive(self):
+        # wrap player-facing generations so background refills back off while they run
+        self.interactive_inflight += 1
+        try:
+            yield
+        finally:
+            self.interactive_inflight -= 1
+
+    def start(self):
+        if self.config.enabled and self._task is None:
+            self._task = asyncio.create_task(self._refill_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._fill_tasks):
+            task.cancel()
+
+    async def _refill_loop(self):
+        while True:
+            if self.interactive_inflight < self.config.max_interactive_inflight:
+                for key, ready in self._ready.items():
+                    if len(ready) + self._filling[key] < self.config.low_watermark:
+                        for _ in range(self.config.high_watermark - len(ready) - self._filling[key]):
+                            self._filling[key] += 1
+                            task = asyncio.create_task(self._fill(key))
+                            self._fill_tasks.add(task)
+                            task.add_done_callback(self._fill_tasks.discard)
+            await asyncio.sleep(self.config.refill_interval)
+
+    async def _fill(self, key: str):
+        theme = self._themes[key]
+        try:
+            async with self._semaphore:
+                # re-check once we get a slot: players may have started generating in the meantime
+                while self.interactive_inflight >= self.config.max_interactive_inflight:
+                    await asyncio.sleep(self.config.refill_interval)
+                # Same theme every time: name what is already in the pool and vary the request per slot,
+                # or a temperature-0 model writes the same adventure again
+                titles = [prepared.adventure.get("title", "") for prepared in self._ready[key]]
+                adventure, *adventure_usage = await generate_adventure(theme, avoid=titles, variation=uuid.uuid4().hex[:8])
+                if adventure is None:
+                    self.failures += 1
+                    return
+                if adventure.get("title") in [prepared.adventure.get("title") for prepared in self._ready[key]]:
+                    self.duplicates += 1
+                    logger.info(f"Adventure pool: dropped a second '{adventure.get('title')}' for theme '{theme}'")
+                    return
+                initial_state = await generate_initial_state_async(adventure)
+                self._ready[key].append(PreparedAdventure(
+                    theme=theme,
+                    adventure=adventure,
+                    adventure_usage=tuple(adventure_usage),
+                    initial_state=initial_state if initial_state[0] is not None else None,
+                ))
+                self.generated += 1
+                logger.info(f"Adventure pool: prepared '{adventure.get('title')}' for theme '{theme}'")
+        except Exception as e:
+            self.failures += 1
+            logger.error(f"Adventure pool refill failed for theme '{theme}': {str(e)}")
+        finally:
+            self._filling[key] -= 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "ready": sum(len(ready) for ready in self._ready.values()),
+            "hits": self.hits,
+            "misses": self.misses,
+            "generated": self.generated,
+            "failures": self.failures,
+            "duplicates": self.duplicates,
+        }
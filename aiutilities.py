@@ -1,8 +1,12 @@
 import os
 import time
+import asyncio
+import threading
+from functools import lru_cache
+import httpx
 from dotenv import load_dotenv
 from pydantic import BaseModel, Field
-from typing import Literal, Optional, Union, Dict, Any, List, Iterable
+from typing import Literal, Optional, Union, Dict, Any, List, Iterable, AsyncIterator
 from openai.types.chat import ChatCompletionMessageParam, ChatCompletionToolParam
 from openai.types.chat import ChatCompletionToolChoiceOptionParam
 from openai.types.chat import completion_create_params
@@ -12,8 +16,8 @@ from typing import List as TypeList
 from openai.types.shared_params import ResponseFormatText, ResponseFormatJSONObject
 
 #import together
-from openai import OpenAI, AzureOpenAI
-from anthropic import Anthropic
+from openai import OpenAI, AzureOpenAI, AsyncOpenAI
+from anthropic import Anthropic, AsyncAnthropic
 from anthropic.types import MessageParam, TextBlockParam, ModelParam
 from anthropic.types.beta.prompt_caching.prompt_caching_beta_cache_control_ephemeral_param import PromptCachingBetaCacheControlEphemeralParam
 from anthropic.types.beta.prompt_caching.prompt_caching_beta_text_block_param import PromptCachingBetaTextBlockParam
@@ -36,6 +40,14 @@ from openai.types.chat.completion_create_params import ResponseFormat
 from openai.types.shared_params import FunctionDefinition
 
 from anthropic.types import ToolParam
+from partial_json import PartialJSONObjectParser
+from config import config_from_env
+from response_cache import ResponseCache, ResponseCacheConfig, canonical_key
+import metrics
+from cassette import Cassette, CassetteConfig, cassette_key
+from resilience import Resilience
+from anthropic.types.beta.prompt_caching import PromptCachingBetaMessage
+from openai.types.chat import ChatCompletionMessage
 
 class LLMConfig(BaseModel):
     client: Literal["openai", "azure_openai", "anthropic", "vllm"]
@@ -44,9 +56,92 @@ class LLMConfig(BaseModel):
     temperature: float = 0
     response_format: Literal["json", "text","json_object"] = "text"
     json_schema: Optional[Dict[str, Any]] = None
+    use_response_cache: bool = True  # only applies to deterministic (temperature 0) requests
+    stage: str = "other"  # metrics label only, never sent to the provider
+    # Resilience, see resilience.Resilience; none of these are sent to the provider either
+    deadline: Optional[float] = None  # seconds for the whole call, retries and hedges included
+    max_retries: int = 2
+    retry_backoff: float = 0.5  # first backoff in seconds, doubled per retry and jittered
+    retry_backoff_max: float = 8.0
+    hedge: bool = False  # async calls only
+    hedge_after: Optional[float] = None  # seconds before the duplicate request, None for the stage's observed p95
+
+class PoolConfig(BaseModel):
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0  # idle connections are evicted after this many seconds
+    connect_timeout: float = 10.0
+    timeout: float = 120.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return config_from_env(cls, "LLM_POOL")
+
+class ConnectionStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clients_created = 0
+        self.connections_created = 0
+        self.connections_reused = 0
+
+    def record_request(self, new_connection: bool):
+        with self._lock:
+            if new_connection:
+                self.connections_created += 1
+            else:
+                self.connections_reused += 1
+        metrics.llm_http_requests.inc("new" if new_connection else "reused")
+
+    def record_client(self):
+        with self._lock:
+            self.clients_created += 1
+        metrics.llm_http_clients.inc()
+
+    def as_dict(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "clients_created": self.clients_created,
+                "connections_created": self.connections_created,
+                "connections_reused": self.connections_reused,
+            }
+
+class _CountingTransport(httpx.HTTPTransport):
+    # httpcore only emits connect_tcp trace events when the pool has to open a new connection
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        opened = []
+
+        def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                opened.append(True)
+
+        request.extensions["trace"] = trace
+        response = super().handle_request(request)
+        self._stats.record_request(bool(opened))
+        return response
+
+class _CountingAsyncTransport(httpx.AsyncHTTPTransport):
+    def __init__(self, stats: ConnectionStats, **kwargs):
+        super().__init__(**kwargs)
+        self._stats = stats
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        opened = []
+
+        async def trace(event_name: str, info: Dict[str, Any]):
+            if event_name == "connection.connect_tcp.complete":
+                opened.append(True)
+
+        request.extensions["trace"] = trace
+        response = await super().handle_async_request(request)
+        self._stats.record_request(bool(opened))
+        return response
 
 class AIUtilities:
-    def __init__(self):
+    def __init__(self, pool_config: Optional[PoolConfig] = None):
         load_dotenv()  # Load environment variables from .env file
         
         # openai credentials
@@ -55,6 +150,187 @@ class AIUtilities:
         # anthropic credentials
         self.anthropic_api_key = os.getenv("ANTHROPIC_API_KEY")
         self.anthropic_model = os.getenv("ANTHROPIC_MODEL")
+        self.anthropic_base_url = os.getenv("ANTHROPIC_BASE_URL")
+
+        # long-lived per-provider clients sharing keep-alive connection pools
+        self.pool_config = pool_config or PoolConfig.from_env()
+        self.connection_stats = ConnectionStats()
+        self._clients: Dict[str, Any] = {}
+        self._async_clients: Dict[str, Any] = {}
+        self._clients_lock = threading.Lock()
+
+        # content-addressed cache for deterministic completions, disable with RESPONSE_CACHE=0
+        self.response_cache = ResponseCache(ResponseCacheConfig.from_env()) if os.getenv("RESPONSE_CACHE", "1") == "1" else None
+
+        # record/replay of every completion, see CASSETTE_MODE; replays never build a client or open a connection
+        cassette_config = CassetteConfig.from_env()
+        self.cassette = Cassette(cassette_config) if cassette_config.mode != "off" else None
+
+        # deadlines, retries and hedging; the clients are built with max_retries=0 so the SDK doesn't retry underneath
+        self.resilience = Resilience()
+
+    @staticmethod
+    def _to_cassette(result) -> Dict[str, Any]:
+        if isinstance(result, PromptCachingBetaMessage):
+            return {"type": "anthropic", "response": result.model_dump(mode="json")}
+        if isinstance(result, ChatCompletionMessage):
+            return {"type": "openai", "response": result.model_dump(mode="json")}
+        return {"type": "text", "response": result}  # plain completions and error strings
+
+    @staticmethod
+    def _from_cassette(entry: Dict[str, Any]):
+        if entry["type"] == "anthropic":
+            return PromptCachingBetaMessage.model_validate(entry["response"])
+        if entry["type"] == "openai":
+            return ChatCompletionMessage.model_validate(entry["response"])
+        return entry["response"]
+
+    def _replayed(self, key: str, llm_config: LLMConfig) -> Optional[Dict[str, Any]]:
+        entry = self.cassette.replay(key)
+        if entry is not None:
+            metrics.llm_requests.inc(llm_config.stage, llm_config.model or "unknown", "cassette")
+        return entry
+
+    def _with_cassette(self, call: str, prompt, tools, llm_config: LLMConfig, run):
+        if self.cassette is None:
+            return run()
+        key = cassette_key(call, prompt, tools, llm_config)
+        if self.cassette.replaying:
+            entry = self._replayed(key, llm_config)
+            if entry is None:
+                return f"Cassette miss: no recorded {call} call for request {key[:16]}"
+            time.sleep(self.cassette.delay(entry))
+            return self._from_cassette(entry)
+        start_time = time.perf_counter()
+        result = run()
+        self.cassette.record(key, call, llm_config, self._to_cassette(result), time.perf_counter() - start_time)
+        return result
+
+    async def _with_cassette_async(self, call: str, prompt, tools, llm_config: LLMConfig, run):
+        if self.cassette is None:
+            return await run()
+        key = cassette_key(call, prompt, tools, llm_config)
+        if self.cassette.replaying:
+            entry = self._replayed(key, llm_config)
+            if entry is None:
+                return f"Cassette miss: no recorded {call} call for request {key[:16]}"
+            await asyncio.sleep(self.cassette.delay(entry))
+            return self._from_cassette(entry)
+        start_time = time.perf_counter()
+        result = await run()
+        self.cassette.record(key, call, llm_config, self._to_cassette(result), time.perf_counter() - start_time)
+        return result
+
+    def _response_cache_key(self, provider: str, completion_kwargs: Dict[str, Any], llm_config: LLMConfig) -> Optional[str]:
+        if self.response_cache is None or not llm_config.use_response_cache or llm_config.temperature != 0:
+            return None
+        return canonical_key(provider, completion_kwargs)
+
+    def _cached_response(self, key: Optional[str], provider: str):
+        if key is None:
+            return None
+        return self._parse_cached(self.response_cache.get(key), provider)
+
+    async def _cached_response_async(self, key: Optional[str], provider: str):
+        # Disk lookups run in a worker thread, off the event loop
+        if key is None:
+            return None
+        return self._parse_cached(await self.response_cache.get_async(key), provider)
+
+    def _parse_cached(self, data: Optional[Dict[str, Any]], provider: str):
+        if data is None:
+            return None
+        if provider == "anthropic":
+            return PromptCachingBetaMessage.model_validate(data)
+        return ChatCompletionMessage.model_validate(data)
+
+    def _store_response(self, key: Optional[str], response):
+        if key is not None and not isinstance(response, str):
+            self.response_cache.set(key, response.model_dump(mode="json"))
+
+    def _pool_limits(self) -> httpx.Limits:
+        config = self.pool_config
+        return httpx.Limits(
+            max_connections=config.max_connections,
+            max_keepalive_connections=config.max_keepalive_connections,
+            keepalive_expiry=config.keepalive_expiry,
+        )
+
+    def _pool_timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.pool_config.timeout, connect=self.pool_config.connect_timeout)
+
+    def _create_http_client(self) -> httpx.Client:
+        return httpx.Client(
+            transport=_CountingTransport(self.connection_stats, limits=self._pool_limits()),
+            timeout=self._pool_timeout(),
+        )
+
+    def _create_async_http_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            transport=_CountingAsyncTransport(self.connection_stats, limits=self._pool_limits()),
+            timeout=self._pool_timeout(),
+        )
+
+    def get_client(self, provider: Literal["openai", "anthropic"]) -> Union[OpenAI, Anthropic]:
+        client = self._clients.get(provider)
+        if client is not None:
+            return client
+        with self._clients_lock:
+            client = self._clients.get(provider)
+            if client is None:
+                if provider == "openai":
+                    client = OpenAI(api_key=self.openai_key, http_client=self._create_http_client(), max_retries=0)
+                elif provider == "anthropic":
+                    client = Anthropic(
+                        api_key=self.anthropic_api_key,
+                        base_url=self.anthropic_base_url,
+                        http_client=self._create_http_client(),
+                        max_retries=0,
+                    )
+                else:
+                    raise ValueError(f"Unknown provider: {provider}")
+                self._clients[provider] = client
+                self.connection_stats.record_client()
+        return client
+
+    def get_async_client(self, provider: Literal["openai", "anthropic"]) -> Union[AsyncOpenAI, AsyncAnthropic]:
+        client = self._async_clients.get(provider)
+        if client is not None:
+            return client
+        with self._clients_lock:
+            client = self._async_clients.get(provider)
+            if client is None:
+                if provider == "openai":
+                    client = AsyncOpenAI(api_key=self.openai_key, http_client=self._create_async_http_client(), max_retries=0)
+                elif provider == "anthropic":
+                    client = AsyncAnthropic(
+                        api_key=self.anthropic_api_key,
+                        base_url=self.anthropic_base_url,
+                        http_client=self._create_async_http_client(),
+                        max_retries=0,
+                    )
+                else:
+                    raise ValueError(f"Unknown provider: {provider}")
+                self._async_clients[provider] = client
+                self.connection_stats.record_client()
+        return client
+
+    def close(self):
+        with self._clients_lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
+        if self.response_cache is not None:
+            self.response_cache.close()
+        if self.cassette is not None:
+            self.cassette.close()
+
+    async def aclose(self):
+        with self._clients_lock:
+            clients = list(self._async_clients.values())
+            self._async_clients.clear()
+        for client in clients:
+            await client.close()
 
 
 
@@ -95,6 +371,7 @@ class AIUtilities:
             elif isinstance(content, list):
                 content = [
                     PromptCachingBetaTextBlockParam(type="text", text=block) if isinstance(block, str)
+                    else PromptCachingBetaTextBlockParam(type="text", text=block["text"], cache_control=PromptCachingBetaCacheControlEphemeralParam(type="ephemeral")) if "cache_control" in block
                     else PromptCachingBetaTextBlockParam(type="text", text=block["text"]) for block in content
                 ]
             else:
@@ -117,19 +394,22 @@ class AIUtilities:
     def run_ai_completion(self, prompt: Union[str, List[Dict[str, Any]]], llm_config: LLMConfig):
         if isinstance(prompt, str):
             prompt = [{"role": "user", "content": prompt}]
+        return self._with_cassette("completion", prompt, None, llm_config, lambda: self._run_ai_completion(prompt, llm_config))
+
+    def _run_ai_completion(self, prompt: List[Dict[str, Any]], llm_config: LLMConfig):
         oai_messages = self.msg_dict_to_oai(prompt)
         
         
         if llm_config.client == "openai":
             assert self.openai_key is not None, "OpenAI API key is not set"
-            client = OpenAI(api_key=self.openai_key)
+            client = self.get_client("openai")
             print(oai_messages)
             return self.run_openai_completion(client, oai_messages, llm_config)
         
         
         elif llm_config.client == "anthropic":
             assert self.anthropic_api_key is not None, "Anthropic API key is not set"
-            anthropic = Anthropic(api_key=self.anthropic_api_key)
+            anthropic = self.get_client("anthropic")
             return self.run_anthropic_completion(anthropic, prompt, llm_config)
         
         
@@ -146,6 +426,40 @@ class AIUtilities:
         else:
             return "Invalid AI vendor"
         
+    def prepare_tools(
+        self,
+        tools: Optional[Union[List[Dict[str, Any]], List[ToolParam]]],
+        llm_config: LLMConfig
+    ) -> Optional[Union[List[ChatCompletionToolParam], List[ToolParam]]]:
+        if tools is None:
+            return None
+        if llm_config.client == "openai":
+            openai_tools = []
+            for tool in tools:
+                assert isinstance(tool, dict) and "function" in tool, "Invalid tool type for OpenAI"
+                function = tool["function"]
+                openai_tools.append(ChatCompletionToolParam(
+                    type="function",
+                    function=FunctionDefinition(
+                        name=function["name"],
+                        description=function.get("description", ""),
+                        parameters=function["parameters"]
+                    )
+                ))
+            return openai_tools
+        elif llm_config.client == "anthropic":
+            assert isinstance(tools, list) and all(isinstance(tool, dict) and "input_schema" in tool for tool in tools), "Invalid tool type for Anthropic"
+            anthropic_tools = []
+            for tool in tools:
+                anthropic_tools.append(ToolParam(
+                    name=str(tool["name"]),
+                    description=str(tool.get("description", "")),
+                    input_schema=tool["input_schema"]
+                ))
+            return anthropic_tools
+        else:
+            raise ValueError("Unsupported client for tool completion")
+
     def run_ai_tool_completion(
         self,
         prompt: List[Dict[str, Any]],
@@ -153,127 +467,300 @@ class AIUtilities:
         llm_config: LLMConfig = LLMConfig(client="openai"),
         tool_choice: Union[ChatCompletionToolChoiceOptionParam, NotGiven] = NotGiven()
     ):
+        return self._with_cassette("tool", prompt, [tools, tool_choice], llm_config, lambda: self._run_ai_tool_completion(prompt, tools, llm_config, tool_choice))
+
+    def _run_ai_tool_completion(self, prompt, tools, llm_config: LLMConfig, tool_choice):
+        prepared_tools = self.prepare_tools(tools, llm_config)
         if llm_config.client == "openai":
-            if tools is not None:
-                openai_tools = []
-                for tool in tools:
-                    assert isinstance(tool, dict) and "function" in tool, "Invalid tool type for OpenAI"
-                    function = tool["function"]
-                    openai_tools.append(ChatCompletionToolParam(
-                        type="function",
-                        function=FunctionDefinition(
-                            name=function["name"],
-                            description=function.get("description", ""),
-                            parameters=function["parameters"]
-                        )
-                    ))
-            else:
-                openai_tools = None
-            return self.run_openai_tool_completion(prompt, openai_tools, llm_config, tool_choice)
+            return self.run_openai_tool_completion(prompt, prepared_tools, llm_config, tool_choice)
         elif llm_config.client == "anthropic":
-            if tools is not None:
-                assert isinstance(tools, list) and all(isinstance(tool, dict) and "input_schema" in tool for tool in tools), "Invalid tool type for Anthropic"
-                anthropic_tools = []
-                for tool in tools:
-                    anthropic_tools.append(ToolParam(
-                        name=str(tool["name"]),
-                        description=str(tool.get("description", "")),
-                        input_schema=tool["input_schema"]
-                    ))
-            else:
-                anthropic_tools = None
-            return self.run_anthropic_tool_completion(prompt, anthropic_tools, llm_config)
+            return self.run_anthropic_tool_completion(prompt, prepared_tools, llm_config)
         else:
             raise ValueError("Unsupported client for tool completion")
 
-    def run_openai_tool_completion(
+    async def run_ai_tool_completion_async(
+        self,
+        prompt: List[Dict[str, Any]],
+        tools: Optional[Union[List[Dict[str, Any]], List[ToolParam]]] = None,
+        llm_config: LLMConfig = LLMConfig(client="openai"),
+        tool_choice: Union[ChatCompletionToolChoiceOptionParam, NotGiven] = NotGiven()
+    ):
+        return await self._with_cassette_async("tool", prompt, [tools, tool_choice], llm_config, lambda: self._run_ai_tool_completion_async(prompt, tools, llm_config, tool_choice))
+
+    async def _run_ai_tool_completion_async(self, prompt, tools, llm_config: LLMConfig, tool_choice):
+        prepared_tools = self.prepare_tools(tools, llm_config)
+        if llm_config.client == "openai":
+            return await self.run_openai_tool_completion_async(prompt, prepared_tools, llm_config, tool_choice)
+        elif llm_config.client == "anthropic":
+            return await self.run_anthropic_tool_completion_async(prompt, prepared_tools, llm_config)
+        else:
+            raise ValueError("Unsupported client for tool completion")
+
+    def build_openai_tool_kwargs(
         self,
         prompt: List[Dict[str, Any]],
         tools: Optional[List[ChatCompletionToolParam]],
         llm_config: LLMConfig,
         tool_choice: Union[ChatCompletionToolChoiceOptionParam, NotGiven]
-    ):
+    ) -> Dict[str, Any]:
         oai_messages = self.msg_dict_to_oai(prompt)
-        client = OpenAI(api_key=self.openai_key)
         model = llm_config.model or self.openai_model
-        
-        try:
-            assert model is not None, "Model is not set"
+        assert model is not None, "Model is not set"
+
+        completion_kwargs = {
+            "model": model,
+            "messages": oai_messages,
+            "max_tokens": llm_config.max_tokens,
+            "temperature": llm_config.temperature,
+        }
+
+        if tools is not None:
+            completion_kwargs["tools"] = tools
+            if not isinstance(tool_choice, NotGiven):
+                completion_kwargs["tool_choice"] = tool_choice
+        elif llm_config.json_schema is not None:
+            function_name = "generate_structured_output"
+            function_description = "Generate a structured output based on the provided JSON schema."
+            function_def = self.create_function_definition(function_name, llm_config.json_schema, function_description)
             
-            completion_kwargs = {
-                "model": model,
-                "messages": oai_messages,
-                "max_tokens": llm_config.max_tokens,
-                "temperature": llm_config.temperature,
-            }
+            tool = ChatCompletionToolParam(type="function", function=function_def)
+            completion_kwargs["tools"] = [tool]
+            completion_kwargs["tool_choice"] = {"type": "function", "function": {"name": function_name}}
 
-            if tools is not None:
-                completion_kwargs["tools"] = tools
-                if not isinstance(tool_choice, NotGiven):
-                    completion_kwargs["tool_choice"] = tool_choice
-            elif llm_config.json_schema is not None:
-                function_name = "generate_structured_output"
-                function_description = "Generate a structured output based on the provided JSON schema."
-                function_def = self.create_function_definition(function_name, llm_config.json_schema, function_description)
-                
-                tool = ChatCompletionToolParam(type="function", function=function_def)
-                completion_kwargs["tools"] = [tool]
-                completion_kwargs["tool_choice"] = {"type": "function", "function": {"name": function_name}}
+        if llm_config.response_format != "text":
+            completion_kwargs["response_format"] = self.convert_response_format(llm_config.response_format)
+        return completion_kwargs
 
-            if llm_config.response_format != "text":
-                completion_kwargs["response_format"] = self.convert_response_format(llm_config.response_format)
-
-            response = client.chat.completions.create(**completion_kwargs)
+    def run_openai_tool_completion(
+        self,
+        prompt: List[Dict[str, Any]],
+        tools: Optional[List[ChatCompletionToolParam]],
+        llm_config: LLMConfig,
+        tool_choice: Union[ChatCompletionToolChoiceOptionParam, NotGiven]
+    ):
+        client = self.get_client("openai")
+        try:
+            completion_kwargs = self.build_openai_tool_kwargs(prompt, tools, llm_config, tool_choice)
+            cache_key = self._response_cache_key("openai", completion_kwargs, llm_config)
+            cached = self._cached_response(cache_key, "openai")
+            if cached is not None:
+                metrics.observe_response_cache(llm_config.stage, completion_kwargs["model"])
+                return cached
+            start_time = time.perf_counter()
+            response = self.resilience.call(lambda options: client.chat.completions.create(**completion_kwargs, **options), llm_config, completion_kwargs["model"])
+            metrics.observe_llm(llm_config.stage, completion_kwargs["model"], time.perf_counter() - start_time, response.usage)
             completion = response.choices[0].message
             print(completion)
+            self._store_response(cache_key, completion)
             return completion
         except Exception as e:
+            metrics.observe_llm_error(llm_config.stage, llm_config.model or self.openai_model)
             return str(e)
 
-    def run_anthropic_tool_completion(
+    async def run_openai_tool_completion_async(
+        self,
+        prompt: List[Dict[str, Any]],
+        tools: Optional[List[ChatCompletionToolParam]],
+        llm_config: LLMConfig,
+        tool_choice: Union[ChatCompletionToolChoiceOptionParam, NotGiven]
+    ):
+        client = self.get_async_client("openai")
+        try:
+            completion_kwargs = self.build_openai_tool_kwargs(prompt, tools, llm_config, tool_choice)
+            cache_key = self._response_cache_key("openai", completion_kwargs, llm_config)
+            cached = await self._cached_response_async(cache_key, "openai")
+            if cached is not None:
+                metrics.observe_response_cache(llm_config.stage, completion_kwargs["model"])
+                return cached
+            start_time = time.perf_counter()
+            response = await self.resilience.call_async(lambda options: client.chat.completions.create(**completion_kwargs, **options), llm_config, completion_kwargs["model"])
+            metrics.observe_llm(llm_config.stage, completion_kwargs["model"], time.perf_counter() - start_time, response.usage)
+            completion = response.choices[0].message
+            self._store_response(cache_key, completion)
+            return completion
+        except Exception as e:
+            metrics.observe_llm_error(llm_config.stage, llm_config.model or self.openai_model)
+            return str(e)
+
+    def build_anthropic_tool_kwargs(
         self,
         prompt: List[Dict[str, Any]],
         tools: Optional[List[ToolParam]],
         llm_config: LLMConfig
-    ):  
+    ) -> Dict[str, Any]:
         system_content = self.create_anthropic_system_message(prompt)
         #check if hte last message is a assistant and remove it
         if prompt[-1]["role"] == "assistant":
             prompt = prompt[:-1]
         anthropic_messages = self.msg_dict_to_anthropic(prompt)
-        client = Anthropic(api_key=self.anthropic_api_key)
         model = llm_config.model or self.anthropic_model
+        assert model is not None, "Model is not set"
+        
+        completion_kwargs = {
+            "model": model,
+            "messages": anthropic_messages,
+            "max_tokens": llm_config.max_tokens,
+            "temperature": llm_config.temperature,
+        }
+
+        if tools is not None:
+            completion_kwargs["tools"] = tools
+        elif llm_config.json_schema is not None:
+            function_name = "generate_structured_output"
+            function_description = "Generate a structured output based on the provided JSON schema."
+            tool = ToolParam(
+                name=function_name,
+                description=function_description,
+                input_schema=llm_config.json_schema,
+            )
+            completion_kwargs["tools"] = [tool]
+            completion_kwargs["tool_choice"] =  ToolChoiceToolChoiceTool(name= function_name, type="tool")
+            completion_kwargs["system"] = system_content
+        return completion_kwargs
 
+    def run_anthropic_tool_completion(
+        self,
+        prompt: List[Dict[str, Any]],
+        tools: Optional[List[ToolParam]],
+        llm_config: LLMConfig
+    ):  
+        client = self.get_client("anthropic")
         try:
-            assert model is not None, "Model is not set"
-            
-            completion_kwargs = {
-                "model": model,
-                "messages": anthropic_messages,
-                "max_tokens": llm_config.max_tokens,
-                "temperature": llm_config.temperature,
-            }
-
-            if tools is not None:
-                completion_kwargs["tools"] = tools
-            elif llm_config.json_schema is not None:
-                function_name = "generate_structured_output"
-                function_description = "Generate a structured output based on the provided JSON schema."
-                tool = ToolParam(
-                    name=function_name,
-                    description=function_description,
-                    input_schema=llm_config.json_schema,
-                )
-                completion_kwargs["tools"] = [tool]
-                completion_kwargs["tool_choice"] =  ToolChoiceToolChoiceTool(name= function_name, type="tool")
-                completion_kwargs["system"] = system_content
-
+            completion_kwargs = self.build_anthropic_tool_kwargs(prompt, tools, llm_config)
+            cache_key = self._response_cache_key("anthropic", completion_kwargs, llm_config)
+            cached = self._cached_response(cache_key, "anthropic")
+            if cached is not None:
+                metrics.observe_response_cache(llm_config.stage, completion_kwargs["model"])
+                return cached
+            start_time = time.perf_counter()
+            response = self.resilience.call(lambda options: client.beta.prompt_caching.messages.create(**completion_kwargs, **options), llm_config, completion_kwargs["model"])
+            metrics.observe_llm(llm_config.stage, completion_kwargs["model"], time.perf_counter() - start_time, response.usage)
+            self._store_response(cache_key, response)
+            return response
+        except Exception as e:
+            metrics.observe_llm_error(llm_config.stage, llm_config.model or self.anthropic_model)
+            return str(e)
 
-            response = client.beta.prompt_caching.messages.create(**completion_kwargs)
+    async def run_anthropic_tool_completion_async(
+        self,
+        prompt: List[Dict[str, Any]],
+        tools: Optional[List[ToolParam]],
+        llm_config: LLMConfig
+    ):
+        client = self.get_async_client("anthropic")
+        try:
+            completion_kwargs = self.build_anthropic_tool_kwargs(prompt, tools, llm_config)
+            cache_key = self._response_cache_key("anthropic", completion_kwargs, llm_config)
+            cached = await self._cached_response_async(cache_key, "anthropic")
+            if cached is not None:
+                metrics.observe_response_cache(llm_config.stage, completion_kwargs["model"])
+                return cached
+            start_time = time.perf_counter()
+            response = await self.resilience.call_async(lambda options: client.beta.prompt_caching.messages.create(**completion_kwargs, **options), llm_config, completion_kwargs["model"])
+            metrics.observe_llm(llm_config.stage, completion_kwargs["model"], time.perf_counter() - start_time, response.usage)
+            self._store_response(cache_key, response)
             return response
         except Exception as e:
+            metrics.observe_llm_error(llm_config.stage, llm_config.model or self.anthropic_model)
             return str(e)
 
+    async def stream_ai_tool_completion_async(
+        self,
+        prompt: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]] = None,
+        llm_config: LLMConfig = LLMConfig(client="anthropic")
+    ) -> AsyncIterator[Dict[str, Any]]:
+        # Yields {"type": "field", "name", "value"} for every top-level tool input field as soon as it is complete,
+        # then a single {"type": "message"} with the final message (usage included), or {"type": "error"}.
+        if llm_config.client != "anthropic":
+            raise ValueError("Streaming tool completion is only supported for anthropic")
+        if self.cassette is None:
+            async for event in self._stream_ai_tool_completion_async(prompt, tools, llm_config):
+                yield event
+            return
+        # Same key as run_ai_tool_completion_async, so plain and streamed recordings replay each other
+        key = cassette_key("tool", prompt, [tools, NotGiven()], llm_config)
+        if self.cassette.replaying:
+            entry = self._replayed(key, llm_config)
+            if entry is None:
+                yield {"type": "error", "error": f"Cassette miss: no recorded tool call for request {key[:16]}"}
+                return
+            first_field_delay = self.cassette.delay(entry, "first_field_latency") if "first_field_latency" in entry else 0.0
+            await asyncio.sleep(first_field_delay)
+            result = self._from_cassette(entry)
+            if isinstance(result, str):
+                yield {"type": "error", "error": result}
+                return
+            for block in result.content:
+                if block.type == "tool_use":
+                    for name, value in block.input.items():
+                        yield {"type": "field", "name": name, "value": value}
+            await asyncio.sleep(max(0.0, self.cassette.delay(entry) - first_field_delay))
+            yield {"type": "message", "message": result}
+            return
+        start_time = time.perf_counter()
+        first_field_latency = None
+        async for event in self._stream_ai_tool_completion_async(prompt, tools, llm_config):
+            if event["type"] == "field" and first_field_latency is None:
+                first_field_latency = time.perf_counter() - start_time
+            elif event["type"] in ("message", "error"):
+                result = event["message"] if event["type"] == "message" else event["error"]
+                self.cassette.record(key, "tool", llm_config, self._to_cassette(result), time.perf_counter() - start_time, first_field_latency)
+            yield event
+
+    async def _stream_ai_tool_completion_async(
+        self,
+        prompt: List[Dict[str, Any]],
+        tools: Optional[List[Dict[str, Any]]],
+        llm_config: LLMConfig
+    ) -> AsyncIterator[Dict[str, Any]]:
+        prepared_tools = self.prepare_tools(tools, llm_config)
+        client = self.get_async_client("anthropic")
+        try:
+            completion_kwargs = self.build_anthropic_tool_kwargs(prompt, prepared_tools, llm_config)
+            cache_key = self._response_cache_key("anthropic", completion_kwargs, llm_config)
+            message = await self._cached_response_async(cache_key, "anthropic")
+            if message is not None:
+                metrics.observe_response_cache(llm_config.stage, completion_kwargs["model"])
+                for block in message.content:
+                    if block.type == "tool_use":
+                        for name, value in block.input.items():
+                            yield {"type": "field", "name": name, "value": value}
+                yield {"type": "message", "message": message}
+                return
+            start_time = time.perf_counter()
+            first_field = True
+            # Retried like any other call until the first field is out; after that a retry would repeat fields
+            deadline = self.resilience.deadline(llm_config)
+            retries = 0
+            while True:
+                options = self.resilience.request_options(deadline, llm_config)
+                parser = PartialJSONObjectParser()
+                try:
+                    async with client.beta.prompt_caching.messages.stream(**completion_kwargs, **options) as stream:
+                        async for event in stream:
+                            if event.type == "content_block_delta" and event.delta.type == "input_json_delta":
+                                for name, value in parser.feed(event.delta.partial_json).items():
+                                    if first_field:
+                                        first_field = False
+                                        metrics.llm_first_field.observe(time.perf_counter() - start_time, llm_config.stage, completion_kwargs["model"])
+                                    yield {"type": "field", "name": name, "value": value}
+                        message = await stream.get_final_message()
+                    break
+                except Exception as e:
+                    self.resilience.check_deadline(deadline, llm_config)
+                    delay = None if not first_field else self.resilience.retry_delay(e, retries, llm_config, completion_kwargs["model"], deadline)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    retries += 1
+            metrics.observe_llm(llm_config.stage, completion_kwargs["model"], time.perf_counter() - start_time, message.usage)
+            self._store_response(cache_key, message)
+            yield {"type": "message", "message": message}
+        except Exception as e:
+            metrics.observe_llm_error(llm_config.stage, llm_config.model or self.anthropic_model)
+            yield {"type": "error", "error": str(e) or type(e).__name__}
+
     def create_function_definition(self, name: str, json_schema: Dict[str, Any], description: str) -> FunctionDefinition:
         # Ensure additionalProperties is set to false in the schema
         if "additionalProperties" not in json_schema:
@@ -315,7 +802,7 @@ class AIUtilities:
                     else:
                         completion_kwargs["messages"].insert(0, {"role": "system", "content": schema_instruction})
 
-            response: ChatCompletion = client.chat.completions.create(**completion_kwargs)
+            response: ChatCompletion = self.resilience.call(lambda options: client.chat.completions.create(**completion_kwargs, **options), llm_config, completion_kwargs["model"])
             return response.choices[0].message.content
         except Exception as e:
             return f"Error: {str(e)}"
@@ -372,12 +859,18 @@ class AIUtilities:
                 completion_kwargs["tool_choice"] = ToolChoiceToolChoiceTool(name=function_name, type="tool")
 
 
-            response = anthropic.beta.prompt_caching.messages.create(**completion_kwargs)
+            response = self.resilience.call(lambda options: anthropic.beta.prompt_caching.messages.create(**completion_kwargs, **options), llm_config, model)
             return response
         except Exception as e:
             return str(e)
 
 
+@lru_cache(maxsize=None)
+def get_shared_ai_utilities() -> AIUtilities:
+    # one process-wide instance so every module reuses the same connection pools
+    return AIUtilities()
+
+
 def main():
     load_dotenv()  # Load environment variables from .env file
 
@@ -0,0 +1,250 @@
+"""Turn-pipeline benchmark against a local mock of the Anthropic API.
+
+Micro stages time the app's own code on canned data: response parsing, state construction, prompt assembly
+and rendering. They report wall time, throughput and allocations, measured with tracemalloc in a separate pass.
+End-to-end stages drive generate_adventure, generate_initial_state_async and the battlemap update (plain and
+streamed) through AIUtilities and the real SDK client against benchmarks/mock_llm_server.py. Their latency
+minus the mock's configured latency is the local overhead of a call. Results are JSON. Save one run with
+--output and pass it to --compare on a later commit.
+
+Run from the repository root:
+    python benchmarks/bench_pipeline.py --output baseline.json
+    python benchmarks/bench_pipeline.py --compare baseline.json
+"""
+import argparse
+import asyncio
+import gc
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from mock_llm_server import ADVENTURE, INITIAL_MAP, MockLLMServer, canned_input  # noqa: E402
+
+ACTION = "search the area"  # never resolved locally, so every turn reaches the model
+
+
+def measure(fn: Callable[[], object], ops: int) -> Dict[str, float]:
+    for _ in range(min(ops, 50)):
+        fn()
+    start = time.perf_counter()
+    for _ in range(ops):
+        fn()
+    elapsed = time.perf_counter() - start
+
+    # Allocations in their own pass, tracemalloc slows everything down
+    alloc_ops = max(1, ops // 10)
+    gc.collect()
+    tracemalloc.start()
+    tracemalloc.reset_peak()
+    before, _ = tracemalloc.get_traced_memory()
+    for _ in range(alloc_ops):
+        fn()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        "ops": ops,
+        "total_s": round(elapsed, 4),
+        "us_per_op": round(elapsed / ops * 1e6, 2),
+        "ops_per_s": round(ops / elapsed, 1),
+        "peak_bytes": peak - before,
+        "retained_bytes_per_op": round((current - before) / alloc_ops, 1),
+    }
+
+
+def latency_summary(samples: List[float], mock_latency: float) -> Dict[str, float]:
+    samples = sorted(samples)
+    p50 = statistics.median(samples)
+    return {
+        "calls": len(samples),
+        "p50_ms": round(p50 * 1000, 2),
+        "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+        "max_ms": round(samples[-1] * 1000, 2),
+        "overhead_ms": round((p50 - mock_latency) * 1000, 2),
+    }
+
+
+def micro_stages(history: int, ops: int) -> Dict[str, Dict[str, float]]:
+    from anthropic.types.beta.prompt_caching import PromptCachingBetaMessage
+    from fasthtml.common import to_xml
+    import core
+    import main as app
+    from partial_json import PartialJSONObjectParser
+
+    state = core._build_initial_state(ADVENTURE, {"battlemap": INITIAL_MAP, "player_pos": [2, 3], "initial_description": "Start."})
+    for turn in range(history):
+        state = core._apply_battlemap_update(state, f"{ACTION} {turn}", canned_input({"messages": [{"content": f"Player position: {state.player_pos}"}]}, turn + 1, 0))
+    update = canned_input({"messages": [{"content": f"Player position: {state.player_pos}"}]}, 1, 0)
+    message = {
+        "id": "msg_bench", "type": "message", "role": "assistant", "model": core.BATTLEMAP_MODEL,
+        "content": [{"type": "tool_use", "id": "toolu_bench", "name": "generate_structured_output", "input": update}],
+        "stop_reason": "tool_use", "stop_sequence": None,
+        "usage": {"input_tokens": 400, "output_tokens": 90, "cache_creation_input_tokens": 0, "cache_read_input_tokens": 2500},
+    }
+    raw = json.dumps(message, ensure_ascii=False)
+    partial = json.dumps(update, ensure_ascii=False)
+    chunks = [partial[i:i + 24] for i in range(0, len(partial), 24)]
+    next_state = core._apply_battlemap_update(state, ACTION, update)
+    previous, snapshot = state.snapshot(history, (400, 90, 0, 2500), 1.0), next_state.snapshot(history + 1, (400, 90, 0, 2500), 1.0)
+
+    def parse_stream():
+        parser = PartialJSONObjectParser()
+        for chunk in chunks:
+            parser.feed(chunk)
+
+    def assemble_prompt():
+        prompt, llm_config = core._battlemap_update_request(state, ACTION)
+        return core.ai_utilities.build_anthropic_tool_kwargs(prompt, None, llm_config)
+
+    stages = {
+        "parse_response": lambda: core._extract_tool_input(PromptCachingBetaMessage.model_validate_json(raw)),
+        "parse_stream": parse_stream,
+        "build_initial_state": lambda: core._build_initial_state(ADVENTURE, {"battlemap": INITIAL_MAP, "player_pos": [2, 3], "initial_description": "Start."}),
+        "apply_update": lambda: core._apply_battlemap_update(state, ACTION, update),
+        "assemble_prompt": assemble_prompt,
+        "render_map": lambda: to_xml(app.render_map(snapshot.battlemap, snapshot.player_pos)),
+        "render_step": lambda: to_xml(app.render_step(snapshot)),
+        "render_map_patch": lambda: to_xml(app.render_map_patch(previous, snapshot)),
+    }
+    return {name: measure(fn, ops) for name, fn in stages.items()}
+
+
+async def e2e_stages(turns: int, concurrency: int, mock_latency: float) -> Dict[str, Dict[str, float]]:
+    import core
+    from story_generation import generate_adventure
+
+    async def timed(coro_factory, calls: int):
+        samples, result = [], None
+        for _ in range(calls):
+            start = time.perf_counter()
+            result = await coro_factory()
+            samples.append(time.perf_counter() - start)
+        return samples, result
+
+    results = {}
+    samples, _ = await timed(lambda: generate_adventure("benchmark"), max(3, turns // 10))
+    results["adventure"] = latency_summary(samples, mock_latency)
+    samples, initial = await timed(lambda: core.generate_initial_state_async(ADVENTURE), max(3, turns // 10))
+    results["initial_state"] = latency_summary(samples, mock_latency)
+    if initial[0] is None:
+        raise RuntimeError("The mock server did not produce an initial state")
+
+    state, samples = initial[0], []
+    for _ in range(turns):
+        start = time.perf_counter()
+        new_state = (await core.update_battlemap_with_ai_async(state, ACTION))[0]
+        samples.append(time.perf_counter() - start)
+        if new_state is None:
+            raise RuntimeError("The mock server did not produce a turn")
+        state = new_state
+    results["turn"] = latency_summary(samples, mock_latency)
+
+    state, samples, first_partial = initial[0], [], []
+    for _ in range(turns):
+        start = time.perf_counter()
+        first = None
+        async for kind, payload in core.stream_battlemap_update_async(state, ACTION):
+            if first is None:
+                first = time.perf_counter() - start
+            if kind == "final":
+                if payload[0] is None:
+                    raise RuntimeError("The mock server did not produce a streamed turn")
+                state = payload[0]
+        samples.append(time.perf_counter() - start)
+        first_partial.append(first)
+    results["turn_stream"] = dict(latency_summary(samples, mock_latency), first_event_p50_ms=round(statistics.median(first_partial) * 1000, 2))
+
+    # Independent sessions playing at once: throughput of the shared client and connection pool
+    async def session(count: int):
+        session_state = initial[0]
+        for _ in range(count):
+            session_state = (await core.update_battlemap_with_ai_async(session_state, ACTION))[0] or session_state
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(turns) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    results["turn_throughput"] = {"sessions": concurrency, "turns": turns * concurrency, "wall_s": round(elapsed, 3), "turns_per_s": round(turns * concurrency / elapsed, 1)}
+    return results
+
+
+def compare(previous: Dict, current: Dict) -> Dict[str, Dict[str, object]]:
+    # Relative change of each stage's headline number; negative is faster
+    changes = {}
+    for group, key in (("micro", "us_per_op"), ("e2e", "overhead_ms")):
+        for name, stats in current.get(group, {}).items():
+            before = previous.get(group, {}).get(name, {}).get(key)
+            after = stats.get(key)
+            if before and after is not None:
+                changes[f"{group}.{name}.{key}"] = {"before": before, "after": after, "change": f"{(after - before) / abs(before):+.1%}"}
+    return changes
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ops", type=int, default=2000, help="iterations per micro stage")
+    parser.add_argument("--history", type=int, default=100, help="turns already played before the measured one")
+    parser.add_argument("--turns", type=int, default=30, help="model turns per end-to-end stage")
+    parser.add_argument("--concurrency", type=int, default=8, help="parallel sessions in the throughput stage")
+    parser.add_argument("--latency", type=float, default=0.0, help="mock response latency in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="mock delay between streamed deltas")
+    parser.add_argument("--mock-url", help="use an already running mock_llm_server.py instead of an in-process one")
+    parser.add_argument("--output", help="also write the results to this file")
+    parser.add_argument("--compare", help="results file from an earlier run")
+    parser.add_argument("--log", action="store_true", help="keep the app's INFO logging (off by default, it dominates the micro stages)")
+    args = parser.parse_args()
+
+    server = None
+    if args.mock_url is None:
+        # In-process server threads share the GIL with the client; --mock-url keeps them apart
+        server = MockLLMServer(latency=args.latency, chunk_delay=args.chunk_delay).start()
+    # Set before the app is imported: AIUtilities reads these once when the shared instance is created
+    os.environ["ANTHROPIC_BASE_URL"] = args.mock_url or server.base_url
+    os.environ["ANTHROPIC_API_KEY"] = "mock"
+    os.environ["RESPONSE_CACHE"] = "0"  # every call has to reach the mock
+    os.environ["PERSISTENCE"] = "0"
+    os.environ["SPECULATION"] = "0"
+    os.environ["CACHE_WARMER"] = "0"
+    import core  # noqa: F401
+    if not args.log:
+        logging.disable(logging.INFO)
+
+    try:
+        results = {
+            "revision": git_revision(),
+            "python": platform.python_version(),
+            "config": {"ops": args.ops, "history": args.history, "turns": args.turns, "concurrency": args.concurrency, "mock_latency_s": args.latency},
+            "micro": micro_stages(args.history, args.ops),
+            "e2e": asyncio.run(e2e_stages(args.turns, args.concurrency, args.latency)),
+        }
+    finally:
+        if server is not None:
+            server.stop()
+    if args.compare:
+        with open(args.compare) as f:
+            results["comparison"] = compare(json.load(f), results)
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Per-turn CPU cost of building the next GameState.
+
+"constructor" rebuilds the state the way turns used to: a fresh GameState from a tuple-keyed battlemap dict
+and copied log lists, fully validated. "advance_state" is the current hot path (GameState.evolve on shared
+History logs). Run from the repository root: python benchmarks/bench_state_transition.py --turns 2000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core import GameState, advance_state  # noqa: E402
+from grid import Grid  # noqa: E402
+
+ADVENTURE = {"title": "Benchmark", "setting": "A field", "objective": "Walk", "challenges": [], "key_locations": [], "npcs": []}
+DESCRIPTION = "You walk across the field. " * 8
+
+
+def initial_state() -> GameState:
+    return GameState(battlemap=Grid.from_rows(["🌾 🌾 🌳 🌾 🌾 🌾"] * 6), adventure=ADVENTURE)
+
+
+def constructor_turn(state: GameState, turn: int) -> GameState:
+    return GameState(
+        battlemap={f"({x}, {y})": tile for (x, y), tile in state.battlemap.items()},
+        player_pos=(turn % 6, 2),
+        last_action=f"move {turn}",
+        log=list(state.log) + [f"AI response: {DESCRIPTION}"],
+        conversation_history=list(state.conversation_history) + [f"User action: move {turn}", f"AI response: {DESCRIPTION}"],
+        change_type="same_map",
+        patched_cells=0,
+        adventure=dict(state.adventure),
+    )
+
+
+def evolve_turn(state: GameState, turn: int) -> GameState:
+    return advance_state(state, f"move {turn}", state.battlemap.copy(), (turn % 6, 2), DESCRIPTION, "same_map", 0)
+
+
+def run(step, turns: int, sample_every: int):
+    state = initial_state()
+    samples = []
+    window_start = time.perf_counter()
+    total_start = window_start
+    for turn in range(1, turns + 1):
+        state = step(state, turn)
+        if turn % sample_every == 0:
+            now = time.perf_counter()
+            samples.append({"turn": turn, "us_per_turn": round((now - window_start) / sample_every * 1e6, 2)})
+            window_start = now
+    return {"total_s": round(time.perf_counter() - total_start, 4), "samples": samples}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--turns", type=int, default=2000)
+    parser.add_argument("--sample-every", type=int, default=250)
+    args = parser.parse_args()
+    results = {
+        "turns": args.turns,
+        "constructor": run(constructor_turn, args.turns, args.sample_every),
+        "advance_state": run(evolve_turn, args.turns, args.sample_every),
+    }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
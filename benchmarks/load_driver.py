@@ -0,0 +1,367 @@
+"""Concurrent load driver for the FastHTML app.
+
+Each synthetic player runs the full flow with its own session cookie:
+- /generate_adventure, polling /jobs/{id} like the page does
+- /generate_initial_state, the same way
+- /game, with a /events stream held open
+- a run of /action calls separated by think time
+
+Streamed turns are timed until their step-{turn_id} event arrives, so the action latency is what the player
+waits for. Players start evenly over the ramp. The report gives latency percentiles and errors per flow step
+and per route. It also includes the server's event-loop lag and thread-pool use, read from /metrics before and
+after the run.
+
+Against a running app (ideally backed by benchmarks/mock_llm_server.py):
+    python benchmarks/load_driver.py --url http://127.0.0.1:5001 --players 100 --actions 10
+
+Or have it start the mock and the app (uvicorn main:app) itself:
+    python benchmarks/load_driver.py --spawn --latency 1.0 --players 200 --ramp 30 --think 3
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+THEMES = ["Space pirates", "Medieval fantasy", "Cyberpunk detective", "Haunted lighthouse", "Desert caravan"]
+MODEL_ACTIONS = ["search the area", "talk to the nearest stranger", "light a torch", "open the chest", "listen carefully"]
+MOVE_ACTIONS = ["move north", "move south", "move east", "move west"]  # resolved locally unless blocked
+_JOB = re.compile(r'hx-get="/jobs/([0-9a-f]+)"')
+_TURN = re.compile(r'sse-swap="step-([0-9a-f]+)"')
+_ERRORS = ("An error occurred", "Failed to", "Please try again", "has expired", "not been initialized", "No adventure has been generated")
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{[^}]*\})? (\S+)$')
+
+
+class Recorder:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self.error_samples: List[str] = []
+
+    def ok(self, name: str, seconds: float):
+        self.latencies[name].append(seconds)
+
+    def error(self, name: str, detail: str):
+        self.errors[name] += 1
+        if len(self.error_samples) < 20:
+            self.error_samples.append(f"{name}: {detail[:200]}")
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        report = {}
+        for name in sorted(set(self.latencies) | set(self.errors)):
+            samples = sorted(self.latencies.get(name, []))
+            entry = {"ok": len(samples), "errors": self.errors.get(name, 0)}
+            if samples:
+                entry.update({
+                    "p50_ms": round(percentile(samples, 0.50) * 1000, 1),
+                    "p90_ms": round(percentile(samples, 0.90) * 1000, 1),
+                    "p99_ms": round(percentile(samples, 0.99) * 1000, 1),
+                    "max_ms": round(samples[-1] * 1000, 1),
+                    "mean_ms": round(statistics.fmean(samples) * 1000, 1),
+                })
+            report[name] = entry
+        return report
+
+
+def percentile(sorted_samples: List[float], q: float) -> float:
+    return sorted_samples[min(len(sorted_samples) - 1, int(len(sorted_samples) * q))]
+
+
+def route_name(method: str, path: str) -> str:
+    return f"{method} " + re.sub(r"/[0-9a-f]{32}", "/{id}", path.split("?")[0])
+
+
+class EventListener:
+    """Reads the session's /events stream and remembers which event names arrived."""
+
+    def __init__(self, client: httpx.AsyncClient):
+        self.client = client
+        self._events: Dict[str, asyncio.Event] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.connected = asyncio.Event()
+
+    def _event(self, name: str) -> asyncio.Event:
+        if name not in self._events:
+            self._events[name] = asyncio.Event()
+        return self._events[name]
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def _run(self):
+        async with self.client.stream("GET", "/events", timeout=httpx.Timeout(10.0, read=None)) as response:
+            self.connected.set()
+            name = None
+            async for line in response.aiter_lines():
+                if line.startswith("event: "):
+                    name = line[7:]
+                elif line == "" and name is not None:
+                    self._event(name).set()
+                    name = None
+
+    async def wait(self, name: str, timeout: float):
+        await asyncio.wait_for(self._event(name).wait(), timeout)
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+
+class Player:
+    def __init__(self, index: int, args, recorder: Recorder):
+        self.index = index
+        self.args = args
+        self.recorder = recorder
+        self.rng = random.Random(args.seed + index)
+
+    async def request(self, client: httpx.AsyncClient, method: str, path: str, **kwargs) -> Optional[str]:
+        name = route_name(method, path)
+        start = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+        except httpx.HTTPError as e:
+            self.recorder.error(name, f"{type(e).__name__}: {e}")
+            return None
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            self.recorder.error(name, f"HTTP {response.status_code}")
+            return None
+        self.recorder.ok(name, elapsed)
+        return response.text
+
+    async def until_done(self, client: httpx.AsyncClient, html: Optional[str]) -> Optional[str]:
+        # Follows a background job the way the page's hx-trigger="every 1s" does
+        deadline = time.perf_counter() + self.args.timeout
+        while html is not None and _JOB.search(html):
+            if time.perf_counter() > deadline:
+                return None
+            await asyncio.sleep(self.args.poll)
+            html = await self.request(client, "GET", f"/jobs/{_JOB.search(html).group(1)}")
+        return html
+
+    async def step(self, client: httpx.AsyncClient, name: str, method: str, path: str, **kwargs) -> bool:
+        start = time.perf_counter()
+        html = await self.until_done(client, await self.request(client, method, path, **kwargs))
+        if html is None or any(marker in html for marker in _ERRORS):
+            self.recorder.error(name, html or "no response")
+            return False
+        self.recorder.ok(name, time.perf_counter() - start)
+        return True
+
+    def think(self) -> float:
+        return self.args.think * self.rng.uniform(0.5, 1.5)
+
+    async def run(self):
+        limits = httpx.Limits(max_connections=4, max_keepalive_connections=2)
+        # HX-Request: the app answers with fragments, as it does for htmx
+        async with httpx.AsyncClient(base_url=self.args.url, timeout=self.args.timeout, limits=limits, headers={"HX-Request": "true"}) as client:
+            if not await self.step(client, "adventure", "POST", "/generate_adventure", data={"adventure_prompt": self.rng.choice(THEMES)}):
+                return
+            await asyncio.sleep(self.think())
+            if not await self.step(client, "initial_state", "POST", "/generate_initial_state"):
+                return
+            if await self.request(client, "GET", "/game") is None:
+                return
+            listener = EventListener(client)
+            listener.start()
+            try:
+                await asyncio.wait_for(listener.connected.wait(), self.args.timeout)
+                for _ in range(self.args.actions):
+                    await asyncio.sleep(self.think())
+                    await self.action(client, listener)
+            except asyncio.TimeoutError:
+                self.recorder.error("events", "stream did not connect")
+            finally:
+                await listener.close()
+            if self.args.restart:
+                await self.request(client, "POST", "/restart")
+
+    async def action(self, client: httpx.AsyncClient, listener: EventListener):
+        move = self.rng.random() < self.args.move_share
+        action = self.rng.choice(MOVE_ACTIONS if move else MODEL_ACTIONS)
+        name = "action_move" if move else "action_other"
+        start = time.perf_counter()
+        html = await self.request(client, "POST", "/action", data={"action": action})
+        if html is None or any(marker in html for marker in _ERRORS):
+            self.recorder.error(name, html or "no response")
+            return
+        turn = _TURN.search(html)
+        if turn is not None:
+            try:
+                await listener.wait(f"step-{turn.group(1)}", self.args.timeout)
+            except asyncio.TimeoutError:
+                self.recorder.error(name, "step event never arrived")
+                return
+        self.recorder.ok(name, time.perf_counter() - start)
+
+
+def parse_metrics(text: str) -> Dict[Tuple[str, str], float]:
+    samples = {}
+    for line in text.splitlines():
+        match = _SAMPLE.match(line)
+        if match:
+            samples[(match.group(1), match.group(2) or "")] = float(match.group(3))
+    return samples
+
+
+async def scrape(url: str) -> Dict[Tuple[str, str], float]:
+    try:
+        async with httpx.AsyncClient(base_url=url, timeout=10) as client:
+            response = await client.get("/metrics")
+            return parse_metrics(response.text) if response.status_code == 200 else {}
+    except httpx.HTTPError:
+        return {}
+
+
+def histogram_quantile(before, after, name: str, q: float) -> Optional[float]:
+    # Upper bound of the bucket holding the q-th observation made during the run
+    buckets = []
+    for (metric, labels), value in after.items():
+        if metric == f"{name}_bucket":
+            bound = re.search(r'le="([^"]+)"', labels).group(1)
+            buckets.append((float(bound), value - before.get((metric, labels), 0.0)))
+    buckets.sort()
+    if not buckets or buckets[-1][1] <= 0:
+        return None
+    target = buckets[-1][1] * q
+    for bound, count in buckets:
+        if count >= target:
+            return bound
+    return None
+
+
+def server_report(before, after, elapsed: float) -> Dict[str, object]:
+    if not after:
+        return {"metrics": "unavailable"}
+    probes = after.get(("event_loop_lag_seconds_count", ""), 0) - before.get(("event_loop_lag_seconds_count", ""), 0)
+    saturated = after.get(("threadpool_saturated_samples", ""), 0) - before.get(("threadpool_saturated_samples", ""), 0)
+    lag_sum = after.get(("event_loop_lag_seconds_sum", ""), 0) - before.get(("event_loop_lag_seconds_sum", ""), 0)
+    return {
+        "event_loop_lag_mean_ms": round(lag_sum / probes * 1000, 2) if probes else None,
+        "event_loop_lag_p99_le_s": histogram_quantile(before, after, "event_loop_lag_seconds", 0.99),
+        "event_loop_lag_max_s": after.get(("event_loop_lag_max_seconds", "")),
+        "threadpool_limit": after.get(("threadpool_threads", '{state="limit"}')),
+        "threadpool_utilization_p90_le": histogram_quantile(before, after, "threadpool_utilization", 0.90),
+        "threadpool_saturated_share": round(saturated / probes, 4) if probes else None,
+        "sessions_live": after.get(("sessions_live", "")),
+        "llm_requests_per_s": round(sum(value - before.get(key, 0.0) for key, value in after.items() if key[0] == "llm_requests_total") / elapsed, 2),
+    }
+
+
+def raise_file_limit():
+    # Every player holds a request connection and an event stream open
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+
+def spawn(args) -> List[subprocess.Popen]:
+    # Mock LLM + app in child processes, so the driver's own CPU doesn't skew the server's event loop
+    mock_port, app_port = args.mock_port, int(args.url.rsplit(":", 1)[1])
+    mock = subprocess.Popen([sys.executable, os.path.join(ROOT, "benchmarks", "mock_llm_server.py"), "--port", str(mock_port), "--latency", str(args.latency), "--jitter", str(args.latency * 0.2), "--chunk-delay", str(args.chunk_delay)])
+    env = dict(os.environ,
+               ANTHROPIC_BASE_URL=f"http://127.0.0.1:{mock_port}",
+               ANTHROPIC_API_KEY="mock",
+               RESPONSE_CACHE="0",
+               PERSISTENCE_PATH=os.path.join(tempfile.mkdtemp(prefix="load-driver-"), "game_events.sqlite3"),
+               SESSION_STORE_MAX_SESSIONS=str(max(1000, args.players * 2)))
+    app = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(app_port), "--log-level", "warning"], cwd=ROOT, env=env)
+    return [mock, app]
+
+
+async def wait_until_up(url: str, timeout: float = 30.0):
+    deadline = time.perf_counter() + timeout
+    async with httpx.AsyncClient(base_url=url, timeout=2) as client:
+        while time.perf_counter() < deadline:
+            try:
+                if (await client.get("/metrics")).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise RuntimeError(f"{url} did not come up")
+
+
+async def run(args) -> Dict[str, object]:
+    await wait_until_up(args.url)
+    recorder = Recorder()
+    before = await scrape(args.url)
+    start = time.perf_counter()
+
+    async def delayed(player: Player, delay: float):
+        await asyncio.sleep(delay)
+        try:
+            await player.run()
+        except Exception as e:
+            recorder.error("player", f"{type(e).__name__}: {e}")
+
+    players = [Player(index, args, recorder) for index in range(args.players)]
+    await asyncio.gather(*(delayed(player, args.ramp * index / max(1, args.players)) for index, player in enumerate(players)))
+    elapsed = time.perf_counter() - start
+    after = await scrape(args.url)
+    flow = {"adventure", "initial_state", "action_move", "action_other", "events", "player"}
+    summary = recorder.summary()
+    return {
+        "config": {key: getattr(args, key) for key in ("players", "actions", "ramp", "think", "move_share", "latency")},
+        "wall_s": round(elapsed, 2),
+        "actions_per_s": round((len(recorder.latencies["action_move"]) + len(recorder.latencies["action_other"])) / elapsed, 2),
+        "flow": {name: stats for name, stats in summary.items() if name in flow},
+        "routes": {name: stats for name, stats in summary.items() if name not in flow},
+        "server": server_report(before, after, elapsed),
+        "error_samples": recorder.error_samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:5001")
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--actions", type=int, default=10, help="actions per player")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which players start")
+    parser.add_argument("--think", type=float, default=2.0, help="mean seconds between a player's requests (0.5x-1.5x)")
+    parser.add_argument("--move-share", type=float, default=0.3, help="share of actions that are plain moves, which skip the model unless blocked")
+    parser.add_argument("--poll", type=float, default=1.0, help="job polling interval, 1s like the page")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--restart", action="store_true", help="POST /restart when a player is done")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn", action="store_true", help="start mock_llm_server.py and uvicorn main:app for the run")
+    parser.add_argument("--mock-port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=1.0, help="mock latency when spawning")
+    parser.add_argument("--chunk-delay", type=float, default=0.01, help="mock delay between streamed deltas when spawning")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    raise_file_limit()
+    processes = spawn(args) if args.spawn else []
+    try:
+        report = asyncio.run(run(args))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
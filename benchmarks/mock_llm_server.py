@@ -0,0 +1,226 @@
+"""Local stand-in for the Anthropic messages API, for benchmarks that must not touch the network.
+
+Answers POST /v1/messages (plain and stream=true) with a canned tool_use response for whichever of the game's
+schemas the request carries: adventure, initial state or battlemap update. Latency is configurable, and the
+usage block emulates prompt caching: the system + tools prefix is reported as cache_creation the first time it
+is seen and as cache_read afterwards. For resilience testing a share of requests can fail with 529 (overloaded)
+or stall for a long time before answering. Point the app at it with ANTHROPIC_BASE_URL=http://127.0.0.1:<port>.
+
+    python benchmarks/mock_llm_server.py --port 8765 --latency 0.8 --jitter 0.2
+"""
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+ADVENTURE = {
+    "title": "The Sunken Archive",
+    "setting": "A flooded library beneath a mountain monastery.",
+    "objective": "Recover the last map of the old kingdom.",
+    "challenges": ["Rising water", "A jealous librarian spirit"],
+    "key_locations": ["Reading hall", "Drowned stacks"],
+    "npcs": [{"name": "Brother Alm", "description": "A monk who knows the tides of the archive."}],
+}
+INITIAL_MAP = ["🌳 🌳 🌾 🌾 🌳 🌳", "🌳 🌾 🌾 🌾 🌾 🌳", "🌾 🌾 🏠 🌾 🌾 🌾", "🌾 🌾 🌾 🌾 💎 🌾", "🌳 🌾 🌾 🌾 🌾 🌳", "🌳 🌳 🌾 🌾 🌳 🌳"]
+DESCRIPTION = "You search the area carefully. Dust settles around you as something glints between the stones. The air smells of old paper and rain."
+_POSITION = re.compile(r"Player position: \((\d+), (\d+)\)")
+
+
+def _tokens(value) -> int:
+    # Rough count, ~4 characters per token, good enough for relative numbers
+    return max(1, len(json.dumps(value, ensure_ascii=False)) // 4)
+
+
+def canned_input(body: Dict, turn: int, new_map_every: int) -> Dict:
+    properties = body["tools"][0]["input_schema"].get("properties", {}) if body.get("tools") else {}
+    if "npcs" in properties:
+        return ADVENTURE
+    if "initial_description" in properties:
+        return {"battlemap": INITIAL_MAP, "player_pos": [2, 3], "initial_description": "You stand at the edge of a quiet clearing."}
+    last_message = json.dumps(body["messages"][-1]["content"], ensure_ascii=False)
+    match = _POSITION.search(last_message)
+    player_pos = [int(match.group(1)), int(match.group(2))] if match else [2, 3]
+    if new_map_every and turn % new_map_every == 0:
+        return {"change_type": "new_map", "player_pos": [0, 0], "description": DESCRIPTION, "battlemap": INITIAL_MAP}
+    change = {"x": (player_pos[0] + 1) % 6, "y": player_pos[1], "tile": "💎"}
+    return {"change_type": "same_map", "player_pos": player_pos, "description": DESCRIPTION, "changes": [change]}
+
+
+class MockState:
+    def __init__(self, latency: float, jitter: float, chunk_delay: float, new_map_every: int, error_rate: float = 0.0, stall_rate: float = 0.0, stall: float = 30.0):
+        self.latency = latency
+        self.jitter = jitter
+        self.chunk_delay = chunk_delay
+        self.new_map_every = new_map_every
+        self.error_rate = error_rate
+        self.stall_rate = stall_rate
+        self.stall = stall
+        self.requests = 0
+        self.errors = 0
+        self.stalls = 0
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    def next_turn(self) -> int:
+        with self._lock:
+            self.requests += 1
+            return self.requests
+
+    def usage(self, body: Dict, tool_input: Dict) -> Dict[str, int]:
+        prefix = {"system": body.get("system"), "tools": body.get("tools")}
+        prefix_tokens = _tokens(prefix)
+        key = hashlib.sha256(json.dumps(prefix, sort_keys=True).encode("utf-8")).hexdigest()
+        with self._lock:
+            seen = key in self._prefixes
+            self._prefixes.add(key)
+        return {
+            "input_tokens": _tokens(body["messages"]),
+            "output_tokens": _tokens(tool_input),
+            "cache_creation_input_tokens": 0 if seen else prefix_tokens,
+            "cache_read_input_tokens": prefix_tokens if seen else 0,
+        }
+
+    def delay(self) -> float:
+        if self.stall_rate and random.random() < self.stall_rate:
+            with self._lock:
+                self.stalls += 1
+            return self.stall
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+    def fail(self) -> bool:
+        if self.error_rate and random.random() < self.error_rate:
+            with self._lock:
+                self.errors += 1
+            return True
+        return False
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, like the real API
+    disable_nagle_algorithm = True  # headers and body are separate writes; Nagle + delayed ACK would add ~40 ms
+    state: MockState
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length", 0))) or b"{}")
+        if not self.path.startswith("/v1/messages"):
+            self._send_json(404, {"type": "error", "error": {"type": "not_found_error", "message": self.path}})
+            return
+        if self.state.fail():
+            self._send_json(529, {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}})
+            return
+        turn = self.state.next_turn()
+        tool_input = canned_input(body, turn, self.state.new_map_every)
+        usage = self.state.usage(body, tool_input)
+        tool_name = body["tools"][0]["name"] if body.get("tools") else "generate_structured_output"
+        message = {
+            "id": f"msg_{uuid.uuid4().hex[:24]}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model", "mock"),
+            "content": [{"type": "tool_use", "id": f"toolu_{uuid.uuid4().hex[:24]}", "name": tool_name, "input": tool_input}],
+            "stop_reason": "tool_use",
+            "stop_sequence": None,
+            "usage": usage,
+        }
+        if body.get("stream"):
+            self._stream(message)
+        else:
+            time.sleep(self.state.delay())
+            self._send_json(200, message)
+
+    def _send_json(self, status: int, payload: Dict):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, message: Dict):
+        # Time to first token is the configured latency, then the tool input arrives in small JSON deltas
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        time.sleep(self.state.delay())
+        tool_use = message["content"][0]
+        start = dict(message, content=[], stop_reason=None, usage=dict(message["usage"], output_tokens=1))
+        self._event("message_start", {"type": "message_start", "message": start})
+        self._event("content_block_start", {"type": "content_block_start", "index": 0, "content_block": dict(tool_use, input={})})
+        partial = json.dumps(tool_use["input"], ensure_ascii=False)
+        for i in range(0, len(partial), 24):
+            self._event("content_block_delta", {"type": "content_block_delta", "index": 0, "delta": {"type": "input_json_delta", "partial_json": partial[i:i + 24]}})
+            if self.state.chunk_delay:
+                time.sleep(self.state.chunk_delay)
+        self._event("content_block_stop", {"type": "content_block_stop", "index": 0})
+        self._event("message_delta", {"type": "message_delta", "delta": {"stop_reason": "tool_use", "stop_sequence": None}, "usage": {"output_tokens": message["usage"]["output_tokens"]}})
+        self._event("message_stop", {"type": "message_stop"})
+        self.wfile.write(b"0\r\n\r\n")
+
+    def _event(self, event: str, data: Dict):
+        chunk = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+        self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+        self.wfile.flush()
+
+
+class MockLLMServer:
+    """Runs the mock on a background thread; `base_url` is what ANTHROPIC_BASE_URL should be set to."""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, jitter: float = 0.0, chunk_delay: float = 0.0, new_map_every: int = 0,
+                 error_rate: float = 0.0, stall_rate: float = 0.0, stall: float = 30.0):
+        self.state = MockState(latency, jitter, chunk_delay, new_map_every, error_rate, stall_rate, stall)
+        handler = type("BoundMockHandler", (MockHandler,), {"state": self.state})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self.httpd.server_address[:2]
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.address
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds before the response (or the first stream event)")
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between streamed JSON deltas")
+    parser.add_argument("--new-map-every", type=int, default=0, help="answer every Nth battlemap update with a new_map")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests answered with 529 overloaded")
+    parser.add_argument("--stall-rate", type=float, default=0.0, help="share of requests that stall for --stall seconds")
+    parser.add_argument("--stall", type=float, default=30.0)
+    args = parser.parse_args()
+    server = MockLLMServer(args.host, args.port, args.latency, args.jitter, args.chunk_delay, args.new_map_every, args.error_rate, args.stall_rate, args.stall)
+    print(f"Mock Anthropic API on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from typing import Dict, Optional, Set
+from pydantic import BaseModel
+from config import config_from_env
+from core import warm_battlemap_cache_async
+
+logger = logging.getLogger(__name__)
+
+
+class CacheWarmerConfig(BaseModel):
+    enabled: bool = True
+    cache_ttl: float = 300.0  # Anthropic ephemeral cache lifetime, refreshed by every read
+    refresh_margin: float = 45.0  # refresh this long before the entry would expire
+    active_window: float = 900.0  # stop keeping a session warm after this long without a turn
+    check_interval: float = 15.0
+
+    @classmethod
+    def from_env(cls) -> "CacheWarmerConfig":
+        return config_from_env(cls, "CACHE_WARMER", switch="CACHE_WARMER")
+
+
+def adventure_key(adventure: Dict) -> str:
+    return hashlib.sha256(json.dumps(adventure, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class _WarmPrefix:
+    """Cache state of one adventure's prompt prefix, shared by every session playing it."""
+
+    def __init__(self, adventure: Dict):
+        self.adventure = adventure
+        self.sessions: Set[str] = set()
+        self.last_write = 0.0  # last time a request read or wrote the prefix
+        self.last_activity = 0.0  # last player turn in any session using it
+        self.task: Optional[asyncio.Task] = None
+
+
+class CacheWarmer:
+    """Warms the battlemap prompt prefix when a game starts and keeps it alive for players who pause."""
+
+    def __init__(self, config: Optional[CacheWarmerConfig] = None):
+        self.config = config or CacheWarmerConfig.from_env()
+        self._prefixes: Dict[str, _WarmPrefix] = {}
+        self._sessions: Dict[str, str] = {}  # session id -> adventure key
+        self._task: Optional[asyncio.Task] = None
+        self.warmups = 0
+        self.refreshes = 0
+        self.hits = 0  # warm-ups/refreshes that read the prefix from cache
+        self.misses = 0  # ones that had to write it
+        self.failures = 0
+
+    def warm(self, session_id: str, adventure: Dict):
+        # Called as soon as the initial state starts generating, so the first turn finds the prefix cached
+        if not self.config.enabled:
+            return
+        key = adventure_key(adventure)
+        self.forget(session_id)
+        prefix = self._prefixes.get(key)
+        if prefix is None:
+            prefix = self._prefixes[key] = _WarmPrefix(adventure)
+        prefix.sessions.add(session_id)
+        prefix.last_activity = time.monotonic()
+        self._sessions[session_id] = key
+        if time.monotonic() - prefix.last_write > self.config.cache_ttl - self.config.refresh_margin:
+            self._fire(prefix, "warmup")
+
+    def touch(self, session_id: str, used_cache: bool):
+        # A player turn: marks the session active and, when it went to the model, the prefix as just refreshed
+        prefix = self._prefixes.get(self._sessions.get(session_id, ""))
+        if prefix is None:
+            return
+        prefix.last_activity = time.monotonic()
+        if used_cache:
+            prefix.last_write = prefix.last_activity
+
+    def forget(self, session_id: str):
+        key = self._sessions.pop(session_id, None)
+        prefix = self._prefixes.get(key) if key else None
+        if prefix is not None:
+            prefix.sessions.discard(session_id)
+            if not prefix.sessions:
+                del self._prefixes[key]
+
+    def start(self):
+        if self.config.enabled and self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for prefix in self._prefixes.values():
+            if prefix.task is not None:
+                prefix.task.cancel()
+
+    async def _refresh_loop(self):
+        while True:
+            await asyncio.sleep(self.config.check_interval)
+            now = time.monotonic()
+            for prefix in list(self._prefixes.values()):
+                expiring = now - prefix.last_write > self.config.cache_ttl - self.config.refresh_margin
+                active = now - prefix.last_activity < self.config.active_window
+                if expiring and active:
+                    self._fire(prefix, "refresh")
+
+    def _fire(self, prefix: _WarmPrefix, kind: str):
+        if prefix.task is not None and not prefix.task.done():
+            return
+        prefix.last_write = time.monotonic()  # claimed now so the loop doesn't fire it twice
+        prefix.task = asyncio.create_task(self._warm(prefix, kind))
+
+    async def _warm(self, prefix: _WarmPrefix, kind: str):
+        try:
+            cache_creation_tokens, cache_read_tokens = await warm_battlemap_cache_async(prefix.adventure)
+        except Exception as e:
+            self.failures += 1
+            prefix.last_write = 0.0
+            logger.error(f"Cache {kind} failed: {str(e)}")
+            return
+        if kind == "warmup":
+            self.warmups += 1
+        else:
+            self.refreshes += 1
+        if cache_read_tokens > 0:
+            self.hits += 1
+        else:
+            self.misses += 1
+        logger.info(f"Cache {kind}: {cache_read_tokens} read / {cache_creation_tokens} created")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "warm_prefixes": len(self._prefixes),
+            "warmups": self.warmups,
+            "refreshes": self.refreshes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "failures": self.failures,
+        }
@@ -0,0 +1,101 @@
+import gzip
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Literal, Optional
+from pydantic import BaseModel
+from config import config_from_env
+from response_cache import canonical_key
+
+logger = logging.getLogger(__name__)
+
+RESILIENCE_FIELDS = ("deadline", "max_retries", "retry_backoff", "retry_backoff_max", "hedge", "hedge_after")
+
+
+class CassetteConfig(BaseModel):
+    mode: Literal["off", "record", "replay"] = "off"
+    path: str = "cassettes/recording.jsonl.gz"
+    replay_latency: bool = False  # sleep for each call's recorded latency when replaying
+    latency_scale: float = 1.0
+
+    @classmethod
+    def from_env(cls) -> "CassetteConfig":
+        return config_from_env(cls, "CASSETTE")
+
+
+def cassette_key(call: str, prompt: Any, tools: Any, llm_config: BaseModel) -> str:
+    # Everything the caller controls except what can't change the answer: the metrics label, caching and resilience settings
+    config = llm_config.model_dump(exclude={"stage", "use_response_cache", *RESILIENCE_FIELDS})
+    return canonical_key(config["client"], {"call": call, "prompt": prompt, "tools": tools, "config": config})
+
+
+class Cassette:
+    """Request/response pairs in a gzipped JSON-lines file, written as calls complete and replayed by request key.
+
+    A key recorded several times (non-deterministic prompts, retries) is replayed in recorded order and
+    then keeps answering with its last response.
+    """
+
+    def __init__(self, config: Optional[CassetteConfig] = None):
+        self.config = config or CassetteConfig.from_env()
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._file = None
+        self.recorded = 0
+        self.replayed = 0
+        self.misses = 0
+        if self.config.mode == "record":
+            directory = os.path.dirname(self.config.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.config.path, "ab")
+        elif self.config.mode == "replay":
+            for entry in self.load(self.config.path):
+                self._entries.setdefault(entry["key"], deque()).append(entry)
+            logger.info(f"Replaying {sum(len(entries) for entries in self._entries.values())} calls from {self.config.path}")
+
+    @property
+    def replaying(self) -> bool:
+        return self.config.mode == "replay"
+
+    @staticmethod
+    def load(path: str) -> List[Dict[str, Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def record(self, key: str, call: str, llm_config: BaseModel, response: Dict[str, Any], latency: float, first_field_latency: Optional[float] = None):
+        entry = {"key": key, "call": call, "client": llm_config.client, "model": llm_config.model, "stage": llm_config.stage, "latency": round(latency, 4), **response}
+        if first_field_latency is not None:
+            entry["first_field_latency"] = round(first_field_latency, 4)
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        # One gzip member per call: the file stays readable however the run ends, gzip.open reads them back to back
+        data = gzip.compress((line + "\n").encode("utf-8"))
+        with self._lock:
+            self._file.write(data)
+            self._file.flush()
+            self.recorded += 1
+
+    def replay(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                self.misses += 1
+                return None
+            self.replayed += 1
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def delay(self, entry: Dict[str, Any], field: str = "latency") -> float:
+        if not self.config.replay_latency:
+            return 0.0
+        return entry.get(field, 0.0) * self.config.latency_scale
+
+    def stats(self) -> Dict[str, int]:
+        return {"recorded": self.recorded, "replayed": self.replayed, "misses": self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
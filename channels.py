@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import os
+from collections import deque
+from typing import AsyncIterator, Deque, Dict, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+HEARTBEAT_SECONDS = float(os.getenv("CHANNEL_HEARTBEAT_SECONDS", "15"))
+REPLAY_EVENTS = int(os.getenv("CHANNEL_REPLAY_EVENTS", "200"))  # events kept per session for Last-Event-ID resume
+
+
+def format_event(event_id: int, event: str, data: str) -> str:
+    lines = "\n".join(f"data: {line}" for line in data.splitlines() or [""])
+    return f"id: {event_id}\nevent: {event}\n{lines}\n\n"
+
+
+class SessionChannel:
+    """Server-sent event stream for one session, with numbered events that reconnecting clients can resume from."""
+
+    def __init__(self, replay_events: int = REPLAY_EVENTS):
+        self._events: Deque[Tuple[int, str, str]] = deque(maxlen=replay_events)  # (id, event, data)
+        self._subscribers: Set[asyncio.Queue] = set()
+        self.last_id = 0
+
+    def publish(self, event: str, data: str) -> int:
+        self.last_id += 1
+        message = format_event(self.last_id, event, data)
+        self._events.append((self.last_id, event, data))
+        for queue in self._subscribers:
+            queue.put_nowait(message)
+        return self.last_id
+
+    def missed(self, last_event_id: int) -> Optional[list]:
+        # Events after `last_event_id`, or None when some of them were already dropped from the replay buffer
+        if last_event_id >= self.last_id:
+            return []
+        if not self._events or self._events[0][0] > last_event_id + 1:
+            return None
+        return [format_event(event_id, event, data) for event_id, event, data in self._events if event_id > last_event_id]
+
+    def latest(self, event: str) -> Optional[str]:
+        # Data of the most recent `event` still in the replay buffer, for clients that subscribed too late to see it
+        for _, name, data in reversed(self._events):
+            if name == event:
+                return data
+        return None
+
+    async def subscribe(self, last_event_id: Optional[int] = None, resync: Optional[str] = None, heartbeat: float = HEARTBEAT_SECONDS) -> AsyncIterator[str]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.add(queue)
+        try:
+            if last_event_id is not None:
+                missed = self.missed(last_event_id)
+                if missed is None:
+                    if resync is not None:
+                        yield format_event(self.last_id, "resync", resync)
+                else:
+                    for message in missed:
+                        yield message
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=heartbeat)
+                except asyncio.TimeoutError:
+                    # comment line: keeps proxies from closing an idle connection, ignored by EventSource
+                    yield ": heartbeat\n\n"
+        finally:
+            self._subscribers.discard(queue)
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+
+class ChannelHub:
+    def __init__(self):
+        self._channels: Dict[str, SessionChannel] = {}
+
+    def get(self, session_id: str) -> SessionChannel:
+        channel = self._channels.get(session_id)
+        if channel is None:
+            channel = self._channels[session_id] = SessionChannel()
+        return channel
+
+    def discard(self, session_id: str):
+        self._channels.pop(session_id, None)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "channels": len(self._channels),
+            "connected": sum(channel.subscribers for channel in self._channels.values()),
+        }
@@ -0,0 +1,36 @@
+import os
+from typing import Any, Literal, Optional, Type, TypeVar, Union, get_args, get_origin
+from pydantic import BaseModel
+
+ConfigT = TypeVar("ConfigT", bound=BaseModel)
+
+
+def _parse(annotation: Any, value: str) -> Any:
+    # Environment strings for the field types configs use; pydantic validates the result
+    origin = get_origin(annotation)
+    if origin is Union:  # Optional[X]
+        return _parse(next(arg for arg in get_args(annotation) if arg is not type(None)), value)
+    if origin is Literal:
+        return value
+    if origin is list:
+        return [item.strip() for item in value.split(",") if item.strip()]
+    if annotation is bool:
+        return value == "1"
+    return annotation(value)
+
+
+def config_from_env(cls: Type[ConfigT], prefix: str, switch: Optional[str] = None) -> ConfigT:
+    # Each field can be overridden with <PREFIX>_<FIELD>; `switch` names the on/off variable (e.g. PERSISTENCE=0)
+    # of configs with an `enabled` field. Flags are on when set to "1", like the other switches in .env.example,
+    # and lists are comma-separated; an empty list keeps the default.
+    overrides = {}
+    if switch is not None and os.getenv(switch) is not None:
+        overrides["enabled"] = os.getenv(switch) == "1"
+    for name, field in cls.model_fields.items():
+        value = os.getenv(f"{prefix}_{name.upper()}")
+        if value is None or (switch is not None and name == "enabled"):
+            continue
+        parsed = _parse(field.annotation, value)
+        if parsed != []:
+            overrides[name] = parsed
+    return cls(**overrides)
@@ -1,32 +1,123 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional, Dict, Tuple, Literal
-from aiutilities import AIUtilities, LLMConfig
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import List, Optional, Dict, Tuple, Literal, Any, AsyncIterator
+from aiutilities import LLMConfig, get_shared_ai_utilities
+from resilience import stage_deadline
 import json
 from anthropic.types import ToolUseBlock
-from story_generation import generate_adventure
 import logging
+import os
+import re
 import time
-from prompt import system_prompt
+from prompt import system_prompt, battlemap_update_schema, legend
+from grid import Grid
+from history import History
+from prompt_layout import system_layers, conversation_layers, turn_layer, cache_usage_by_layer
 
 SYSTEM_PROMPT = system_prompt
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+# Simple movement is resolved locally; anything touching NPCs, items, enemies, buildings or the map edge goes to the model
+LOCAL_MOVES = os.getenv("LOCAL_MOVES", "1") == "1"
+# Duplicate a player's turn request once it runs past the observed p95 (or LLM_HEDGE_AFTER seconds)
+HEDGE_ACTIONS = os.getenv("LLM_HEDGE", "0") == "1"
+HEDGE_AFTER = float(os.getenv("LLM_HEDGE_AFTER")) if os.getenv("LLM_HEDGE_AFTER") else None
+DIRECTIONS = {"north": (0, -1), "south": (0, 1), "west": (-1, 0), "east": (1, 0)}
+DIRECTION_WORDS = {"up": "north", "down": "south", "left": "west", "right": "east", "n": "north", "s": "south", "w": "west", "e": "east"}
+# Only tiles known to be open ground; empty cells (possibly a tile that was lost) and unknown tiles go to the model
+WALKABLE_TILES = {'🌾', '🏜️'}
+IMPASSABLE_TILES = {'🌊', '🗻', '🏰'}
+TILE_NAMES = dict(legend)
+_NUMBER_WORDS = {"one": 1, "two": 2, "three": 3, "four": 4, "five": 5}
+_MOVE_ACTION = re.compile(
+    r"(?:(?:move|go|walk|run|head|step)\s+)?(?:to\s+the\s+)?"
+    r"(?P<direction>north|south|east|west|up|down|left|right|n|s|e|w)"
+    r"(?:\s+(?P<steps>\d+|one|two|three|four|five))?(?:\s+(?:steps?|tiles?|squares?|times))?"
+)
+
 class GameState(BaseModel):
-    battlemap: Dict[Tuple[int, int], str]
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    battlemap: Grid
     player_pos: Tuple[int, int] = Field(default=(2, 2))
     last_action: str = ""
-    log: List[str] = Field(default_factory=list)
-    conversation_history: List[str] = Field(default_factory=list)
+    log: History = Field(default_factory=History)
+    conversation_history: History = Field(default_factory=History)
     change_type: Literal['same_map', 'new_map'] = 'same_map'
+    patched_cells: Optional[int] = None  # cells changed by a same_map patch, None when a full map was sent
+    cache_layers: Optional[Dict[str, Dict[str, int]]] = None  # estimated cache read/creation tokens per prompt layer
     adventure: Optional[Dict] = None
 
-ai_utilities = AIUtilities()
+    @field_validator("battlemap", mode="before")
+    @classmethod
+    def _coerce_battlemap(cls, value):
+        if isinstance(value, dict):
+            return Grid.from_dict(value)
+        if isinstance(value, (list, str)):
+            return Grid.from_rows(value)
+        return value
 
-def generate_initial_state(adventure: Dict) -> Tuple[Optional[GameState], int, int, int, int, float]:
-    logger.info("Generating initial game state based on adventure setup")
-    start_time = time.time()
-    
+    @field_validator("log", "conversation_history", mode="before")
+    @classmethod
+    def _coerce_history(cls, value):
+        if isinstance(value, (list, tuple)):
+            return History(value)
+        return value
+
+    def evolve(self, **changes) -> "GameState":
+        # Copy-on-write transition: unchanged fields are reused as they are, only the changed ones are validated
+        state = self.model_copy()
+        for name, value in changes.items():
+            self.__pydantic_validator__.validate_assignment(state, name, value)
+        return state
+
+    def snapshot(self, step: int = 0, usage: Tuple[int, int, int, int] = (0, 0, 0, 0), response_time: float = 0.0) -> "StepSnapshot":
+        return StepSnapshot(self, step, usage, response_time)
+
+
+class StepSnapshot:
+    """What the step history keeps of a GameState: enough to render a step, without the log or adventure."""
+
+    __slots__ = ("step", "battlemap", "player_pos", "last_action", "reaction", "change_type", "patched_cells", "cache_layers",
+                 "usage", "response_time", "html")
+
+    def __init__(self, state: GameState, step: int = 0, usage: Tuple[int, int, int, int] = (0, 0, 0, 0), response_time: float = 0.0):
+        self.step = step
+        self.usage = usage  # input, output, cache creation, cache read tokens
+        self.response_time = response_time
+        self.html: Optional[str] = None  # rendered step fragment, filled on first render
+        self.battlemap = state.battlemap
+        self.player_pos = state.player_pos
+        self.last_action = state.last_action
+        self.reaction = state.log[-1] if state.log else ""
+        self.change_type = state.change_type
+        self.patched_cells = state.patched_cells
+        self.cache_layers = state.cache_layers
+
+ai_utilities = get_shared_ai_utilities()
+
+def _extract_tool_input(result) -> Dict:
+    if isinstance(result, str):
+        return json.loads(result)
+    elif isinstance(result, dict):
+        return result
+    elif hasattr(result, 'content') and isinstance(result.content, list):
+        for content_item in result.content:
+            if isinstance(content_item, ToolUseBlock):
+                return content_item.input
+        raise ValueError("No ToolUseBlock found in the response")
+    else:
+        raise ValueError(f"Unexpected response format: {type(result)}")
+
+def _record_cache_layers(state: GameState, prompt: List[Dict], llm_config: LLMConfig, result) -> GameState:
+    state.cache_layers = cache_usage_by_layer(prompt, result.usage, llm_config.json_schema)
+    return state
+
+def _usage_tuple(result) -> Tuple[int, int, int, int]:
+    return result.usage.input_tokens, result.usage.output_tokens, result.usage.cache_creation_input_tokens, result.usage.cache_read_input_tokens
+
+def _initial_state_request(adventure: Dict) -> Tuple[List[Dict], LLMConfig]:
     prompt = [
         {"role": "system", "content": "You are an AI dungeon master tasked with creating an initial game state based on an adventure setup."},
         {"role": "user", "content": f"Generate an initial game state for this adventure:\n{json.dumps(adventure, indent=2)}\n\nProvide a 6x6 battlemap, player position, and initial description."}
@@ -36,11 +127,11 @@ def generate_initial_state(adventure: Dict) -> Tuple[Optional[GameState], int, i
         "type": "object",
         "properties": {
             "battlemap": {
-                "type": "object",
-                "description": "A 6x6 grid representing the initial game map. Keys are coordinate tuples '(x, y)', values are emoji representations.",
-                "patternProperties": {
-                    "^\\([0-5], [0-5]\\)$": {"type": "string"}
-                }
+                "type": "array",
+                "description": "A 6x6 grid representing the initial game map as 6 rows from y = 0 to y = 5. Each row is a string of 6 emojis separated by single spaces, from x = 0 to x = 5.",
+                "items": {"type": "string"},
+                "minItems": 6,
+                "maxItems": 6
             },
             "player_pos": {
                 "type": "array",
@@ -57,58 +148,52 @@ def generate_initial_state(adventure: Dict) -> Tuple[Optional[GameState], int, i
         "required": ["battlemap", "player_pos", "initial_description"]
     }
 
-    llm_config = LLMConfig(client="anthropic", model="claude-3-5-sonnet-20240620", json_schema=json_schema)
+    # Not served from the response cache: every new game of an adventure gets its own starting map
+    llm_config = LLMConfig(client="anthropic", model="claude-3-5-sonnet-20240620", json_schema=json_schema, use_response_cache=False, stage="initial_state", deadline=stage_deadline("initial_state"))
+    return prompt, llm_config
+
+def _build_initial_state(adventure: Dict, initial_state: Dict) -> GameState:
+    return GameState(
+        battlemap=Grid.from_rows(initial_state["battlemap"]),
+        player_pos=tuple(initial_state["player_pos"]),
+        log=[initial_state["initial_description"]],
+        adventure=adventure
+    )
+
+def generate_initial_state(adventure: Dict) -> Tuple[Optional[GameState], int, int, int, int, float]:
+    logger.info("Generating initial game state based on adventure setup")
+    start_time = time.time()
+    prompt, llm_config = _initial_state_request(adventure)
 
     try:
         result = ai_utilities.run_ai_tool_completion(prompt, llm_config=llm_config)
-        
-        if isinstance(result, str):
-            initial_state = json.loads(result)
-        elif isinstance(result, dict):
-            initial_state = result
-        elif hasattr(result, 'content') and isinstance(result.content, list):
-            for content_item in result.content:
-                if isinstance(content_item, ToolUseBlock):
-                    initial_state = content_item.input
-                    break
-            else:
-                raise ValueError("No ToolUseBlock found in the response")
-        else:
-            raise ValueError(f"Unexpected response format: {type(result)}")
-
-        # Convert string tuple keys to actual tuples
-        battlemap = {eval(k): v for k, v in initial_state["battlemap"].items()}
-        
-        end_time = time.time()
-        response_time = end_time - start_time
-        
-        game_state = GameState(
-            battlemap=battlemap,
-            player_pos=tuple(initial_state["player_pos"]),
-            log=[initial_state["initial_description"]],
-            adventure=adventure
-        )
-        
-        return game_state, result.usage.input_tokens, result.usage.output_tokens, result.usage.cache_creation_input_tokens, result.usage.cache_read_input_tokens, response_time
+        game_state = _build_initial_state(adventure, _extract_tool_input(result))
+        response_time = time.time() - start_time
+        return (game_state, *_usage_tuple(result), response_time)
     except Exception as e:
         logger.error(f"Error generating initial state: {str(e)}")
         return None, 0, 0, 0, 0, 0
 
-def update_battlemap_with_ai(game_state: GameState, user_action: str) -> Tuple[GameState, int, int, int, int]:
-    logger.info(f"Updating battlemap with AI for action: {user_action}")
-    
-    if game_state is None:
-        logger.error("Game state is None. Cannot update battlemap.")
-        return None, 0, 0, 0, 0
+async def generate_initial_state_async(adventure: Dict) -> Tuple[Optional[GameState], int, int, int, int, float]:
+    logger.info("Generating initial game state based on adventure setup")
+    start_time = time.time()
+    prompt, llm_config = _initial_state_request(adventure)
 
-    # Prepare the input for the AI
-    battlemap_str = "\n".join([f"{k}: {v}" for k, v in game_state.battlemap.items()])
-    
-    conversation_history = "\n".join(game_state.conversation_history[-5:])  # Include last 5 interactions
-    
-    adventure_context = json.dumps(game_state.adventure)
+    try:
+        result = await ai_utilities.run_ai_tool_completion_async(prompt, llm_config=llm_config)
+        game_state = _build_initial_state(adventure, _extract_tool_input(result))
+        response_time = time.time() - start_time
+        return (game_state, *_usage_tuple(result), response_time)
+    except Exception as e:
+        logger.error(f"Error generating initial state: {str(e)}")
+        return None, 0, 0, 0, 0, 0
+
+BATTLEMAP_MODEL = "claude-3-5-sonnet-20240620"
+
+def _adventure_system_prompt(adventure: Optional[Dict]) -> str:
+    adventure_context = json.dumps(adventure)
     
-    extra_system_prompt = f"""You are an AI dungeon master for a text-based adventure game. Your task is to update the game state based on the player's actions and the current adventure context.
+    return f"""You are an AI dungeon master for a text-based adventure game. Your task is to update the game state based on the player's actions and the current adventure context.
 
 Current adventure context:
 {adventure_context}
@@ -116,94 +201,195 @@ Current adventure context:
 Use this context to inform your responses and guide the player through the adventure. Incorporate elements from the adventure into the game world and narrative.
 
 """
-    system_prompt_final = SYSTEM_PROMPT + extra_system_prompt
+
+def _battlemap_update_request(game_state: GameState, user_action: str, stage: str = "action") -> Tuple[List[Dict], LLMConfig]:
+    # Prepare the input for the AI
+    battlemap_str = game_state.battlemap.to_prompt()
+    
+    extra_system_prompt = _adventure_system_prompt(game_state.adventure)
+    # Layered for prompt caching: the global prompt is shared by every adventure, the adventure block by
+    # every turn of one game, and the conversation grows append-only; only the final turn block is uncached
+    turn_prompt = f"Current battlemap (rows y = 0 to 5, tiles x = 0 to 5):\n{battlemap_str}\nPlayer position: {game_state.player_pos}\nUser action: {user_action}\n\nUpdate the battlemap (only the changed cells for 'same_map', the full map for 'new_map') and provide a brief description of what happened."
     prompt = [
-        {"role": "system", "content": system_prompt_final},
-        {"role": "user", "content": f"Current battlemap:\n{battlemap_str}\nPlayer position: {game_state.player_pos}\nRecent conversation:\n{conversation_history}\nUser action: {user_action}\n\nUpdate the battlemap and provide a brief description of what happened."}
+        {"role": "system", "content": system_layers(SYSTEM_PROMPT, extra_system_prompt)},
+        {"role": "user", "content": conversation_layers(game_state.conversation_history) + [turn_layer(turn_prompt)]}
     ]
 
-    # Define the expected output schema
-    json_schema = {
-        "type": "object",
-        "properties": {
-            "change_type": {
-                "type": "string",
-                "enum": ["same_map", "new_map"],
-                "description": "Indicates whether the action results in the same map layout or a completely new map. Use 'same_map' for actions that don't significantly change the environment, and 'new_map' for actions that lead to a new area or drastically alter the current one."
-            },
-            "battlemap": {
-                "type": "object",
-                "description": "Represents the 6x6 game grid. Each key is a coordinate tuple '(x, y)' where x and y range from 0 to 5. The value is an emoji representing the terrain or object at that location. This should reflect all changes made by the player's action, including environmental changes, item pickups, or NPC movements. Never include player emojis in this map.",
-                "patternProperties": {
-                    "^\\([0-5], [0-5]\\)$": {
-                        "type": "string",
-                        "description": "An emoji representing the terrain or object at this coordinate. Must be one of the emojis defined in the legend (e.g., 🏰, 🌳, 🌾, 🏠, etc.). Never use player emojis (🤺, 🚶, 🤴) here."
-                    }
-                }
-            },
-            "player_pos": {
-                "type": "array",
-                "description": "The player's new position after the action. This should be updated if the player moves, but remain the same if the action doesn't involve movement. The position is represented as [x, y] coordinates.",
-                "items": {
-                    "type": "integer",
-                    "minimum": 0,
-                    "maximum": 5
-                },
-                "minItems": 2,
-                "maxItems": 2
-            },
-            "description": {
-                "type": "string",
-                "description": "A brief, engaging narrative description of what happened as a result of the player's action. This should include details about the environment, any changes to the battlemap, interactions with NPCs or objects, and the outcome of the player's action. The description should be written in second person ('You...') and should be 2-3 sentences long."
-            }
-        },
-        "required": ["change_type", "battlemap", "player_pos", "description"]
-    }
+    # The schema is shared with the system prompt so both always describe the same patch format
+    json_schema = battlemap_update_schema
 
     # Set up the LLMConfig for Anthropic
-    llm_config=LLMConfig(client="anthropic", model="claude-3-5-sonnet-20240620", json_schema=json_schema)
+    # Only the turn a player is waiting on is hedged; speculation is already extra spend
+    llm_config=LLMConfig(client="anthropic", model=BATTLEMAP_MODEL, json_schema=json_schema, stage=stage, deadline=stage_deadline(stage), hedge=HEDGE_ACTIONS and stage == "action", hedge_after=HEDGE_AFTER)
+    return prompt, llm_config
+
+async def warm_battlemap_cache_async(adventure: Dict) -> Tuple[int, int]:
+    # Writes (or refreshes) the cached tools + global + adventure prefix that every turn of this adventure reads.
+    # Same layers and schema as _battlemap_update_request, one output token. Returns (cache_creation, cache_read).
+    prompt = [
+        {"role": "system", "content": system_layers(SYSTEM_PROMPT, _adventure_system_prompt(adventure))},
+        {"role": "user", "content": "Cache warm-up, no action."}
+    ]
+    llm_config = LLMConfig(client="anthropic", model=BATTLEMAP_MODEL, json_schema=battlemap_update_schema, max_tokens=1, use_response_cache=False, stage="cache_warmup", deadline=stage_deadline("cache_warmup"))
+    result = await ai_utilities.run_ai_tool_completion_async(prompt, llm_config=llm_config)
+    if isinstance(result, str):
+        raise RuntimeError(result)
+    _, _, cache_creation_tokens, cache_read_tokens = _usage_tuple(result)
+    return cache_creation_tokens, cache_read_tokens
+
+def _apply_battlemap_update(game_state: GameState, user_action: str, response: Dict) -> GameState:
+    change_type = response["change_type"]
+    if change_type == "same_map" and "battlemap" not in response:
+        # Patch mode: only the changed cells are sent back for the current map
+        updated_battlemap = game_state.battlemap.copy()
+        changes = response.get("changes", [])
+        for change in changes:
+            position = (change["x"], change["y"])
+            if updated_battlemap.in_bounds(position):
+                updated_battlemap[position] = change["tile"]
+        patched_cells = len(changes)
+    else:
+        updated_battlemap = Grid.from_rows(response["battlemap"])
+        patched_cells = None
+    
+    # Create a new GameState from the updated state
+    return advance_state(game_state, user_action, updated_battlemap, tuple(response["player_pos"]), response["description"], change_type, patched_cells)
+
+def advance_state(game_state: GameState, user_action: str, battlemap: Grid, player_pos: Tuple[int, int], description: str, change_type: str, patched_cells: Optional[int]) -> GameState:
+    # The one place a turn is appended to the log and conversation; model turns, local moves and replays all go through it
+    return game_state.evolve(
+        battlemap=battlemap,
+        player_pos=player_pos,
+        last_action=user_action,
+        log=game_state.log + [f"AI response: {description}"],
+        conversation_history=game_state.conversation_history + [f"User action: {user_action}", f"AI response: {description}"],
+        change_type=change_type,
+        patched_cells=patched_cells,
+        cache_layers=None
+    )
+
+def parse_move_action(user_action: str) -> Optional[Tuple[str, int]]:
+    # "move north", "go left 2", "W" -> (direction, steps); None for anything else
+    match = _MOVE_ACTION.fullmatch(" ".join(user_action.lower().strip(" .!").split()))
+    if match is None:
+        return None
+    direction = DIRECTION_WORDS.get(match.group("direction"), match.group("direction"))
+    steps = match.group("steps") or "1"
+    steps = _NUMBER_WORDS.get(steps) or int(steps)
+    return (direction, steps) if steps > 0 else None
+
+def interpret_local_action(game_state: GameState, user_action: str) -> Optional[GameState]:
+    # Deterministic fast path for plain movement: tiles don't change, only player_pos and the narration.
+    # Returns None whenever the model is needed (not a move, leaving the map, stepping onto anything interesting).
+    if not LOCAL_MOVES or game_state is None:
+        return None
+    move = parse_move_action(user_action)
+    if move is None:
+        return None
+    direction, steps = move
+    dx, dy = DIRECTIONS[direction]
+    x, y = game_state.player_pos
+    moved, blocked_by = 0, None
+    for _ in range(steps):
+        target = (x + dx, y + dy)
+        if not game_state.battlemap.in_bounds(target):
+            return None
+        tile = game_state.battlemap[target]
+        if tile in IMPASSABLE_TILES:
+            blocked_by = TILE_NAMES[tile].lower()
+            break
+        if tile not in WALKABLE_TILES:
+            return None
+        x, y = target
+        moved += 1
+
+    if moved == 0:
+        description = f"The {blocked_by} blocks your way {direction}."
+    else:
+        description = f"You walk {direction}." if moved == 1 else f"You walk {moved} tiles {direction}."
+        if blocked_by:
+            description += f" The {blocked_by} blocks you from going further."
+    return advance_state(game_state, user_action, game_state.battlemap.copy(), (x, y), description, 'same_map', 0)
+
+def update_battlemap_with_ai(game_state: GameState, user_action: str) -> Tuple[GameState, int, int, int, int]:
+    logger.info(f"Updating battlemap with AI for action: {user_action}")
+    
+    if game_state is None:
+        logger.error("Game state is None. Cannot update battlemap.")
+        return None, 0, 0, 0, 0
+
+    local_state = interpret_local_action(game_state, user_action)
+    if local_state is not None:
+        return local_state, 0, 0, 0, 0
+
+    prompt, llm_config = _battlemap_update_request(game_state, user_action)
 
     # Make the API call
     try:
         result = ai_utilities.run_ai_tool_completion(prompt, llm_config=llm_config)
         logger.info(f"AI response received: {result}")
-        
-        # Parse the result
-        if isinstance(result, str):
-            response = json.loads(result)
-        elif isinstance(result, dict):
-            response = result
-        elif hasattr(result, 'content') and isinstance(result.content, list):
-            for content_item in result.content:
-                if isinstance(content_item, ToolUseBlock):
-                    response = content_item.input
-                    break
-            else:
-                raise ValueError("No ToolUseBlock found in the response")
-        else:
-            raise ValueError("Unexpected response format")
-        
-        # Convert string tuple keys to actual tuples
-        updated_battlemap = {eval(k): v for k, v in response["battlemap"].items()}
-        
-        # Remove any player emoji from the battlemap
-        for k, v in updated_battlemap.items():
-            if v in ['🤺', '🚶', '🤴']:
-                updated_battlemap[k] = '🌾'  # Replace with grass or appropriate terrain
-        
-        # Create a new GameState from the updated state
-        new_state = GameState(
-            battlemap=updated_battlemap,
-            player_pos=tuple(response["player_pos"]),
-            last_action=user_action,
-            log=game_state.log + [f"AI response: {response['description']}"],
-            conversation_history=game_state.conversation_history + [f"User action: {user_action}", f"AI response: {response['description']}"],
-            change_type=response["change_type"],
-            adventure=game_state.adventure
-        )
-        
+        new_state = _apply_battlemap_update(game_state, user_action, _extract_tool_input(result))
+        _record_cache_layers(new_state, prompt, llm_config, result)
+        logger.info(f"New game state created: {new_state}")
+        return (new_state, *_usage_tuple(result))
+    except Exception as e:
+        logger.error(f"Error updating game state: {str(e)}")
+        return None, 0, 0, 0, 0
+
+async def update_battlemap_with_ai_async(game_state: GameState, user_action: str, stage: str = "action") -> Tuple[GameState, int, int, int, int]:
+    logger.info(f"Updating battlemap with AI for action: {user_action}")
+    
+    if game_state is None:
+        logger.error("Game state is None. Cannot update battlemap.")
+        return None, 0, 0, 0, 0
+
+    local_state = interpret_local_action(game_state, user_action)
+    if local_state is not None:
+        return local_state, 0, 0, 0, 0
+
+    prompt, llm_config = _battlemap_update_request(game_state, user_action, stage)
+
+    try:
+        result = await ai_utilities.run_ai_tool_completion_async(prompt, llm_config=llm_config)
+        logger.info(f"AI response received: {result}")
+        new_state = _apply_battlemap_update(game_state, user_action, _extract_tool_input(result))
+        _record_cache_layers(new_state, prompt, llm_config, result)
+        logger.info(f"New game state created: {new_state}")
+        return (new_state, *_usage_tuple(result))
+    except Exception as e:
+        logger.error(f"Error updating game state: {str(e)}")
+        return None, 0, 0, 0, 0
+
+async def stream_battlemap_update_async(game_state: GameState, user_action: str) -> AsyncIterator[Tuple[str, Any]]:
+    # Yields ("partial", {"description": ...} / {"player_pos": ...}) as soon as each field is complete,
+    # then exactly one ("final", (new_state, input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens)).
+    logger.info(f"Streaming battlemap update for action: {user_action}")
+
+    if game_state is None:
+        logger.error("Game state is None. Cannot update battlemap.")
+        yield "final", (None, 0, 0, 0, 0)
+        return
+
+    local_state = interpret_local_action(game_state, user_action)
+    if local_state is not None:
+        yield "final", (local_state, 0, 0, 0, 0)
+        return
+
+    prompt, llm_config = _battlemap_update_request(game_state, user_action)
+
+    try:
+        result = None
+        async for event in ai_utilities.stream_ai_tool_completion_async(prompt, llm_config=llm_config):
+            if event["type"] == "field" and event["name"] in ("description", "player_pos"):
+                yield "partial", {event["name"]: event["value"]}
+            elif event["type"] == "message":
+                result = event["message"]
+            elif event["type"] == "error":
+                raise RuntimeError(event["error"])
+        new_state = _apply_battlemap_update(game_state, user_action, _extract_tool_input(result))
+        _record_cache_layers(new_state, prompt, llm_config, result)
         logger.info(f"New game state created: {new_state}")
-        return new_state, result.usage.input_tokens, result.usage.output_tokens, result.usage.cache_creation_input_tokens, result.usage.cache_read_input_tokens
+        yield "final", (new_state, *_usage_tuple(result))
     except Exception as e:
         logger.error(f"Error updating game state: {str(e)}")
-        return None, 0, 0, 0, 0
\ No newline at end of file
+        yield "final", (None, 0, 0, 0, 0)
@@ -0,0 +1,200 @@
+import logging
+import re
+import threading
+from array import array
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from prompt import legend, PLAYER_EMOJIS
+
+logger = logging.getLogger(__name__)
+
+GRID_WIDTH = 6
+GRID_HEIGHT = 6
+EMPTY_TILE = " "
+EMPTY_TOKEN = "."  # stands in for EMPTY_TILE in the dense row encoding so rows stay whitespace-separated
+UNKNOWN_TILE = "❔"  # a tile that could not be kept; never walkable, so moves onto it go to the model
+MAX_EXTRA_TILES = 4096  # non-legend tiles remembered, about every emoji there is
+
+_COORD_KEY = re.compile(r"\(\s*(\d+)\s*,\s*(\d+)\s*\)")
+
+
+def _tile_key(symbol: str) -> str:
+    # The model drops or adds the emoji variation selector at will: 🏛 and 🏛️ are the same tile
+    return symbol.strip().replace("\ufe0f", "")
+
+
+# One tile: a flag (two regional indicators), or a character with its modifiers (variation selector, keycap,
+# skin tone) and any ZWJ-joined parts. Splits rows the model wrote without separators.
+_MODIFIERS = "\ufe0f\u20e3\U0001F3FB-\U0001F3FF"
+_TILE_TOKEN = re.compile(rf"[\U0001F1E6-\U0001F1FF]{{2}}|\S[{_MODIFIERS}]*(?:\u200d\S[{_MODIFIERS}]*)*")
+
+
+def _is_tile(key: str) -> bool:
+    # Emoji and other non-ASCII symbols are tiles; words and stray punctuation are not
+    return bool(key) and not key.isascii() and _TILE_TOKEN.fullmatch(key) is not None
+
+
+class TileTable:
+    """Table of tile emojis and their small integer codes; code 0 is the empty tile, code 1 the unknown tile.
+
+    The given symbols get fixed codes. Other tiles the model draws (🪑, 🚪, 🏔️, ...) are added on first sight,
+    up to `max_extra` of them; codes are shared by every grid, so entries are never evicted. Anything that isn't
+    a single emoji, and any new tile once the table is full, maps to UNKNOWN_TILE. `aliases` maps extra symbols
+    onto known tiles.
+    """
+
+    def __init__(self, symbols: Iterable[str] = (), aliases: Optional[Dict[str, str]] = None, max_extra: int = MAX_EXTRA_TILES):
+        self._codes: Dict[str, int] = {}
+        self._symbols: List[str] = []
+        for symbol in (EMPTY_TILE, UNKNOWN_TILE, *symbols):
+            if _tile_key(symbol) not in self._codes:
+                self._codes[_tile_key(symbol)] = len(self._symbols)
+                self._symbols.append(symbol)
+        for alias, symbol in (aliases or {}).items():
+            self._codes[_tile_key(alias)] = self._codes[_tile_key(symbol)]
+        self.unknown = self._codes[_tile_key(UNKNOWN_TILE)]
+        self.fixed = len(self._symbols)
+        self.max_extra = max_extra
+        self._lock = threading.Lock()
+
+    def lookup(self, symbol: str) -> Optional[int]:
+        return self._codes.get(_tile_key(symbol)) if symbol != EMPTY_TILE else 0
+
+    def code(self, symbol: str) -> int:
+        code = self.lookup(symbol)
+        if code is not None:
+            return code
+        key = _tile_key(symbol)
+        if not _is_tile(key):
+            logger.warning(f"Unknown tile {symbol!r}, using {UNKNOWN_TILE}")
+            return self.unknown
+        with self._lock:
+            code = self._codes.get(key)
+            if code is None:
+                if len(self._symbols) - self.fixed >= self.max_extra:
+                    logger.warning(f"Tile table is full, using {UNKNOWN_TILE} for {symbol!r}")
+                    return self.unknown
+                code = self._codes[key] = len(self._symbols)
+                self._symbols.append(symbol.strip())
+        return code
+
+    def symbol(self, code: int) -> str:
+        return self._symbols[code]
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+
+# Legend tiles get the lowest codes; a player emoji on the map stands for the grass the player stands on
+TILES = TileTable((emoji for emoji, _ in legend), aliases={emoji: "🌾" for emoji in PLAYER_EMOJIS})
+
+
+def split_row(row: str, width: int) -> Optional[List[str]]:
+    # The row's tiles, or None when it doesn't hold exactly `width` of them
+    symbols = row.split()
+    if len(symbols) < width:
+        symbols = _TILE_TOKEN.findall("".join(symbols))
+    return symbols if len(symbols) == width else None
+
+
+class Grid:
+    """Row-major battlemap storing one interned tile code per cell."""
+
+    __slots__ = ("width", "height", "cells")
+
+    def __init__(self, width: int = GRID_WIDTH, height: int = GRID_HEIGHT, cells: Optional[array] = None):
+        self.width = width
+        self.height = height
+        self.cells = cells if cells is not None else array("H", bytes(2 * width * height))
+
+    @classmethod
+    def from_dict(cls, battlemap: Dict[Union[Tuple[int, int], str], str], width: int = GRID_WIDTH, height: int = GRID_HEIGHT) -> "Grid":
+        grid = cls(width, height)
+        for key, symbol in battlemap.items():
+            if isinstance(key, str):
+                match = _COORD_KEY.fullmatch(key.strip())
+                if match is None:
+                    raise ValueError(f"Invalid battlemap key: {key}")
+                key = (int(match.group(1)), int(match.group(2)))
+            grid[key] = symbol
+        return grid
+
+    @classmethod
+    def from_rows(cls, rows: Union[str, List[str]], width: int = GRID_WIDTH, height: int = GRID_HEIGHT) -> "Grid":
+        # Dense encoding: one row per line/item, tiles separated by whitespace. Rows the model wrote without
+        # separators are split into single emojis; a map of the wrong size is rejected rather than padded.
+        if isinstance(rows, str):
+            rows = rows.strip("\n").split("\n")
+        if len(rows) != height:
+            raise ValueError(f"Battlemap has {len(rows)} rows instead of {height}: {rows!r}")
+        grid = cls(width, height)
+        cells = grid.cells
+        for y, row in enumerate(rows):
+            symbols = split_row(row, width)
+            if symbols is None:
+                raise ValueError(f"Battlemap row {y} does not have {width} tiles: {row!r}")
+            for x, symbol in enumerate(symbols):
+                if symbol != EMPTY_TOKEN:
+                    cells[y * width + x] = TILES.code(symbol)
+        return grid
+
+    def to_rows(self) -> List[str]:
+        symbols = [TILES.symbol(code) if code else EMPTY_TOKEN for code in self.cells]
+        return [" ".join(symbols[y * self.width:(y + 1) * self.width]) for y in range(self.height)]
+
+    def to_prompt(self) -> str:
+        return "\n".join(self.to_rows())
+
+    def to_dict(self) -> Dict[Tuple[int, int], str]:
+        return dict(self.items())
+
+    def __getitem__(self, pos: Tuple[int, int]) -> str:
+        x, y = pos
+        return TILES.symbol(self.cells[y * self.width + x])
+
+    def __setitem__(self, pos: Tuple[int, int], symbol: str):
+        x, y = pos
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError(f"Position {pos} is outside the {self.width}x{self.height} grid")
+        self.cells[y * self.width + x] = TILES.code(symbol)
+
+    def get(self, pos: Tuple[int, int], default: str = EMPTY_TILE) -> str:
+        x, y = pos
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return self[pos]
+        return default
+
+    def in_bounds(self, pos: Tuple[int, int]) -> bool:
+        x, y = pos
+        return 0 <= x < self.width and 0 <= y < self.height
+
+    def items(self) -> Iterator[Tuple[Tuple[int, int], str]]:
+        width = self.width
+        for index, code in enumerate(self.cells):
+            yield (index % width, index // width), TILES.symbol(code)
+
+    def replace(self, symbols: Iterable[str], replacement: str):
+        codes = {code for code in map(TILES.lookup, symbols) if code is not None}
+        new_code = TILES.code(replacement)
+        cells = self.cells
+        for index, code in enumerate(cells):
+            if code in codes:
+                cells[index] = new_code
+
+    def diff(self, other: "Grid") -> List[Tuple[Tuple[int, int], str]]:
+        # Cells whose tile differs in `other`, with the tile they have there
+        if (self.width, self.height) != (other.width, other.height):
+            return list(other.items())
+        width = other.width
+        return [
+            ((index % width, index // width), TILES.symbol(new))
+            for index, (old, new) in enumerate(zip(self.cells, other.cells)) if old != new
+        ]
+
+    def copy(self) -> "Grid":
+        return Grid(self.width, self.height, array("H", self.cells))
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, Grid) and self.width == other.width and self.height == other.height and self.cells == other.cells
+
+    def __repr__(self) -> str:
+        return f"Grid({self.width}x{self.height})"
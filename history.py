@@ -0,0 +1,114 @@
+from collections.abc import Sequence
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+CHUNK_SIZE = 32
+
+
+class _Chunk:
+    """A full, immutable block of entries linked to the blocks before it."""
+
+    __slots__ = ("entries", "parent", "length")
+
+    def __init__(self, entries: Tuple[str, ...], parent: Optional["_Chunk"]):
+        self.entries = entries
+        self.parent = parent
+        self.length = len(entries) + (parent.length if parent is not None else 0)
+
+
+class History(Sequence):
+    """Append-only persistent list of log entries.
+
+    `history + [entry]` returns a new History that shares every full chunk with the old one and only copies
+    the short tail, so each turn costs O(CHUNK_SIZE) however long the game is, and the states kept in
+    `state_history` don't each hold their own copy of the log. Reads near the end (the prompt window,
+    the latest log line) only touch the last chunks.
+    """
+
+    __slots__ = ("_chunks", "_tail", "_length")
+
+    def __init__(self, entries: Iterable[str] = ()):
+        self._chunks: Optional[_Chunk] = None
+        self._tail: Tuple[str, ...] = ()
+        self._length = 0
+        self._extend(entries)
+
+    @classmethod
+    def _make(cls, chunks: Optional[_Chunk], tail: Tuple[str, ...]) -> "History":
+        history = cls.__new__(cls)
+        history._chunks = chunks
+        history._tail = tail
+        history._length = len(tail) + (chunks.length if chunks is not None else 0)
+        return history
+
+    def _extend(self, entries: Iterable[str]):
+        # only used while constructing a new History, never on one that is already shared
+        chunks, tail = self._chunks, list(self._tail)
+        for entry in entries:
+            tail.append(entry)
+            if len(tail) == CHUNK_SIZE:
+                chunks, tail = _Chunk(tuple(tail), chunks), []
+        self._chunks, self._tail = chunks, tuple(tail)
+        self._length = len(self._tail) + (chunks.length if chunks is not None else 0)
+
+    def __add__(self, entries: Iterable[str]) -> "History":
+        entries = tuple(entries)
+        if len(self._tail) + len(entries) < CHUNK_SIZE:
+            return self._make(self._chunks, self._tail + entries)
+        history = self._make(self._chunks, self._tail)
+        history._extend(entries)
+        return history
+
+    def __len__(self) -> int:
+        return self._length
+
+    def _chunk_list(self) -> List[Tuple[str, ...]]:
+        blocks = [self._tail]
+        chunk = self._chunks
+        while chunk is not None:
+            blocks.append(chunk.entries)
+            chunk = chunk.parent
+        blocks.reverse()
+        return blocks
+
+    def __iter__(self) -> Iterator[str]:
+        for block in self._chunk_list():
+            yield from block
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(self._length)
+            if step == 1:
+                return self._range(start, stop)
+            return list(self)[index]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError("History index out of range")
+        return self._range(index, index + 1)[0]
+
+    def _range(self, start: int, stop: int) -> List[str]:
+        # Walks back from the tail and stops at the first chunk before `start`
+        if start >= stop:
+            return []
+        blocks = []
+        block_start = self._length - len(self._tail)
+        if stop > block_start:
+            blocks.append(self._tail[max(0, start - block_start):stop - block_start])
+        chunk = self._chunks
+        while chunk is not None and chunk.length > start:
+            block_start = chunk.length - len(chunk.entries)
+            if block_start < stop:
+                blocks.append(chunk.entries[max(0, start - block_start):stop - block_start])
+            chunk = chunk.parent
+        entries: List[str] = []
+        for block in reversed(blocks):
+            entries.extend(block)
+        return entries
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, (History, list, tuple)):
+            return len(self) == len(other) and all(a == b for a, b in zip(self, other))
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"History({len(self)} entries)"
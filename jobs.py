@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pydantic import BaseModel
+from config import config_from_env
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    """One background generation; `progress` is a short human-readable status for the polling front-end."""
+
+    def __init__(self, kind: str, key: str, factory: Callable[["Job"], Awaitable[Any]]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.key = key
+        self.status = "queued"  # queued -> running -> done | failed
+        self.progress = "Waiting for a free worker"
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created = time.monotonic()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self._factory = factory
+
+    def report(self, progress: str):
+        self.progress = progress
+
+    @property
+    def elapsed(self) -> float:
+        return (self.finished or time.monotonic()) - self.created
+
+
+class JobQueueConfig(BaseModel):
+    max_workers: int = 4  # generations running at once
+    max_queued: int = 100  # waiting jobs before new submissions are refused
+    result_ttl: float = 600.0  # seconds a finished job stays available to pollers
+
+    @classmethod
+    def from_env(cls) -> "JobQueueConfig":
+        return config_from_env(cls, "JOBS")
+
+
+class JobQueue:
+    """In-process queue of generation jobs served by a fixed pool of worker tasks."""
+
+    def __init__(self, config: Optional[JobQueueConfig] = None):
+        self.config = config or JobQueueConfig.from_env()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()  # by id, in submission order
+        self._inflight: Dict[str, Job] = {}  # by dedupe key, queued or running
+        self._waiting: List[Job] = []
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self.submitted = 0
+        self.deduplicated = 0
+        self.rejected = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, kind: str, key: str, factory: Callable[[Job], Awaitable[Any]]) -> Optional[Job]:
+        # Identical in-flight jobs are shared; returns None when the queue is full
+        self._expire()
+        job = self._inflight.get(key)
+        if job is not None:
+            self.deduplicated += 1
+            return job
+        if len(self._waiting) >= self.config.max_queued:
+            self.rejected += 1
+            return None
+        job = Job(kind, key, factory)
+        self._jobs[job.id] = job
+        self._inflight[key] = job
+        self._waiting.append(job)
+        self._queue.put_nowait(job)
+        self.submitted += 1
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._expire()
+        return self._jobs.get(job_id)
+
+    def position(self, job: Job) -> int:
+        # 1-based place in the waiting line, 0 once the job has started
+        return self._waiting.index(job) + 1 if job in self._waiting else 0
+
+    def start(self):
+        if not self._workers:
+            self._workers = [asyncio.create_task(self._worker()) for _ in range(self.config.max_workers)]
+
+    async def stop(self):
+        for worker in self._workers:
+            worker.cancel()
+        self._workers = []
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            self._waiting.remove(job)
+            job.status = "running"
+            job.started = time.monotonic()
+            job.report("Generating")
+            try:
+                job.result = await job._factory(job)
+                job.status = "done"
+                self.completed += 1
+            except asyncio.CancelledError:
+                job.status, job.error = "failed", "Cancelled"
+                raise
+            except Exception as e:
+                logger.error(f"Job {job.kind} {job.id} failed: {str(e)}")
+                job.status, job.error = "failed", str(e)
+                self.failed += 1
+            finally:
+                job.finished = time.monotonic()
+                self._inflight.pop(job.key, None)
+
+    def _expire(self):
+        now = time.monotonic()
+        for job_id, job in list(self._jobs.items()):
+            if job.finished is not None and now - job.finished > self.config.result_ttl:
+                del self._jobs[job_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "queued": len(self._waiting),
+            "running": len(self._inflight) - len(self._waiting),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "completed": self.completed,
+            "failed": self.failed,
+        }
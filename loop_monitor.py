@@ -0,0 +1,77 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+from pydantic import BaseModel
+from config import config_from_env
+import anyio.to_thread
+import metrics
+
+logger = logging.getLogger(__name__)
+
+UTILIZATION_BUCKETS = (0.1, 0.25, 0.5, 0.75, 0.9, 1.0)
+
+
+class LoopMonitorConfig(BaseModel):
+    enabled: bool = True
+    interval: float = 0.1  # seconds between probes
+    warn_lag: float = 0.5  # log when a probe wakes up this much later than asked
+
+    @classmethod
+    def from_env(cls) -> "LoopMonitorConfig":
+        return config_from_env(cls, "LOOP_MONITOR", switch="LOOP_MONITOR")
+
+
+class LoopMonitor:
+    """Samples event-loop lag and the sync-handler thread pool.
+
+    A probe sleeps for `interval` and records how late it woke up: time the loop spent running other callbacks
+    (blocking code, long renders). Sync routes run on anyio's default thread limiter, so its borrowed tokens are
+    the busy worker threads; when they reach the limit, further sync requests queue.
+    """
+
+    def __init__(self, config: Optional[LoopMonitorConfig] = None):
+        self.config = config or LoopMonitorConfig.from_env()
+        self._task: Optional[asyncio.Task] = None
+        self.max_lag = 0.0
+        self.threads_busy = 0
+        self.threads_limit = 0
+        self.saturated_samples = 0
+        self.lag = metrics.registry.histogram("event_loop_lag_seconds", "How late a timer probe woke up", buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0))
+        self.utilization = metrics.registry.histogram("threadpool_utilization", "Busy share of the sync-handler thread pool, per probe", buckets=UTILIZATION_BUCKETS)
+        metrics.registry.gauge("event_loop_lag_max_seconds", "Largest event-loop lag seen since startup", lambda: {(): self.max_lag})
+        metrics.registry.gauge("threadpool_threads", "Sync-handler worker threads", lambda: {("busy",): self.threads_busy, ("limit",): self.threads_limit}, ("state",))
+        metrics.registry.gauge("threadpool_saturated_samples", "Probes that found every worker thread busy", lambda: {(): self.saturated_samples})
+
+    def start(self):
+        if self.config.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self):
+        limiter = anyio.to_thread.current_default_thread_limiter()
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.config.interval)
+            lag = max(0.0, time.perf_counter() - start - self.config.interval)
+            self.lag.observe(lag)
+            if lag > self.max_lag:
+                self.max_lag = lag
+            if lag >= self.config.warn_lag:
+                logger.warning(f"Event loop blocked for {lag:.3f}s")
+            self.threads_busy, self.threads_limit = limiter.borrowed_tokens, int(limiter.total_tokens)
+            self.utilization.observe(self.threads_busy / self.threads_limit if self.threads_limit else 0.0)
+            if self.threads_busy >= self.threads_limit:
+                self.saturated_samples += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "max_lag": self.max_lag,
+            "threads_busy": self.threads_busy,
+            "threads_limit": self.threads_limit,
+            "saturated_samples": self.saturated_samples,
+        }
@@ -1,43 +1,197 @@
 from fasthtml.common import *
-from core import GameState, update_battlemap_with_ai, generate_initial_state
+from core import GameState, StepSnapshot, interpret_local_action, update_battlemap_with_ai_async, generate_initial_state_async, stream_battlemap_update_async
 from story_generation import generate_adventure
-from typing import Dict, Tuple, List
-from markupsafe import Markup
-from collections import deque
+from grid import Grid
+from aiutilities import get_shared_ai_utilities
+from adventure_pool import AdventurePool
+from speculation import SpeculationEngine
+from session_store import GameSession, SessionStore
+from persistence import GameEventStore, GameEventStoreConfig
+from channels import ChannelHub
+from jobs import Job, JobQueue
+from cache_warmer import CacheWarmer, adventure_key
+import metrics
+from loop_monitor import LoopMonitor
+from turns import Turn, TurnRegistry
+from typing import Dict, Tuple, Optional
+from markupsafe import Markup, escape
 import time
 import asyncio
-import json
 import logging
+import os
 
 app, rt = fast_app()
 
-game_state = None
-state_history = deque(maxlen=50)
-current_adventure = None
+# Model turns run in the background and push their progress over the session's event channel,
+# so /action returns at once instead of holding the request for the whole completion
+STREAM_TURNS = os.getenv("STREAM_TURNS", "1") == "1"
+channels = ChannelHub()
+# One model turn per session at a time: identical actions join it, others queue behind it (up to a limit)
+turns = TurnRegistry()
+app.router.on_shutdown.append(turns.stop)
+
+# Adventure and initial-state generations run on a bounded worker pool; the page polls /jobs/{id}
+jobs = JobQueue()
+app.router.on_startup.append(jobs.start)
+app.router.on_shutdown.append(jobs.stop)
+GAME_PAGE_SIZE = int(os.getenv("GAME_PAGE_SIZE", "5"))  # steps rendered per /game page, older ones load on scroll
 
 logger = logging.getLogger(__name__)
+ai_utilities = get_shared_ai_utilities()
+adventure_pool = AdventurePool()
+app.router.on_startup.append(adventure_pool.start)
+app.router.on_shutdown.append(adventure_pool.stop)
+# Precomputes likely next actions while the player reads the last step
+speculation = SpeculationEngine()
+app.router.on_shutdown.append(speculation.stop)
+session_store = SessionStore()
+session_store.on_evict.append(speculation.forget)
+session_store.on_evict.append(channels.discard)
+session_store.on_evict.append(turns.cancel)
+app.router.on_startup.append(session_store.start)
+app.router.on_shutdown.append(session_store.stop)
+
+# Keeps the battlemap prompt prefix in Anthropic's cache from game start until the player goes idle
+cache_warmer = CacheWarmer()
+app.router.on_startup.append(cache_warmer.start)
+app.router.on_shutdown.append(cache_warmer.stop)
+session_store.on_evict.append(cache_warmer.forget)
+
+metrics.registry.gauge("sessions_live", "Games held in the session store", lambda: {(): session_store.stats()["live_sessions"]})
+metrics.registry.gauge("event_stream_clients", "Connected /events streams", lambda: {(): channels.stats()["connected"]})
+metrics.registry.gauge("generation_jobs", "Generation jobs waiting or running", lambda: {(state,): count for state, count in jobs.stats().items() if state in ("queued", "running")}, ("state",))
+metrics.registry.gauge("turn_tasks", "Model turns in progress", lambda: {(): turns.running()})
+metrics.registry.gauge("turns_waiting", "Actions queued behind a session's running turn", lambda: {(): turns.stats()["waiting"]})
+# Event-loop lag and sync-handler thread pool use, for load tests and capacity planning
+loop_monitor = LoopMonitor()
+app.router.on_startup.append(loop_monitor.start)
+app.router.on_shutdown.append(loop_monitor.stop)
+
+# Turns are appended to an event log so games survive restarts and evictions
+event_store_config = GameEventStoreConfig.from_env()
+event_store = GameEventStore(event_store_config) if event_store_config.enabled else None
+if event_store is not None:
+    app.router.on_shutdown.append(event_store.close)
+
+async def restore_game(game: GameSession):
+    # Off the event loop: restoring reads SQLite and may wait for the writer thread
+    try:
+        history = await asyncio.to_thread(event_store.restore, game.session_id)
+    except Exception as e:
+        logger.error(f"Failed to restore session {game.session_id}: {str(e)}")
+        return
+    if history:
+        game.restore(history, last_step=event_store.turns(game.session_id) + 1)
+        if game.current_adventure:
+            cache_warmer.warm(game.session_id, game.current_adventure)
 
-def render_map(battlemap: Dict[Tuple[int, int], str], player_pos: Tuple[int, int]):
+if event_store is not None:
+    session_store.on_create.append(restore_game)
+
+async def game_session(session) -> GameSession:
+    # The signed session cookie only carries the id; the game itself lives in the in-process store
+    game = await session_store.open(session.get("sid"))
+    session["sid"] = game.session_id
+    return game
+
+def commit_turn(game: GameSession, new_state: GameState, usage: Tuple[int, int, int, int], response_time: float) -> StepSnapshot:
+    previous_state = game.game_state
+    snapshot = game.advance(new_state, usage, response_time)
+    if event_store is not None:
+        event_store.record_turn(game.session_id, previous_state, new_state, usage)
+    cache_warmer.touch(game.session_id, used_cache=usage[2] + usage[3] > 0)
+    speculation.speculate(game.session_id, new_state)
+    return snapshot
+
+def render_map(battlemap: Grid, player_pos: Tuple[int, int]):
     map_str = ""
-    for y in range(6):
-        for x in range(6):
+    for y in range(battlemap.height):
+        for x in range(battlemap.width):
             if (x, y) == player_pos:
                 map_str += '<span class="player">🤺</span>'
             else:
-                map_str += battlemap.get((x, y), ' ')
+                map_str += escape(battlemap[(x, y)])  # tiles come from the model
         map_str += '\n'
     return Pre(Markup(map_str), cls="game-map")
 
-def render_step(state: GameState, action: str, reaction: str, input_tokens: int, output_tokens: int, response_time: float, cache_creation_tokens: int, cache_read_tokens: int):
+def render_cell(battlemap: Grid, player_pos: Tuple[int, int], pos: Tuple[int, int], **kwargs):
+    x, y = pos
+    if pos == player_pos:
+        return Span("🤺", id=f"cell-{x}-{y}", cls="player", **kwargs)
+    return Span(battlemap[pos], id=f"cell-{x}-{y}", **kwargs)
+
+def render_live_map(battlemap: Grid, player_pos: Tuple[int, int], **kwargs):
+    # One addressable span per cell so turns can swap just the cells that changed
+    map_str = ""
+    for y in range(battlemap.height):
+        for x in range(battlemap.width):
+            if (x, y) == player_pos:
+                map_str += f'<span id="cell-{x}-{y}" class="player">🤺</span>'
+            else:
+                map_str += f'<span id="cell-{x}-{y}">{escape(battlemap[(x, y)])}</span>'
+        map_str += '\n'
+    return Pre(Markup(map_str), id="live-map", cls="game-map", **kwargs)
+
+def render_map_patch(previous: Optional[GameState], state: StepSnapshot):
+    # Out-of-band swaps for the live map: changed tiles plus the player's old and new cells,
+    # or the whole map when most of it changed (new_map turns)
+    if previous is None:
+        return (render_live_map(state.battlemap, state.player_pos, hx_swap_oob="true"),)
+    changed = {pos for pos, _ in previous.battlemap.diff(state.battlemap)}
+    if len(changed) > state.battlemap.width * state.battlemap.height // 2:
+        return (render_live_map(state.battlemap, state.player_pos, hx_swap_oob="true"),)
+    if previous.player_pos != state.player_pos:
+        changed.update(pos for pos in (previous.player_pos, state.player_pos) if state.battlemap.in_bounds(pos))
+    return tuple(render_cell(state.battlemap, state.player_pos, pos, hx_swap_oob="true") for pos in sorted(changed))
+
+def render_cache_stats():
+    if ai_utilities.response_cache is None:
+        return P("Response cache: disabled")
+    stats = ai_utilities.response_cache.stats()
+    return P(f"Response cache: {stats['memory_hits'] + stats['disk_hits']} hits / {stats['misses']} misses")
+
+def render_warmer_stats():
+    if not cache_warmer.config.enabled:
+        return P("Prompt cache warmer: disabled")
+    stats = cache_warmer.stats()
+    return P(f"Prompt cache warmer: {stats['warmups']} warm-ups, {stats['refreshes']} refreshes, {stats['hits']} hits / {stats['misses']} misses")
+
+def render_speculation_stats():
+    if not speculation.config.enabled:
+        return P("Speculation: disabled")
+    stats = speculation.stats()
+    return P(f"Speculation: {stats['hits']} hits / {stats['misses']} misses ({stats['hit_rate']:.0%}), {stats['launched']} launched, {stats['cancelled']} cancelled")
+
+def render_session_stats():
+    stats = session_store.stats()
+    channel_stats = channels.stats()
+    return P(f"Sessions: {stats['live_sessions']} live, {stats['evictions']} evicted, {channel_stats['connected']} connected")
+
+def render_server_stats(**kwargs):
+    # Process-wide figures change after a step is rendered, so they live outside the cached step fragments
+    # and are swapped in out of band with every new step
     return Div(
-        H3(f"Step {len(state_history)}"),
+        H4("Server Statistics"),
+        render_cache_stats(),
+        render_warmer_stats(),
+        render_speculation_stats(),
+        render_session_stats(),
+        id="server-stats",
+        cls="statistics",
+        **kwargs
+    )
+
+def render_step(state: StepSnapshot, with_map: bool = True):
+    input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens = state.usage
+    return Div(
+        H3(f"Step {state.step}"),
         Div(
             H4("World State"),
             Div(
                 Div(
                     render_map(state.battlemap, state.player_pos),
                     cls="world-state"
-                ),
+                ) if with_map else "",
                 Div(
                     H4("Statistics"),
                     P(f"Input tokens: {input_tokens}"),
@@ -45,12 +199,52 @@ def render_step(state: GameState, action: str, reaction: str, input_tokens: int,
                     P(f"Total tokens: {input_tokens + output_tokens}"),
                     P(f"Cache creation tokens: {cache_creation_tokens}"),
                     P(f"Cache read tokens: {cache_read_tokens}"),
-                    P(f"Response time: {response_time:.2f} seconds"),
+                    P(f"Response time: {state.response_time:.2f} seconds"),
+                    P(f"Map update: {'full map' if state.patched_cells is None else f'{state.patched_cells} changed cells'}"),
+                    *[P(f"Cache {layer}: {tokens['cache_read']} read / {tokens['cache_creation']} created") for layer, tokens in (state.cache_layers or {}).items()],
                     cls="statistics"
                 ),
                 cls="world-and-stats"
             )
         ),
+        Div(
+            H4("Action"),
+            P(state.last_action),
+            cls="action"
+        ),
+        Div(
+            H4("Reaction"),
+            P(state.reaction),
+            cls="reaction"
+        ),
+        cls="game-step"
+    )
+
+def step_fragment(state: StepSnapshot):
+    # Steps never change once played, so each one is rendered once and its HTML reused on every page load
+    if state.html is None:
+        state.html = to_xml(render_step(state))
+    return NotStr(state.html)
+
+def live_step(previous: GameState, state: StepSnapshot):
+    # A freshly played step: the live map still shows `previous`, the state the turn was played from,
+    # so only the cells that differ from it are sent with the step
+    return (render_step(state, with_map=False), *render_map_patch(previous, state), render_server_stats(hx_swap_oob="true"))
+
+def render_history_page(game: GameSession, before: Optional[int] = None):
+    # Newest steps first; the last element loads the next older page when it scrolls into view
+    older = [state for state in reversed(game.state_history) if before is None or state.step < before]
+    page = older[:GAME_PAGE_SIZE]
+    fragments = [step_fragment(state) for state in page]
+    if len(older) > len(page):
+        fragments.append(Div(P("Loading older steps..."), hx_get=f"/game/steps?before={page[-1].step}", hx_trigger="revealed", hx_swap="outerHTML", cls="history-more"))
+    return fragments
+
+def render_pending_step(step: int, turn_id: str, action: str):
+    # Placeholder filled over the session channel: the narrative and position arrive first, the full step replaces it at the end.
+    # It also asks /turns/{id} once on load, in case the turn ended before its `step-` listener was registered.
+    return Div(
+        H3(f"Step {step}"),
         Div(
             H4("Action"),
             P(action),
@@ -58,9 +252,14 @@ def render_step(state: GameState, action: str, reaction: str, input_tokens: int,
         ),
         Div(
             H4("Reaction"),
-            P(reaction),
+            Div(P("Thinking..."), sse_swap=f"narrative-{turn_id}", hx_swap="innerHTML"),
+            Div(sse_swap=f"position-{turn_id}", hx_swap="innerHTML"),
             cls="reaction"
         ),
+        sse_swap=f"step-{turn_id}",
+        hx_get=f"/turns/{turn_id}",
+        hx_trigger="load",
+        hx_swap="outerHTML",
         cls="game-step"
     )
 
@@ -94,133 +293,191 @@ def get():
         Div(id="loading", cls="htmx-indicator", _="Loading...")
     )
 
+def render_adventure(adventure: Dict, usage: Tuple[int, int, int, int], generation_time: float):
+    adv_input_tokens, adv_output_tokens, adv_cache_creation_tokens, adv_cache_read_tokens = usage
+    adventure_div = Div(
+        H2(adventure['title']),
+        H3("Setting"),
+        P(adventure['setting']),
+        H3("Objective"),
+        P(adventure['objective']),
+        H3("Challenges"),
+        Ul(*[Li(challenge) for challenge in adventure['challenges']]),
+        H3("Key Locations"),
+        Ul(*[Li(location) for location in adventure['key_locations']]),
+        H3("NPCs"),
+        Ul(*[Li(f"{npc['name']}: {npc['description']}") for npc in adventure['npcs']]),
+        Div(
+            H4("Adventure Generation Statistics"),
+            P(f"Input tokens: {adv_input_tokens}"),
+            P(f"Output tokens: {adv_output_tokens}"),
+            P(f"Total tokens: {adv_input_tokens + adv_output_tokens}"),
+            P(f"Cache creation tokens: {adv_cache_creation_tokens}"),
+            P(f"Cache read tokens: {adv_cache_read_tokens}"),
+            P(f"Generation time: {generation_time:.2f} seconds"),
+            cls="statistics"
+        ),
+        id="adventure-details"
+    )
+    
+    logger.info(f"Total time for adventure generation: {generation_time:.2f} seconds")
+    
+    return adventure_div + Div(
+        Button("Generate Initial Game State", 
+               hx_post="/generate_initial_state", 
+               hx_target="#game-state", 
+               hx_indicator="#loading"),
+        Div(id="game-state"),
+        id="game-state-container"
+    )
+
+def render_initial_state(usage: Tuple[int, int, int, int], init_response_time: float):
+    init_input_tokens, init_output_tokens, init_cache_creation_tokens, init_cache_read_tokens = usage
+    return Div(
+        H4("Initial Game State Generated"),
+        P("The initial game state has been created successfully."),
+        Div(
+            H4("Generation Statistics"),
+            P(f"Input tokens: {init_input_tokens}"),
+            P(f"Output tokens: {init_output_tokens}"),
+            P(f"Total tokens: {init_input_tokens + init_output_tokens}"),
+            P(f"Cache creation tokens: {init_cache_creation_tokens}"),
+            P(f"Cache read tokens: {init_cache_read_tokens}"),
+            P(f"Response time: {init_response_time:.2f} seconds"),
+            cls="statistics"
+        ),
+        A("Start Adventure", href="/game", cls="button"),
+        id="game-state"
+    )
+
+def render_job(job: Job):
+    # Polls itself until the job finishes; the finished result replaces it
+    position = jobs.position(job)
+    status = f"{job.progress} (position {position} in queue)" if position else job.progress
+    return Div(
+        P(f"{status}... {job.elapsed:.0f}s"),
+        hx_get=f"/jobs/{job.id}",
+        hx_trigger="every 1s",
+        hx_swap="outerHTML",
+        id=f"job-{job.id}",
+        cls="job-status"
+    )
+
+async def adventure_job(job: Job, adventure_prompt: str):
+    job.report("Writing the adventure")
+    with adventure_pool.interactive():
+        result = await generate_adventure(adventure_prompt)
+    metrics.observe_stage("adventure", "job", job.elapsed, ok=result[0] is not None)
+    if result[0] is None:
+        raise RuntimeError("Failed to generate adventure. Please try again.")
+    logger.info(f"Adventure generated. Title: {result[0].get('title', 'No title')}")
+    return result
+
+async def initial_state_job(job: Job, adventure: Dict):
+    job.report("Drawing the starting map")
+    with adventure_pool.interactive():
+        result = await generate_initial_state_async(adventure)
+    metrics.observe_stage("initial_state", "job", job.elapsed, ok=result[0] is not None)
+    if result[0] is None:
+        raise RuntimeError("Failed to generate initial game state. Please try again.")
+    return result
+
+def apply_adventure(game: GameSession, adventure: Dict, prepared_initial_state=None):
+    game.current_adventure = adventure
+    game.prepared_initial_state = prepared_initial_state
+
+def apply_initial_state(game: GameSession, result):
+    game_state, init_input_tokens, init_output_tokens, init_cache_creation_tokens, init_cache_read_tokens, init_response_time = result
+    usage = (init_input_tokens, init_output_tokens, init_cache_creation_tokens, init_cache_read_tokens)
+    game.start(game_state, usage, init_response_time)
+    if event_store is not None:
+        event_store.start_game(game.session_id, game_state)
+    speculation.speculate(game.session_id, game_state)
+    return render_initial_state(usage, init_response_time)
+
 @rt("/generate_adventure", methods=['POST'])
-async def generate_adventure_endpoint(adventure_prompt: str):
+async def generate_adventure_endpoint(adventure_prompt: str, session):
     start_time = time.time()
-    try:
-        logger.info(f"Starting adventure generation for prompt: {adventure_prompt}")
-        result = await generate_adventure(adventure_prompt)
-        logger.info(f"Adventure generation completed. Result type: {type(result)}")
-        
-        if result[0] is None:
-            logger.error("Adventure generation failed: result[0] is None")
-            return P("Failed to generate adventure. Please try again.")
-        
-        adventure, adv_input_tokens, adv_output_tokens, adv_cache_creation_tokens, adv_cache_read_tokens = result
-        logger.info(f"Adventure unpacked. Title: {adventure.get('title', 'No title')}")
-    except Exception as e:
-        logger.error(f"Error in generate_adventure: {str(e)}", exc_info=True)
-        return P(f"An error occurred while generating the adventure: {str(e)}")
+    game = await game_session(session)
+    logger.info(f"Starting adventure generation for prompt: {adventure_prompt}")
+    prepared = adventure_pool.take(adventure_prompt)
+    if prepared is not None:
+        logger.info(f"Serving pre-generated adventure for theme: {prepared.theme}")
+        apply_adventure(game, prepared.adventure, prepared.initial_state)
+        metrics.observe_stage("adventure", "pool", time.time() - start_time)
+        return render_adventure(prepared.adventure, prepared.adventure_usage, 0.0)
 
-    try:
-        global current_adventure
-        current_adventure = adventure
-        
-        logger.info("Creating adventure_div")
-        end_time = time.time()
-        generation_time = end_time - start_time
-        
-        adventure_div = Div(
-            H2(adventure['title']),
-            H3("Setting"),
-            P(adventure['setting']),
-            H3("Objective"),
-            P(adventure['objective']),
-            H3("Challenges"),
-            Ul(*[Li(challenge) for challenge in adventure['challenges']]),
-            H3("Key Locations"),
-            Ul(*[Li(location) for location in adventure['key_locations']]),
-            H3("NPCs"),
-            Ul(*[Li(f"{npc['name']}: {npc['description']}") for npc in adventure['npcs']]),
-            Div(
-                H4("Adventure Generation Statistics"),
-                P(f"Input tokens: {adv_input_tokens}"),
-                P(f"Output tokens: {adv_output_tokens}"),
-                P(f"Total tokens: {adv_input_tokens + adv_output_tokens}"),
-                P(f"Cache creation tokens: {adv_cache_creation_tokens}"),
-                P(f"Cache read tokens: {adv_cache_read_tokens}"),
-                P(f"Generation time: {generation_time:.2f} seconds"),
-                cls="statistics"
-            ),
-            id="adventure-details"
-        )
-        
-        logger.info("Adventure_div created successfully")
-        logger.info(f"Total time for adventure generation: {generation_time:.2f} seconds")
-        
-        return adventure_div + Div(
-            Button("Generate Initial Game State", 
-                   hx_post="/generate_initial_state", 
-                   hx_target="#game-state", 
-                   hx_indicator="#loading"),
-            Div(id="game-state"),
-            id="game-state-container"
-        )
-    except Exception as e:
-        logger.error(f"Error while creating adventure_div: {str(e)}", exc_info=True)
-        return P(f"An error occurred while processing the generated adventure: {str(e)}")
+    # Identical prompts in flight share one generation, so retries and double clicks don't start another
+    job = jobs.submit("adventure", f"adventure:{adventure_prompt.strip().lower()}", lambda job: adventure_job(job, adventure_prompt))
+    if job is None:
+        return P("The server is busy generating other adventures. Please try again in a moment.")
+    game.pending_job = job.id
+    return render_job(job)
 
 @rt("/generate_initial_state", methods=['POST'])
-async def generate_initial_state_endpoint():
-    global game_state, current_adventure
-    
+async def generate_initial_state_endpoint(session):
+    game = await game_session(session)
     logger.info("Starting initial game state generation")
     
-    if not current_adventure:
+    if not game.current_adventure:
         logger.error("No adventure has been generated")
         return P("No adventure has been generated. Please generate an adventure first.")
-    
-    try:
-        logger.info("Calling generate_initial_state function")
-        result = await asyncio.to_thread(generate_initial_state, current_adventure)
-        logger.info(f"generate_initial_state completed. Result type: {type(result)}")
-        
-        if result[0] is None:
-            logger.error("Initial state generation failed: result[0] is None")
-            return P("Failed to generate initial game state. Please try again.")
-        
-        game_state, init_input_tokens, init_output_tokens, init_cache_creation_tokens, init_cache_read_tokens, init_response_time = result
-        logger.info("Initial game state unpacked successfully")
-    except Exception as e:
-        logger.error(f"Error in generate_initial_state: {str(e)}", exc_info=True)
-        return P(f"An error occurred while generating the initial game state: {str(e)}")
 
-    if game_state:
-        state_history.clear()
-        state_history.append(game_state)
-        
-        logger.info("Returning initial game state information")
-        return Div(
-            H4("Initial Game State Generated"),
-            P("The initial game state has been created successfully."),
-            Div(
-                H4("Generation Statistics"),
-                P(f"Input tokens: {init_input_tokens}"),
-                P(f"Output tokens: {init_output_tokens}"),
-                P(f"Total tokens: {init_input_tokens + init_output_tokens}"),
-                P(f"Cache creation tokens: {init_cache_creation_tokens}"),
-                P(f"Cache read tokens: {init_cache_read_tokens}"),
-                P(f"Response time: {init_response_time:.2f} seconds"),
-                cls="statistics"
-            ),
-            A("Start Adventure", href="/game", cls="button"),
-            id="game-state"
-        )
-    else:
-        logger.error("Game state is None after generation")
-        return P("Failed to generate initial game state. Please try again.")
+    # The first turn's prompt prefix is written while the map is still being drawn
+    cache_warmer.warm(game.session_id, game.current_adventure)
+
+    if game.prepared_initial_state is not None:
+        async with game.lock:
+            result, game.prepared_initial_state = game.prepared_initial_state, None
+            metrics.observe_stage("initial_state", "prepared", 0.0)
+            return apply_initial_state(game, result)
+
+    # Keyed on the adventure too: a job still drawing the previous adventure's map must not be handed back
+    adventure = game.current_adventure
+    job = jobs.submit("initial_state", f"initial_state:{game.session_id}:{adventure_key(adventure)}", lambda job: initial_state_job(job, adventure))
+    if job is None:
+        return P("The server is busy generating other games. Please try again in a moment.")
+    game.pending_job = job.id
+    return render_job(job)
+
+@rt("/jobs/{job_id}")
+async def get(job_id: str, session):
+    game = await game_session(session)
+    job = jobs.get(job_id)
+    if job is None:
+        return P("This generation has expired. Please start again.")
+    if job.status in ("queued", "running"):
+        return render_job(job)
+    if job.status == "failed":
+        return P(f"An error occurred: {job.error}")
+
+    # The result is applied once, and only if it is still what this session is waiting for
+    async with game.lock:
+        apply = game.pending_job == job.id and game.applied_job != job.id
+        if apply:
+            game.applied_job = job.id
+        if job.kind == "adventure":
+            adventure, *usage = job.result
+            if apply:
+                apply_adventure(game, adventure)
+            return render_adventure(adventure, tuple(usage), job.elapsed)
+        if apply:
+            return apply_initial_state(game, job.result)
+        return render_initial_state(tuple(job.result[1:5]), job.result[5])
 
 @rt("/game")
-def get():
-    global game_state
+async def get(session):
+    game = await game_session(session)
+    game_state = game.game_state
     if not game_state or not game_state.adventure:
         return RedirectResponse(url='/')
     
     return Titled("The Bing Dungeon",
         H1(game_state.adventure['title']),
         Div(
-            Div(*(render_step(state, state.last_action, state.log[-1] if state.log else "", 0, 0, 0, 0, 0) 
-                  for state in reversed(state_history)), 
+            render_live_map(game_state.battlemap, game_state.player_pos),
+            render_server_stats(),
+            Div(*render_history_page(game),
                 id="game-history", 
                 cls="game-history"),
             Form(
@@ -232,7 +489,10 @@ def get():
                 _="on htmx:afterRequest call scrollToTop()"
             ),
             Div(id="action-loading", cls="htmx-indicator", _="Processing action..."),
-            cls="game-area"
+            Div(sse_swap="resync", hx_swap="none", style="display: none"),
+            cls="game-area",
+            hx_ext="sse",
+            sse_connect="/events"
         ),
         Div(
             Button("Restart", hx_post="/restart", hx_target="body", hx_swap="innerHTML"),
@@ -251,43 +511,167 @@ def get():
         """)
     )
 
+@rt("/game/steps")
+async def get(session, before: int):
+    game = await game_session(session)
+    return tuple(render_history_page(game, before))
+
 @rt("/action", methods=['POST'])
-async def post(action: str):
-    global game_state, state_history
+async def post(action: str, session, req):
+    game = await game_session(session)
     action = action.lower().strip()
     if action == '':
         return "Action cannot be empty"
-    
+
+    # The same action sent again before its turn's result reached the page (double submit, htmx retry) joins that turn,
+    # whether it is still queued for the session lock, being played or pushing out its committed step
+    turn = turns.find(game.session_id, game.steps, action)
+    if turn is not None:
+        if STREAM_TURNS:
+            # Its placeholder is already on the page and fills from the session channel; a second one would show the step twice
+            return Response(headers={"HX-Reswap": "none"})
+        result = await turns.joined(turn)
+        if result is None:
+            return "Failed to update game state. Please try again or start a new game."
+        if not isinstance(result, Turn):
+            return result
+        return await _follow_turn(result, req)
+    if not turns.admit(game.session_id):
+        return "Your previous actions are still being played, please wait for them to finish."
+    with turns.waiting(game.session_id, game.steps, action) as turn:
+        await game.lock.acquire()
+        try:
+            result = await _run_action(game, turn)
+        except BaseException:
+            game.lock.release()
+            raise
+        if not isinstance(result, Turn):
+            game.lock.release()
+            turns.settle(turn, result)
+            return result
+    # The turn holds the lock until it ends
+    return await _follow_turn(turn, req)
+
+async def _follow_turn(turn: Turn, req):
+    if STREAM_TURNS:
+        return render_pending_step(turn.step, turn.id, turn.action)
+    snapshot = await turns.wait(turn, req.is_disconnected)
+    if snapshot is None:
+        return "Failed to update game state. Please try again or start a new game."
+    return live_step(turn.state, snapshot)
+
+async def _run_action(game: GameSession, turn: Turn):
+    # Called with the session lock held; returns a response, or the queued turn once it started playing on the model
+    action = turn.action
+    game_state = game.game_state
     if game_state is None:
         return "Game has not been initialized. Please start a new game."
 
-    # Update the game state using the AI
     start_time = time.time()
-    result = await asyncio.to_thread(update_battlemap_with_ai, game_state, action)
+    resolution = "speculation"
+    result = await speculation.take(game.session_id, game_state, action)
+    if result is None:
+        local_state = interpret_local_action(game_state, action)
+        if local_state is not None:
+            resolution = "local"
+            result = (local_state, 0, 0, 0, 0)
+
+    if result is None:
+        return turns.start(turn, game_state, game.steps + 1, game.lock, lambda turn: run_turn(game, turn) if STREAM_TURNS else _model_turn(game, turn, start_time))
+
     new_state, input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens = result if result[0] is not None else (None, 0, 0, 0, 0)
     end_time = time.time()
     
     # Calculate response time
     response_time = end_time - start_time
+    metrics.observe_stage("action", resolution, response_time, ok=new_state is not None)
     
     if new_state is None:
         return "Failed to update game state. Please try again or start a new game."
 
     # Update the game state and history
-    game_state = new_state
-    state_history.append(game_state)
+    snapshot = commit_turn(game, new_state, (input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens), response_time)
     
     # Render the new step
-    return render_step(game_state, action, game_state.log[-1], input_tokens, output_tokens, response_time, cache_creation_tokens, cache_read_tokens)
+    return live_step(game_state, snapshot)
+
+async def _model_turn(game: GameSession, turn: Turn, start_time: float) -> Optional[StepSnapshot]:
+    # Runs with the session lock held; the snapshot is rendered by every request waiting on the turn
+    with adventure_pool.interactive():
+        new_state, input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens = await update_battlemap_with_ai_async(turn.state, turn.action)
+    response_time = time.time() - start_time
+    metrics.observe_stage("action", "model", response_time, ok=new_state is not None)
+    if new_state is None:
+        return None
+    return commit_turn(game, new_state, (input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens), response_time)
+
+async def run_turn(game: GameSession, turn: Turn):
+    # Runs with the session lock held and pushes its progress over the session channel
+    channel = channels.get(game.session_id)
+    start_time = time.time()
+    watcher = asyncio.create_task(turns.watch(turn, lambda: channel.subscribers > 0))
+    try:
+        with adventure_pool.interactive():
+            async for event, fragment in _stream_turn(game, turn, start_time):
+                channel.publish(f"{event}-{turn.id}", to_xml(fragment))
+    finally:
+        watcher.cancel()
+
+async def _stream_turn(game: GameSession, turn: Turn, start_time: float):
+    async for kind, payload in stream_battlemap_update_async(turn.state, turn.action):
+        if kind == "partial" and "description" in payload:
+            yield "narrative", P(payload["description"])
+        elif kind == "partial" and "player_pos" in payload:
+            yield "position", P(f"Player position: {tuple(payload['player_pos'])}")
+        elif kind == "final":
+            new_state, input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens = payload
+            metrics.observe_stage("action", "stream", time.time() - start_time, ok=new_state is not None)
+            if new_state is None:
+                yield "step", P("Failed to update game state. Please try again or start a new game.")
+                return
+            snapshot = commit_turn(game, new_state, (input_tokens, output_tokens, cache_creation_tokens, cache_read_tokens), time.time() - start_time)
+            yield "step", live_step(turn.state, snapshot)
+
+@rt("/events")
+async def get(session, req):
+    # One long-lived stream per session; EventSource reconnects on its own and sends Last-Event-ID,
+    # so missed turn events are replayed (or the live map resynced when they are too old)
+    game = await game_session(session)
+    last_event_id = req.headers.get("last-event-id", "")
+    resync = None
+    if game.game_state is not None:
+        resync = to_xml(render_live_map(game.game_state.battlemap, game.game_state.player_pos, hx_swap_oob="true"))
+    channel = channels.get(game.session_id)
+    return EventStream(channel.subscribe(int(last_event_id) if last_event_id.isdigit() else None, resync))
+
+@rt("/turns/{turn_id}")
+async def get(turn_id: str, session):
+    # The final step of a streamed turn, replayed from the session channel; 204 (no swap) while it is still running
+    game = await game_session(session)
+    step = channels.get(game.session_id).latest(f"step-{turn_id}")
+    if step is None:
+        return Response(status_code=204)
+    return NotStr(step)
+
+@rt("/metrics")
+def get():
+    # Prometheus text format; histograms and counters live in-process, gauges are read at scrape time
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
 
 @rt("/restart", methods=['POST'])
-def post():
-    global game_state, state_history
-    game_state = None
-    state_history.clear()
+async def post(session):
+    game = await game_session(session)
+    # A running turn is cancelled with its model request, so it cannot commit after the reset
+    turns.cancel(game.session_id)
+    game.reset()
+    cache_warmer.forget(game.session_id)
+    if event_store is not None:
+        event_store.end_game(game.session_id)
+    speculation.forget(game.session_id)
     return RedirectResponse(url='/', status_code=303)
 
 app.hdrs += (
+    Script(src="https://unpkg.com/htmx-ext-sse@2.2.2/sse.js"),
     Style("""
         .game-map {
             font-family: monospace;
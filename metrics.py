@@ -0,0 +1,205 @@
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# Upper bounds in seconds; model calls run from a few hundred ms to a minute, local turns in microseconds
+LATENCY_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (10, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 25000, 50000, 100000)
+TOKEN_KINDS = ("input", "output", "cache_creation", "cache_read")
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.type = "counter"
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1.0):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0.0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0.0)
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return list(self._values.items())
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in sorted(self.items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class Histogram:
+    """Fixed-bucket histogram; observe() is a dict lookup and a bisect, buckets are only summed up when scraped."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.type = "histogram"
+        self.buckets = tuple(buckets)
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # per-bucket counts (last one is +Inf), then sum
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self) -> Iterable[str]:
+        with self._lock:
+            series = sorted((label_values, list(values)) for label_values, values in self._series.items())
+        for label_values, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = _format_labels(self.labels, label_values)
+            yield f"{self.name}_sum{labels} {_format_value(values[-1])}"
+            yield f"{self.name}_count{labels} {cumulative}"
+
+
+class Gauge:
+    """Read at scrape time from `collect`, which returns {label values: value}."""
+
+    def __init__(self, name: str, help: str, labels: Tuple[str, ...], collect: Callable[[], Dict[Tuple[str, ...], float]]):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.type = "gauge"
+        self.collect = collect
+
+    def samples(self) -> Iterable[str]:
+        for label_values, value in sorted(self.collect().items()):
+            yield f"{self.name}{_format_labels(self.labels, label_values)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, help, labels))
+
+    def histogram(self, name: str, help: str, labels: Tuple[str, ...] = (), buckets: Tuple[float, ...] = LATENCY_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, help, labels, buckets))
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Dict[Tuple[str, ...], float]], labels: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge(name, help, labels, collect))
+
+    def render(self) -> str:
+        # Prometheus text exposition format 0.0.4
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            try:
+                lines.extend(metric.samples())
+            except Exception as e:
+                lines.append(f"# {metric.name} unavailable: {_escape(e)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Model calls, labelled by the stage that made them (adventure, initial_state, action, speculation, cache_warmup)
+llm_requests = registry.counter("llm_requests_total", "Model completions by outcome (ok, error, response_cache)", ("stage", "model", "outcome"))
+llm_duration = registry.histogram("llm_request_duration_seconds", "Model completion latency, successful calls only", ("stage", "model"))
+llm_first_field = registry.histogram("llm_first_field_seconds", "Streamed completions: time until the first tool input field is complete", ("stage", "model"))
+llm_tokens = registry.histogram("llm_tokens_per_request", "Tokens per model completion", ("stage", "model", "kind"), TOKEN_BUCKETS)
+llm_tokens_total = registry.counter("llm_tokens_total", "Tokens used by model completions", ("stage", "model", "kind"))
+llm_retries = registry.counter("llm_retries_total", "Model requests retried after a retryable error", ("stage", "model"))
+llm_hedges = registry.counter("llm_hedges_total", "Duplicate requests sent for slow calls (sent) and those that answered first (won)", ("stage", "model", "outcome"))
+llm_deadlines = registry.counter("llm_deadline_exceeded_total", "Model calls abandoned at their stage deadline", ("stage",))
+# Pooled provider connections: a healthy pool reuses far more connections than it opens
+llm_http_clients = registry.counter("llm_http_clients_created_total", "Provider SDK clients built, one per provider and sync/async flavour")
+llm_http_requests = registry.counter("llm_http_requests_total", "HTTP requests to model providers, by whether they opened a new connection or reused a pooled one", ("connection",))
+
+
+def _cache_hit_ratio() -> Dict[Tuple[str, ...], float]:
+    # Share of prompt tokens served from the prompt cache
+    prompt_tokens: Dict[Tuple[str, ...], List[float]] = {}
+    for (stage, model, kind), value in llm_tokens_total.items():
+        if kind != "output":
+            totals = prompt_tokens.setdefault((stage, model), [0.0, 0.0])
+            totals[0] += value
+            if kind == "cache_read":
+                totals[1] += value
+    return {labels: read / total for labels, (total, read) in prompt_tokens.items() if total}
+
+
+registry.gauge("llm_prompt_cache_hit_ratio", "Cache-read prompt tokens over all prompt tokens", _cache_hit_ratio, ("stage", "model"))
+
+# Handler-level view: how each stage was served and how long the player waited
+stage_duration = registry.histogram("stage_duration_seconds", "Time to serve a stage, by how it was resolved", ("stage", "resolution"))
+stage_errors = registry.counter("stage_errors_total", "Stages that failed to produce a result", ("stage",))
+turn_requests = registry.counter("turn_requests_total", "Model-turn requests (started, joined, rejected) and turns stopped early (cancelled, abandoned, orphaned)", ("outcome",))
+
+
+def usage_counts(usage) -> Dict[str, int]:
+    if usage is None:
+        return {}
+    if hasattr(usage, "input_tokens"):
+        return {
+            "input": usage.input_tokens,
+            "output": usage.output_tokens,
+            "cache_creation": getattr(usage, "cache_creation_input_tokens", 0) or 0,
+            "cache_read": getattr(usage, "cache_read_input_tokens", 0) or 0,
+        }
+    cached = getattr(getattr(usage, "prompt_tokens_details", None), "cached_tokens", 0) or 0
+    return {"input": usage.prompt_tokens - cached, "output": usage.completion_tokens, "cache_creation": 0, "cache_read": cached}
+
+
+def observe_llm(stage: str, model: Optional[str], seconds: float, usage):
+    model = model or "unknown"
+    llm_requests.inc(stage, model, "ok")
+    llm_duration.observe(seconds, stage, model)
+    for kind, tokens in usage_counts(usage).items():
+        llm_tokens.observe(tokens, stage, model, kind)
+        llm_tokens_total.inc(stage, model, kind, amount=tokens)
+
+
+def observe_llm_error(stage: str, model: Optional[str]):
+    llm_requests.inc(stage, model or "unknown", "error")
+
+
+def observe_response_cache(stage: str, model: Optional[str]):
+    llm_requests.inc(stage, model or "unknown", "response_cache")
+
+
+def observe_stage(stage: str, resolution: str, seconds: float, ok: bool = True):
+    stage_duration.observe(seconds, stage, resolution)
+    if not ok:
+        stage_errors.inc(stage)
@@ -0,0 +1,80 @@
+import json
+from typing import Any, Dict, Optional
+
+
+class PartialJSONObjectParser:
+    """Incrementally scans a streamed JSON object and reports each top-level field as soon as its value is complete."""
+
+    def __init__(self):
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._expect = "key"  # key -> colon -> value -> in_value -> comma -> key ...
+        self._key_start = 0
+        self._value_start = 0
+        self._current_key: Optional[str] = None
+        self.fields: Dict[str, Any] = {}
+        self.done = False
+
+    def feed(self, chunk: str) -> Dict[str, Any]:
+        self._text += chunk
+        completed: Dict[str, Any] = {}
+        text = self._text
+        for i in range(self._pos, len(text)):
+            c = text[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == "\\":
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._expect == "key":
+                        self._current_key = json.loads(text[self._key_start:i + 1])
+                        self._expect = "colon"
+                    elif self._depth == 1 and self._expect == "in_value":
+                        self._complete(text[self._value_start:i + 1], completed)
+                continue
+
+            if c == '"':
+                self._in_string = True
+                if self._depth == 1:
+                    if self._expect == "key":
+                        self._key_start = i
+                    elif self._expect == "value":
+                        self._value_start = i
+                        self._expect = "in_value"
+            elif c in "{[":
+                if self._depth == 1 and self._expect == "value":
+                    self._value_start = i
+                    self._expect = "in_value"
+                self._depth += 1
+            elif c in "}]":
+                self._depth -= 1
+                if self._depth == 1 and self._expect == "in_value":
+                    self._complete(text[self._value_start:i + 1], completed)
+                elif self._depth == 0:
+                    if self._expect == "in_value":
+                        self._complete(text[self._value_start:i], completed)
+                    self.done = True
+            elif self._depth == 1:
+                if c == ":" and self._expect == "colon":
+                    self._expect = "value"
+                elif c == ",":
+                    if self._expect == "in_value":
+                        self._complete(text[self._value_start:i], completed)
+                    self._expect = "key"
+                elif not c.isspace() and self._expect == "value":
+                    # number, true, false or null; ends at the next ',' or '}'
+                    self._value_start = i
+                    self._expect = "in_value"
+        self._pos = len(text)
+        return completed
+
+    def _complete(self, raw: str, completed: Dict[str, Any]):
+        value = json.loads(raw)
+        self.fields[self._current_key] = value
+        completed[self._current_key] = value
+        self._expect = "comma"
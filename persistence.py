@@ -0,0 +1,244 @@
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from config import config_from_env
+from core import GameState, advance_state
+
+logger = logging.getLogger(__name__)
+
+_ACTION_PREFIX = "User action: "
+_RESPONSE_PREFIX = "AI response: "
+_FLUSH = object()
+_STOP = object()
+
+
+class GameEventStoreConfig(BaseModel):
+    enabled: bool = True
+    path: str = "game_events.sqlite3"
+    snapshot_interval: int = 50  # turns between GameState snapshots
+    batch_size: int = 200  # writes per commit at most
+    flush_interval: float = 0.25  # seconds the writer waits to fill a batch
+
+    @classmethod
+    def from_env(cls) -> "GameEventStoreConfig":
+        return config_from_env(cls, "PERSISTENCE", switch="PERSISTENCE")
+
+
+def state_to_snapshot(state: GameState, with_log: bool = True) -> Dict[str, Any]:
+    # Only a game's first snapshot keeps the log; later ones would each copy the whole game so far
+    snapshot = {
+        "battlemap": state.battlemap.to_rows(),
+        "player_pos": list(state.player_pos),
+        "last_action": state.last_action,
+        "change_type": state.change_type,
+        "patched_cells": state.patched_cells,
+        "adventure": state.adventure,
+    }
+    if with_log:
+        snapshot["log"] = list(state.log)
+        snapshot["conversation_history"] = list(state.conversation_history)
+    return snapshot
+
+
+def state_from_snapshot(snapshot: Dict[str, Any]) -> GameState:
+    return GameState(**{**snapshot, "player_pos": tuple(snapshot["player_pos"])})
+
+
+def turn_event(previous: GameState, state: GameState) -> Dict[str, Any]:
+    # Same shape as a same_map patch from the model, plus what is needed to reproduce the state exactly
+    changes = [
+        {"x": x, "y": y, "tile": tile}
+        for ((x, y), tile), old, new in zip(state.battlemap.items(), previous.battlemap.cells, state.battlemap.cells) if old != new
+    ]
+    description = state.log[-1][len(_RESPONSE_PREFIX):] if state.log else ""
+    return {
+        "action": state.last_action,
+        "change_type": state.change_type,
+        "patched_cells": state.patched_cells,
+        "player_pos": list(state.player_pos),
+        "description": description,
+        "changes": changes,
+    }
+
+
+def replay_log(first: Dict[str, Any], events: List[Dict[str, Any]]) -> Dict[str, List[str]]:
+    # The log and conversation after `events`, rebuilt from the game's first snapshot the way advance_state grows them
+    log, conversation = list(first["log"]), list(first["conversation_history"])
+    for event in events:
+        log.append(_RESPONSE_PREFIX + event["description"])
+        conversation += [_ACTION_PREFIX + event["action"], _RESPONSE_PREFIX + event["description"]]
+    return {"log": log, "conversation_history": conversation}
+
+
+def apply_turn_event(previous: GameState, event: Dict[str, Any]) -> GameState:
+    battlemap = previous.battlemap.copy()
+    for change in event["changes"]:
+        battlemap[(change["x"], change["y"])] = change["tile"]
+    return advance_state(previous, event["action"], battlemap, tuple(event["player_pos"]), event["description"], event["change_type"], event["patched_cells"])
+
+
+class GameEventStore:
+    """Append-only turn log per session in SQLite with periodic snapshots; writes happen on a background thread."""
+
+    def __init__(self, config: Optional[GameEventStoreConfig] = None):
+        self.config = config or GameEventStoreConfig.from_env()
+        self._seq: Dict[str, int] = {}  # last written turn per session
+        self._touched = set()  # sessions this process has queued writes for
+        self._queue: "queue.Queue" = queue.Queue()
+        self._reader_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.executescript(
+            "CREATE TABLE IF NOT EXISTS events ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, event TEXT NOT NULL, usage TEXT, created REAL NOT NULL, "
+            "PRIMARY KEY (session_id, seq));"
+            "CREATE TABLE IF NOT EXISTS snapshots ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, state TEXT NOT NULL, created REAL NOT NULL, "
+            "PRIMARY KEY (session_id, seq));"
+        )
+        self._reader.commit()
+        self._writer = threading.Thread(target=self._write_loop, name="game-event-writer", daemon=True)
+        self._writer.start()
+        self.events_written = 0
+        self.snapshots_written = 0
+        self.commits = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.config.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def start_game(self, session_id: str, state: GameState):
+        # A new game replaces whatever the session had; its initial state is snapshot 0
+        self._seq[session_id] = 0
+        self._touched.add(session_id)
+        self._queue.put(("reset", session_id))
+        self._queue.put(("snapshot", session_id, 0, state_to_snapshot(state)))
+
+    def record_turn(self, session_id: str, previous: GameState, state: GameState, usage: Tuple[int, int, int, int] = (0, 0, 0, 0)):
+        seq = self._seq.get(session_id, 0) + 1
+        self._seq[session_id] = seq
+        self._touched.add(session_id)
+        self._queue.put(("event", session_id, seq, turn_event(previous, state), list(usage)))
+        if seq % self.config.snapshot_interval == 0:
+            self._queue.put(("snapshot", session_id, seq, state_to_snapshot(state, with_log=False)))
+
+    def turns(self, session_id: str) -> int:
+        return self._seq.get(session_id, 0)
+
+    def end_game(self, session_id: str):
+        self._seq.pop(session_id, None)
+        self._touched.add(session_id)
+        self._queue.put(("reset", session_id))
+
+    def restore(self, session_id: str, history_length: int = 50) -> Optional[Deque[GameState]]:
+        # Newest snapshot that still leaves `history_length` states to rebuild, plus the turns after it;
+        # returns the most recent states, oldest first. Blocks on SQLite (and on the writer when this
+        # process has unwritten turns for the session), so async callers run it in a thread.
+        if session_id in self._touched:
+            self.flush()
+        with self._reader_lock:
+            last_seq = self._reader.execute("SELECT COALESCE(MAX(seq), 0) FROM events WHERE session_id = ?", (session_id,)).fetchone()[0]
+            row = self._reader.execute(
+                "SELECT seq, state FROM snapshots WHERE session_id = ? AND seq <= ? ORDER BY seq DESC LIMIT 1",
+                (session_id, max(0, last_seq - history_length + 1)),
+            ).fetchone()
+            if row is None:
+                return None
+            snapshot_seq, raw_state = row
+            snapshot = json.loads(raw_state)
+            first = None
+            if "log" not in snapshot:
+                first = self._reader.execute("SELECT state FROM snapshots WHERE session_id = ? AND seq = 0", (session_id,)).fetchone()
+                if first is None:
+                    return None
+            events = self._reader.execute(
+                "SELECT seq, event FROM events WHERE session_id = ? AND seq > ? ORDER BY seq",
+                (session_id, snapshot_seq if first is None else 0),
+            ).fetchall()
+        events = [(seq, json.loads(raw_event)) for seq, raw_event in events]
+        if first is not None:
+            snapshot.update(replay_log(json.loads(first[0]), [event for seq, event in events if seq <= snapshot_seq]))
+            events = [(seq, event) for seq, event in events if seq > snapshot_seq]
+        state = state_from_snapshot(snapshot)
+        history: Deque[GameState] = deque([state], maxlen=history_length)
+        seq = snapshot_seq
+        for seq, event in events:
+            state = apply_turn_event(state, event)
+            history.append(state)
+        self._seq[session_id] = seq
+        logger.info(f"Restored session {session_id}: snapshot {snapshot_seq} + {len(events)} turns")
+        return history
+
+    def flush(self):
+        # Blocks until everything queued so far is committed
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def close(self):
+        self._queue.put((_STOP,))
+        self._writer.join()
+        with self._reader_lock:
+            self._reader.close()
+
+    def _write_loop(self):
+        db = self._connect()
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.config.flush_interval
+            while len(batch) < self.config.batch_size and batch[-1][0] not in (_FLUSH, _STOP):
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(db, batch)
+            except Exception as e:
+                logger.error(f"Failed to persist {len(batch)} game events: {str(e)}")
+                db.rollback()
+            for item in batch:
+                if item[0] is _FLUSH:
+                    item[1].set()
+            if batch[-1][0] is _STOP:
+                db.close()
+                return
+
+    def _write_batch(self, db: sqlite3.Connection, batch: List[tuple]):
+        now = time.time()
+        for item in batch:
+            kind = item[0]
+            if kind == "event":
+                _, session_id, seq, event, usage = item
+                db.execute(
+                    "INSERT OR REPLACE INTO events (session_id, seq, event, usage, created) VALUES (?, ?, ?, ?, ?)",
+                    (session_id, seq, json.dumps(event, ensure_ascii=False), json.dumps(usage), now),
+                )
+                self.events_written += 1
+            elif kind == "snapshot":
+                _, session_id, seq, snapshot = item
+                db.execute(
+                    "INSERT OR REPLACE INTO snapshots (session_id, seq, state, created) VALUES (?, ?, ?, ?)",
+                    (session_id, seq, json.dumps(snapshot, ensure_ascii=False), now),
+                )
+                self.snapshots_written += 1
+            elif kind == "reset":
+                _, session_id = item
+                db.execute("DELETE FROM events WHERE session_id = ?", (session_id,))
+                db.execute("DELETE FROM snapshots WHERE session_id = ?", (session_id,))
+        db.commit()
+        self.commits += 1
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "events_written": self.events_written,
+            "snapshots_written": self.snapshots_written,
+            "commits": self.commits,
+            "queued": self._queue.qsize(),
+        }
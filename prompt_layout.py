@@ -0,0 +1,74 @@
+import json
+from typing import Any, Dict, List, Optional
+
+# Anthropic allows at most 4 cache breakpoints per request: global prompt, adventure context,
+# and two on the conversation (the previous turn's end to read from, the current end to write).
+CONVERSATION_WINDOW = 10  # history entries per window step (5 interactions, as in the old "last 5")
+
+EPHEMERAL = {"type": "ephemeral"}
+
+
+def system_layers(global_prompt: str, adventure_prompt: str) -> List[Dict[str, Any]]:
+    return [
+        {"type": "text", "text": global_prompt, "layer": "global", "cache_control": EPHEMERAL},
+        {"type": "text", "text": adventure_prompt, "layer": "adventure", "cache_control": EPHEMERAL},
+    ]
+
+
+def conversation_window_start(history_length: int, window: int = CONVERSATION_WINDOW) -> int:
+    # The window start only moves in steps of `window` entries, so between steps the conversation
+    # grows append-only and the previous turn's prefix stays byte-identical (and therefore cached).
+    return (max(0, history_length - window) // window) * window
+
+
+def conversation_layers(history: List[str], window: int = CONVERSATION_WINDOW) -> List[Dict[str, Any]]:
+    start = conversation_window_start(len(history), window)
+    entries = history[start:]
+    # one block per interaction (user action + AI response)
+    blocks = [
+        {"type": "text", "text": "\n".join(entries[i:i + 2]), "layer": "conversation"}
+        for i in range(0, len(entries), 2)
+    ]
+    blocks.insert(0, {"type": "text", "text": "Recent conversation:", "layer": "conversation"})
+    for block in blocks[-2:]:
+        block["cache_control"] = EPHEMERAL
+    return blocks
+
+
+def turn_layer(text: str) -> Dict[str, Any]:
+    return {"type": "text", "text": text, "layer": "turn"}
+
+
+def cache_usage_by_layer(prompt: List[Dict[str, Any]], usage: Any, json_schema: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, int]]:
+    # The API only reports totals. Cache reads always cover a prefix of the cached part and cache
+    # creation the rest of it, so the totals are split over the layers in prompt order, in proportion
+    # to each layer's size. Tool definitions are cached ahead of the system prompt and count as "global".
+    sizes: List[List[Any]] = []
+    if json_schema is not None:
+        sizes.append(["global", len(json.dumps(json_schema))])
+    cached_until = 0
+    for message in prompt:
+        content = message["content"]
+        blocks = [{"text": content}] if isinstance(content, str) else content
+        for block in blocks:
+            text = block if isinstance(block, str) else block["text"]
+            layer = "global" if isinstance(block, str) else block.get("layer", "turn")
+            sizes.append([layer, len(text)])
+            if isinstance(block, dict) and "cache_control" in block:
+                cached_until = len(sizes)
+
+    read = getattr(usage, "cache_read_input_tokens", 0) or 0
+    creation = getattr(usage, "cache_creation_input_tokens", 0) or 0
+    cached_chars = sum(size for _, size in sizes[:cached_until]) or 1
+    tokens_per_char = (read + creation) / cached_chars
+
+    report: Dict[str, Dict[str, int]] = {}
+    position = 0.0
+    for layer, size in sizes[:cached_until]:
+        tokens = size * tokens_per_char
+        layer_read = max(0.0, min(position + tokens, read) - position)
+        entry = report.setdefault(layer, {"cache_read": 0, "cache_creation": 0})
+        entry["cache_read"] += round(layer_read)
+        entry["cache_creation"] += round(tokens - layer_read)
+        position += tokens
+    return report
@@ -0,0 +1,188 @@
+import asyncio
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+import anthropic
+import httpx
+import openai
+from pydantic import BaseModel
+import metrics
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS = (408, 409, 429)  # plus every 5xx, the same set the SDKs retry on their own
+LATENCY_WINDOW = 200  # recent successful attempts kept per (stage, model)
+HEDGE_MIN_SAMPLES = 20  # no observed-p95 hedging until a stage has this many
+# Seconds a player (or a background job) waits for a whole stage call, override with LLM_DEADLINE_<STAGE>
+STAGE_DEADLINES = {"adventure": 60.0, "initial_state": 90.0, "action": 45.0, "speculation": 45.0, "cache_warmup": 20.0}
+
+
+class DeadlineExceeded(TimeoutError):
+    pass
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, (anthropic.APIConnectionError, openai.APIConnectionError, httpx.TransportError)):
+        return True  # includes timeouts; streams raise httpx errors unwrapped once the body is being read
+    if isinstance(error, (anthropic.APIStatusError, openai.APIStatusError)):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    return False
+
+
+def stage_deadline(stage: str) -> Optional[float]:
+    value = os.getenv(f"LLM_DEADLINE_{stage.upper()}")
+    return float(value) if value is not None else STAGE_DEADLINES.get(stage)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers["retry-after"])
+    except Exception:
+        return None
+
+
+class LatencyTracker:
+    def __init__(self, window: int = LATENCY_WINDOW):
+        self.window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage: str, model: str, seconds: float):
+        with self._lock:
+            samples = self._samples.get((stage, model))
+            if samples is None:
+                samples = self._samples[(stage, model)] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def quantile(self, stage: str, model: str, q: float, min_samples: int = HEDGE_MIN_SAMPLES) -> Optional[float]:
+        with self._lock:
+            samples = sorted(self._samples.get((stage, model), ()))
+        if len(samples) < min_samples:
+            return None
+        return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+class Resilience:
+    """Deadlines, retries and hedging around one model call; the SDK clients are built with max_retries=0.
+
+    An attempt is a callable taking request options ({"timeout": seconds left} under a deadline) and making one
+    SDK request. Retryable errors (connection errors, timeouts, 408/409/429/5xx) are retried with jittered
+    exponential backoff, honouring Retry-After, for as long as `max_retries` and the deadline allow. With
+    `hedge` set, an async attempt still running after `hedge_after` seconds (or the stage's observed p95) gets a
+    duplicate; the first to succeed wins and the other is cancelled, which closes its HTTP request.
+    """
+
+    def __init__(self):
+        self.latency = LatencyTracker()
+
+    def deadline(self, llm_config: BaseModel) -> Optional[float]:
+        return time.monotonic() + llm_config.deadline if llm_config.deadline else None
+
+    def check_deadline(self, deadline: Optional[float], llm_config: BaseModel) -> Optional[float]:
+        # Seconds left, DeadlineExceeded once there are none
+        if deadline is None:
+            return None
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            metrics.llm_deadlines.inc(llm_config.stage)
+            raise DeadlineExceeded(f"{llm_config.stage} deadline of {llm_config.deadline}s exceeded")
+        return remaining
+
+    def request_options(self, deadline: Optional[float], llm_config: BaseModel) -> Dict[str, Any]:
+        remaining = self.check_deadline(deadline, llm_config)
+        return {} if remaining is None else {"timeout": remaining}
+
+    def retry_delay(self, error: BaseException, attempt: int, llm_config: BaseModel, model: str, deadline: Optional[float]) -> Optional[float]:
+        # Seconds to wait before retrying, None to give up
+        if attempt >= llm_config.max_retries or not is_retryable(error):
+            return None
+        backoff = min(llm_config.retry_backoff_max, llm_config.retry_backoff * 2 ** attempt)
+        delay = backoff / 2 + random.uniform(0, backoff / 2)
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            return None
+        metrics.llm_retries.inc(llm_config.stage, model)
+        logger.warning(f"Retrying {llm_config.stage} call in {delay:.2f}s after {type(error).__name__}: {error}")
+        return delay
+
+    def hedge_delay(self, llm_config: BaseModel, model: str) -> Optional[float]:
+        if not llm_config.hedge:
+            return None
+        return llm_config.hedge_after or self.latency.quantile(llm_config.stage, model, 0.95)
+
+    def call(self, attempt: Callable[[Dict[str, Any]], Any], llm_config: BaseModel, model: str):
+        # Sync calls get deadlines and retries; hedging would need a second thread per call, async only
+        deadline = self.deadline(llm_config)
+        retries = 0
+        while True:
+            options = self.request_options(deadline, llm_config)
+            start = time.perf_counter()
+            try:
+                result = attempt(options)
+            except Exception as e:
+                self.check_deadline(deadline, llm_config)
+                delay = self.retry_delay(e, retries, llm_config, model, deadline)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                retries += 1
+                continue
+            self.latency.observe(llm_config.stage, model, time.perf_counter() - start)
+            return result
+
+    async def call_async(self, attempt: Callable[[Dict[str, Any]], Awaitable[Any]], llm_config: BaseModel, model: str):
+        deadline = self.deadline(llm_config)
+        retries = 0
+        while True:
+            options = self.request_options(deadline, llm_config)
+            try:
+                if deadline is None:
+                    return await self._hedged(attempt, options, llm_config, model)
+                return await asyncio.wait_for(self._hedged(attempt, options, llm_config, model), options["timeout"])
+            except Exception as e:
+                # wait_for's TimeoutError included: past the deadline this raises DeadlineExceeded instead
+                self.check_deadline(deadline, llm_config)
+                delay = self.retry_delay(e, retries, llm_config, model, deadline)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                retries += 1
+
+    async def _timed(self, attempt: Callable[[Dict[str, Any]], Awaitable[Any]], options: Dict[str, Any], llm_config: BaseModel, model: str):
+        start = time.perf_counter()
+        result = await attempt(options)
+        self.latency.observe(llm_config.stage, model, time.perf_counter() - start)
+        return result
+
+    async def _hedged(self, attempt: Callable[[Dict[str, Any]], Awaitable[Any]], options: Dict[str, Any], llm_config: BaseModel, model: str):
+        delay = self.hedge_delay(llm_config, model)
+        if delay is None:
+            return await self._timed(attempt, options, llm_config, model)
+        first = asyncio.ensure_future(self._timed(attempt, options, llm_config, model))
+        tasks: List[asyncio.Future] = [first]
+        error = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done:
+                metrics.llm_hedges.inc(llm_config.stage, model, "sent")
+                tasks.append(asyncio.ensure_future(self._timed(attempt, options, llm_config, model)))
+            while tasks:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.remove(task)
+                    if task.exception() is None:
+                        if task is not first:
+                            metrics.llm_hedges.inc(llm_config.stage, model, "won")
+                        return task.result()
+                    error = error or task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
@@ -0,0 +1,201 @@
+import asyncio
+import hashlib
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from pydantic import BaseModel
+from config import config_from_env
+
+logger = logging.getLogger(__name__)
+
+_FLUSH = object()
+_STOP = object()
+
+
+class ResponseCacheConfig(BaseModel):
+    path: str = "response_cache.sqlite3"
+    max_memory_entries: int = 256
+    max_disk_bytes: int = 100 * 1024 * 1024
+    ttl_seconds: float = 24 * 3600
+    evict_every: int = 100  # inserts between TTL/size sweeps of the SQLite file
+    batch_size: int = 200  # writes per commit at most
+    flush_interval: float = 0.25  # seconds the writer waits to fill a batch
+
+    @classmethod
+    def from_env(cls) -> "ResponseCacheConfig":
+        return config_from_env(cls, "RESPONSE_CACHE")
+
+
+def canonical_key(provider: str, request: Dict[str, Any]) -> str:
+    # request holds everything that determines the answer: model, messages, system, tools, tool_choice, params
+    payload = json.dumps({"provider": provider, "request": request}, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Content-addressed cache of raw completion responses: an in-memory LRU in front of a SQLite file.
+
+    Lookups that miss the LRU read SQLite on the caller's thread (async callers use get_async, which runs them
+    in a worker thread). Inserts, last-access updates and evictions go to a background writer thread that
+    commits them in batches and sweeps expired and least recently used rows every `evict_every` inserts.
+    """
+
+    def __init__(self, config: Optional[ResponseCacheConfig] = None):
+        self.config = config or ResponseCacheConfig()
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (created, value)
+        self._reader_lock = threading.Lock()
+        self._reader = self._connect()
+        self._reader.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, created REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._reader.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self._reader.execute("CREATE INDEX IF NOT EXISTS responses_created ON responses (created)")
+        self._reader.commit()
+        self._queue: "queue.Queue" = queue.Queue()
+        self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+        self._writer.start()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self.config.path, check_same_thread=False)
+        db.execute("PRAGMA journal_mode=WAL")
+        return db
+
+    def _from_memory(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, value = entry
+                if now - created <= self.config.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+        return None
+
+    def _from_disk(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        with self._reader_lock:
+            row = self._reader.execute("SELECT value, created FROM responses WHERE key = ?", (key,)).fetchone()
+        with self._lock:
+            if row is not None:
+                raw, created = row
+                if now - created <= self.config.ttl_seconds:
+                    value = json.loads(raw)
+                    self._remember(key, created, value)
+                    self._queue.put(("touch", key, now))
+                    self.disk_hits += 1
+                    return value
+                self._queue.put(("delete", key))
+                self.evictions += 1
+            self.misses += 1
+        return None
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        value = self._from_memory(key, now)
+        return value if value is not None else self._from_disk(key, now)
+
+    async def get_async(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        value = self._from_memory(key, now)
+        return value if value is not None else await asyncio.to_thread(self._from_disk, key, now)
+
+    def set(self, key: str, value: Dict[str, Any]):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+        self._queue.put(("insert", key, value, now))
+
+    def _remember(self, key: str, created: float, value: Dict[str, Any]):
+        self._memory[key] = (created, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.config.max_memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def flush(self):
+        # Blocks until everything queued so far is committed
+        done = threading.Event()
+        self._queue.put((_FLUSH, done))
+        done.wait()
+
+    def _write_loop(self):
+        db = self._connect()
+        inserts = 0
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.config.flush_interval
+            while len(batch) < self.config.batch_size and batch[-1][0] not in (_FLUSH, _STOP):
+                try:
+                    batch.append(self._queue.get(timeout=max(0.0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+            try:
+                for item in batch:
+                    if item[0] == "insert":
+                        _, key, value, now = item
+                        raw = json.dumps(value, ensure_ascii=False)
+                        db.execute(
+                            "INSERT OR REPLACE INTO responses (key, value, size, created, last_access) VALUES (?, ?, ?, ?, ?)",
+                            (key, raw, len(raw), now, now),
+                        )
+                        inserts += 1
+                        if inserts % self.config.evict_every == 0:
+                            self._evict_disk(db, now)
+                    elif item[0] == "touch":
+                        db.execute("UPDATE responses SET last_access = ? WHERE key = ?", (item[2], item[1]))
+                    elif item[0] == "delete":
+                        db.execute("DELETE FROM responses WHERE key = ?", (item[1],))
+                db.commit()
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} response cache updates: {str(e)}")
+                db.rollback()
+            for item in batch:
+                if item[0] is _FLUSH:
+                    item[1].set()
+            if batch[-1][0] is _STOP:
+                db.close()
+                return
+
+    def _evict_disk(self, db: sqlite3.Connection, now: float):
+        expired = db.execute("DELETE FROM responses WHERE created < ?", (now - self.config.ttl_seconds,)).rowcount
+        evicted = max(expired, 0)
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        while total > self.config.max_disk_bytes:
+            oldest = db.execute("SELECT key, size FROM responses ORDER BY last_access LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                total -= size
+                evicted += 1
+                if total <= self.config.max_disk_bytes:
+                    break
+        with self._lock:
+            self.evictions += evicted
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self):
+        self._queue.put((_STOP,))
+        self._writer.join()
+        with self._reader_lock:
+            self._reader.close()
@@ -0,0 +1,188 @@
+import asyncio
+import inspect
+import logging
+import time
+import uuid
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Iterable, List, Optional, Tuple
+from pydantic import BaseModel
+from config import config_from_env
+from core import GameState, StepSnapshot
+
+logger = logging.getLogger(__name__)
+
+HISTORY_LENGTH = 50
+
+
+def text_size(entries) -> int:
+    return sum(len(entry) for entry in entries)
+
+
+def snapshot_size(snapshot: StepSnapshot) -> int:
+    return 4 * len(snapshot.reaction) + snapshot.battlemap.cells.itemsize * len(snapshot.battlemap.cells) + 64
+
+
+class GameSession:
+    """Everything one player's game needs; handlers must hold `lock` while they advance the game."""
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.lock = asyncio.Lock()
+        self.game_state: Optional[GameState] = None
+        self.state_history: Deque[StepSnapshot] = deque(maxlen=HISTORY_LENGTH)
+        self.steps = 0  # steps played in the current game, including the initial state
+        self.current_adventure: Optional[Dict[str, Any]] = None
+        self.prepared_initial_state = None  # initial state that came with a pooled adventure
+        self.pending_job: Optional[str] = None  # generation job whose result the page is waiting for
+        self.applied_job: Optional[str] = None
+        self.ready: Optional[asyncio.Future] = None  # on_create work still running, e.g. restoring the game from disk
+        self.last_access = time.monotonic()
+        self._text_size = 0
+        self.size = 0
+
+    def advance(self, state: GameState, usage: Tuple[int, int, int, int] = (0, 0, 0, 0), response_time: float = 0.0) -> StepSnapshot:
+        # Memory estimate is kept incrementally: the log text of the current state (its chunks are shared
+        # with every earlier state, see history.History) plus the slotted step snapshots
+        previous = self.game_state
+        if previous is None:
+            self._text_size = text_size(state.log) + text_size(state.conversation_history)
+        else:
+            self._text_size += text_size(state.log[len(previous.log):]) + text_size(state.conversation_history[len(previous.conversation_history):])
+        self.game_state = state
+        self.steps += 1
+        snapshot = state.snapshot(self.steps, usage, response_time)
+        self.state_history.append(snapshot)
+        self.size = 4 * self._text_size + sum(snapshot_size(snapshot) for snapshot in self.state_history)
+        return snapshot
+
+    def start(self, state: GameState, usage: Tuple[int, int, int, int] = (0, 0, 0, 0), response_time: float = 0.0) -> StepSnapshot:
+        # First state of a new game; the adventure stays as it was picked
+        self.game_state = None
+        self.state_history.clear()
+        self.steps = 0
+        return self.advance(state, usage, response_time)
+
+    def restore(self, history: Iterable[GameState], last_step: int):
+        history = list(history)
+        self.reset()
+        self.steps = last_step - len(history)
+        for state in history:
+            self.advance(state)
+        self.current_adventure = self.game_state.adventure if self.game_state is not None else None
+
+    def reset(self):
+        self.game_state = None
+        self.state_history.clear()
+        self.current_adventure = None
+        self.prepared_initial_state = None
+        self.pending_job = None
+        self.steps = 0
+        self._text_size = 0
+        self.size = 0
+
+
+class SessionStoreConfig(BaseModel):
+    max_sessions: int = 1000
+    idle_timeout: float = 3600.0  # seconds without a request before a session is dropped
+    max_memory_bytes: int = 256 * 1024 * 1024  # estimated, see GameSession.advance
+    sweep_interval: float = 60.0
+
+    @classmethod
+    def from_env(cls) -> "SessionStoreConfig":
+        return config_from_env(cls, "SESSION_STORE")
+
+
+class SessionStore:
+    """In-process LRU of game sessions with idle-timeout and memory-cap eviction."""
+
+    def __init__(self, config: Optional[SessionStoreConfig] = None):
+        self.config = config or SessionStoreConfig.from_env()
+        self._sessions: "OrderedDict[str, GameSession]" = OrderedDict()
+        self._task: Optional[asyncio.Task] = None
+        # called with every new session; awaitables it returns (e.g. a restore) finish before open() hands the session out
+        self.on_create: List[Callable[[GameSession], Optional[Awaitable]]] = []
+        self.on_evict: List[Callable[[str], None]] = []  # called with the session id of every dropped session
+        self.created = 0
+        self.evictions = 0
+        self.idle_evictions = 0
+
+    def get(self, session_id: Optional[str]) -> Optional[GameSession]:
+        session = self._sessions.get(session_id) if session_id else None
+        if session is not None:
+            session.last_access = time.monotonic()
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def get_or_create(self, session_id: Optional[str]) -> GameSession:
+        session = self.get(session_id)
+        if session is None:
+            session_id = session_id or uuid.uuid4().hex
+            session = GameSession(session_id)
+            self._sessions[session_id] = session
+            self.created += 1
+            pending = [result for result in (callback(session) for callback in self.on_create) if inspect.isawaitable(result)]
+            if pending:
+                session.ready = asyncio.ensure_future(asyncio.gather(*pending))
+            self.enforce_limits(keep=session_id)
+        return session
+
+    async def open(self, session_id: Optional[str]) -> GameSession:
+        # get_or_create for request handlers: concurrent first requests all wait for the same restore
+        session = self.get_or_create(session_id)
+        if session.ready is not None:
+            await asyncio.shield(session.ready)
+        return session
+
+    def discard(self, session_id: str):
+        if self._sessions.pop(session_id, None) is not None:
+            self._notify(session_id)
+
+    def enforce_limits(self, keep: Optional[str] = None):
+        # `keep` is a session being handed out, which stays even if every other one is busy
+        now = time.monotonic()
+        for session_id, session in list(self._sessions.items()):
+            if now - session.last_access > self.config.idle_timeout and not session.lock.locked():
+                self._evict(session_id)
+                self.idle_evictions += 1
+        # LRU order: the oldest sessions go first, but never one that is in the middle of a turn
+        memory = sum(session.size for session in self._sessions.values())
+        for session_id, session in list(self._sessions.items()):
+            if len(self._sessions) <= self.config.max_sessions and memory <= self.config.max_memory_bytes:
+                break
+            if session.lock.locked() or session_id == keep:
+                continue
+            memory -= session.size
+            self._evict(session_id)
+
+    def _evict(self, session_id: str):
+        del self._sessions[session_id]
+        self.evictions += 1
+        self._notify(session_id)
+        logger.info(f"Evicted game session {session_id}")
+
+    def _notify(self, session_id: str):
+        for callback in self.on_evict:
+            callback(session_id)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.config.sweep_interval)
+            self.enforce_limits()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "live_sessions": len(self._sessions),
+            "created": self.created,
+            "evictions": self.evictions,
+            "idle_evictions": self.idle_evictions,
+            "memory_bytes": sum(session.size for session in self._sessions.values()),
+        }
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+from pydantic import BaseModel
+from config import config_from_env
+from core import GameState, DIRECTIONS, DIRECTION_WORDS, interpret_local_action, update_battlemap_with_ai_async
+from prompt import legend
+
+logger = logging.getLogger(__name__)
+
+ITEM_NAMES = {"Gem", "Key", "Sword", "Shield", "Potion", "Scroll", "Mushroom", "Herb", "Pickaxe", "Axe", "Bow", "Fishing Rod"}
+
+_VERBS = {
+    "go": "move", "walk": "move", "run": "move", "head": "move", "step": "move",
+    "grab": "pick", "take": "pick", "speak": "talk", "attack": "fight",
+}
+_FILLER = {"the", "a", "an", "to", "with", "up", "please"}
+
+
+def canonical_action(action: str) -> str:
+    # "Go up", "walk north", "north" and "move north." all become "move north"; "take the gem" becomes "pick gem"
+    words = re.findall(r"[a-z]+", action.lower())
+    if not words:
+        return ""
+    if words[0] in DIRECTIONS or words[0] in DIRECTION_WORDS:
+        words.insert(0, "move")
+    verb, rest = _VERBS.get(words[0], words[0]), words[1:]
+    if verb == "move":
+        rest = [DIRECTION_WORDS.get(word, word) for word in rest]
+    return " ".join([verb] + [word for word in rest if word not in _FILLER])
+
+
+def _interaction(name: str) -> Optional[str]:
+    if name.endswith("(NPC)"):
+        return f"talk to the {name[:-len('(NPC)')].strip().lower()}"
+    if name.endswith("(Enemy)"):
+        return f"fight the {name[:-len('(Enemy)')].strip().lower()}"
+    if name in ITEM_NAMES:
+        return f"pick up the {name.lower()}"
+    return None
+
+
+_INTERACTIONS = {emoji: _interaction(name) for emoji, name in legend if _interaction(name)}
+
+
+def predict_actions(state: GameState) -> List[str]:
+    # Interactions with adjacent NPCs, enemies and items first, then the cardinal moves that need the model
+    x, y = state.player_pos
+    interactions, moves = [], []
+    for direction, (dx, dy) in DIRECTIONS.items():
+        neighbour = (x + dx, y + dy)
+        move = f"move {direction}"
+        if interpret_local_action(state, move) is None:  # local moves resolve instantly, no need to spend budget
+            moves.append(move)
+        if not state.battlemap.in_bounds(neighbour):
+            continue
+        interaction = _INTERACTIONS.get(state.battlemap[neighbour])
+        if interaction and interaction not in interactions:
+            interactions.append(interaction)
+    return interactions + moves
+
+
+def as_typed(state: GameState, speculated: GameState, action: str) -> GameState:
+    # A hit was computed for the predicted wording ("fight the wolf"); the game records what the player typed
+    if speculated.last_action == action:
+        return speculated
+    return speculated.evolve(
+        last_action=action,
+        conversation_history=state.conversation_history + [f"User action: {action}", speculated.conversation_history[-1]],
+    )
+
+
+class SpeculationConfig(BaseModel):
+    enabled: bool = False
+    per_turn_budget: int = 2  # speculative completions started after each turn
+    per_session_budget: int = 200  # total speculative completions a session may ever start
+
+    @classmethod
+    def from_env(cls) -> "SpeculationConfig":
+        return config_from_env(cls, "SPECULATION", switch="SPECULATION")
+
+
+class SpeculationEngine:
+    def __init__(self, config: Optional[SpeculationConfig] = None):
+        self.config = config or SpeculationConfig.from_env()
+        # session -> (state the speculations were computed from, {canonical action: task})
+        self._speculations: Dict[str, Tuple[GameState, Dict[str, asyncio.Task]]] = {}
+        self._spent: Dict[str, int] = {}
+        self.launched = 0
+        self.hits = 0
+        self.misses = 0
+        self.cancelled = 0
+
+    def speculate(self, session_id: str, state: GameState):
+        if not self.config.enabled:
+            return
+        self.cancel(session_id)
+        spent = self._spent.get(session_id, 0)
+        budget = min(self.config.per_turn_budget, self.config.per_session_budget - spent)
+        tasks: Dict[str, asyncio.Task] = {}
+        for action in predict_actions(state)[:max(budget, 0)]:
+            tasks[canonical_action(action)] = asyncio.create_task(update_battlemap_with_ai_async(state, action, stage="speculation"))
+        self._spent[session_id] = spent + len(tasks)
+        self.launched += len(tasks)
+        self._speculations[session_id] = (state, tasks)
+
+    async def take(self, session_id: str, state: GameState, action: str) -> Optional[Tuple[GameState, int, int, int, int]]:
+        # Returns the precomputed result when `action` matches a prediction made from this exact state
+        if not self.config.enabled:
+            return None
+        speculated_state, tasks = self._speculations.pop(session_id, (None, {}))
+        task = tasks.pop(canonical_action(action), None) if speculated_state is state else None
+        self._cancel_tasks(tasks)
+        if task is None:
+            self.misses += 1
+            return None
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            result = None
+        if result is None or result[0] is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        logger.info(f"Speculation hit for action: {action}")
+        return (as_typed(state, result[0], action), *result[1:])
+
+    def cancel(self, session_id: str):
+        _, tasks = self._speculations.pop(session_id, (None, {}))
+        self._cancel_tasks(tasks)
+
+    def forget(self, session_id: str):
+        self.cancel(session_id)
+        self._spent.pop(session_id, None)
+
+    async def stop(self):
+        for session_id in list(self._speculations):
+            self.cancel(session_id)
+
+    def _cancel_tasks(self, tasks: Dict[str, asyncio.Task]):
+        for task in tasks.values():
+            if not task.done():
+                task.cancel()
+                self.cancelled += 1
+
+    def stats(self) -> Dict[str, float]:
+        taken = self.hits + self.misses
+        return {
+            "launched": self.launched,
+            "hits": self.hits,
+            "misses": self.misses,
+            "cancelled": self.cancelled,
+            "hit_rate": self.hits / taken if taken else 0.0,
+        }
@@ -1,19 +1,25 @@
 import json
-from aiutilities import AIUtilities, LLMConfig
+from typing import Iterable, Optional
+from aiutilities import LLMConfig, get_shared_ai_utilities
+from resilience import stage_deadline
 from anthropic.types import ToolUseBlock, TextBlock
 import logging
-import asyncio
-from concurrent.futures import TimeoutError
 
-ai_utilities = AIUtilities()
+ai_utilities = get_shared_ai_utilities()
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-async def generate_adventure(user_input: str):
-    logger.info(f"Starting adventure generation for input: {user_input}")
+def _adventure_request(user_input: str, avoid: Iterable[str] = (), variation: Optional[str] = None):
+    # `avoid` and `variation` make repeated requests for one theme (the adventure pool) differ from each other
+    request = f"Generate a random adventure based on this input: {user_input}"
+    avoid = list(avoid)
+    if avoid:
+        request += "\n\nIt must be different from these adventures: " + "; ".join(avoid)
+    if variation:
+        request += f"\n\nVariation: {variation}"
     prompt = [
         {"role": "system", "content": "You are a creative storyteller tasked with generating a random adventure based on user input."},
-        {"role": "user", "content": f"Generate a random adventure based on this input: {user_input}"}
+        {"role": "user", "content": request}
     ]
 
     json_schema = {
@@ -48,14 +54,17 @@ async def generate_adventure(user_input: str):
         "required": ["title", "setting", "objective", "challenges", "key_locations", "npcs"]
     }
 
-    llm_config = LLMConfig(client="anthropic", model="claude-3-5-sonnet-20240620", json_schema=json_schema)
+    # Not served from the response cache: the same theme must still give a new adventure every time
+    llm_config = LLMConfig(client="anthropic", model="claude-3-5-sonnet-20240620", json_schema=json_schema, use_response_cache=False, stage="adventure", deadline=stage_deadline("adventure"))
+    return prompt, llm_config
+
+async def generate_adventure(user_input: str, avoid: Iterable[str] = (), variation: Optional[str] = None):
+    logger.info(f"Starting adventure generation for input: {user_input}")
+    prompt, llm_config = _adventure_request(user_input, avoid, variation)
 
     try:
         logger.info("Sending request to AI")
-        result = await asyncio.wait_for(
-            asyncio.to_thread(ai_utilities.run_ai_tool_completion, prompt, llm_config=llm_config),
-            timeout=60  # 60 seconds timeout
-        )
+        result = await ai_utilities.run_ai_tool_completion_async(prompt, llm_config=llm_config)
         logger.info(f"AI response received. Type: {type(result)}")
         
         if isinstance(result, str):
@@ -83,9 +92,6 @@ async def generate_adventure(user_input: str):
         
         logger.info("Adventure generated successfully")
         return adventure, result.usage.input_tokens, result.usage.output_tokens, result.usage.cache_creation_input_tokens, result.usage.cache_read_input_tokens
-    except TimeoutError:
-        logger.error("Adventure generation timed out")
-        return None, 0, 0, 0, 0
     except json.JSONDecodeError as e:
         logger.error(f"JSON decode error: {str(e)}")
         logger.error(f"Raw response: {result}")
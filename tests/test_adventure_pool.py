@@ -0,0 +1,52 @@
+import asyncio
+import adventure_pool
+from adventure_pool import AdventurePool, AdventurePoolConfig, normalize_prompt
+
+
+def test_normalize_prompt():
+    assert normalize_prompt("Space Pirates!") == normalize_prompt("the space pirates adventure") == normalize_prompt("pirates in space")
+
+
+def fill(monkeypatch, write_adventure, slots=3):
+    requests = []
+
+    async def fake_generate_adventure(theme, avoid=(), variation=None):
+        requests.append((theme, list(avoid), variation))
+        return write_adventure(theme, variation), 1, 2, 0, 0
+
+    async def fake_initial_state(adventure):
+        return None, 0, 0, 0, 0, 0.0
+
+    monkeypatch.setattr(adventure_pool, "generate_adventure", fake_generate_adventure)
+    monkeypatch.setattr(adventure_pool, "generate_initial_state_async", fake_initial_state)
+    pool = AdventurePool(AdventurePoolConfig(themes=["Space pirates"]))
+    key = normalize_prompt("Space pirates")
+
+    async def scenario():
+        for _ in range(slots):
+            pool._filling[key] += 1
+            await pool._fill(key)
+
+    asyncio.run(scenario())
+    return pool, requests
+
+
+def test_refills_ask_for_distinct_adventures(monkeypatch):
+    pool, requests = fill(monkeypatch, lambda theme, variation: {"title": f"{theme} {variation}"})
+    assert len({variation for _, _, variation in requests}) == 3
+    assert requests[2][1] == [f"Space pirates {requests[0][2]}", f"Space pirates {requests[1][2]}"]
+    titles = []
+    while True:
+        prepared = pool.take("space pirates")
+        if prepared is None:
+            break
+        titles.append(prepared.adventure["title"])
+    assert len(titles) == len(set(titles)) == 3
+
+
+def test_duplicate_adventures_are_dropped(monkeypatch):
+    pool, _ = fill(monkeypatch, lambda theme, variation: {"title": "The Same Old Ship"})
+    assert pool.stats()["ready"] == 1
+    assert pool.stats()["duplicates"] == 2
+    assert pool.take("Space pirates").adventure["title"] == "The Same Old Ship"
+    assert pool.take("Space pirates") is None
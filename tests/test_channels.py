@@ -0,0 +1,31 @@
+from channels import SessionChannel, format_event
+
+
+def test_missed_events_after_an_id():
+    channel = SessionChannel()
+    ids = [channel.publish("step", f"<p>{i}</p>") for i in range(3)]
+    assert ids == [1, 2, 3]
+    assert channel.missed(3) == []
+    assert channel.missed(1) == [format_event(2, "step", "<p>1</p>"), format_event(3, "step", "<p>2</p>")]
+    assert channel.missed(0) == [format_event(i + 1, "step", f"<p>{i}</p>") for i in range(3)]
+
+
+def test_missed_is_none_once_events_were_dropped():
+    channel = SessionChannel(replay_events=2)
+    for i in range(5):
+        channel.publish("step", str(i))
+    assert channel.missed(3) == [format_event(4, "step", "3"), format_event(5, "step", "4")]
+    assert channel.missed(2) is None
+
+
+def test_latest():
+    channel = SessionChannel()
+    channel.publish("step-a", "first")
+    channel.publish("narrative-b", "other")
+    channel.publish("step-a", "second")
+    assert channel.latest("step-a") == "second"
+    assert channel.latest("step-c") is None
+
+
+def test_multiline_data():
+    assert format_event(7, "step", "<div>\n<p>x</p>\n</div>") == "id: 7\nevent: step\ndata: <div>\ndata: <p>x</p>\ndata: </div>\n\n"
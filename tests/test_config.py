@@ -0,0 +1,36 @@
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+from config import config_from_env
+
+
+class ExampleConfig(BaseModel):
+    enabled: bool = False
+    mode: Literal["off", "record", "replay"] = "off"
+    size: int = 1
+    scale: float = 1.0
+    verbose: bool = True
+    limit: Optional[float] = None
+    names: List[str] = Field(default_factory=lambda: ["a"])
+
+
+def test_defaults_without_environment(monkeypatch):
+    assert config_from_env(ExampleConfig, "EXAMPLE", switch="EXAMPLE") == ExampleConfig()
+
+
+def test_overrides(monkeypatch):
+    for name, value in {"EXAMPLE": "1", "EXAMPLE_MODE": "replay", "EXAMPLE_SIZE": "3", "EXAMPLE_SCALE": "0.5",
+                        "EXAMPLE_VERBOSE": "0", "EXAMPLE_LIMIT": "2.5", "EXAMPLE_NAMES": "x, y,"}.items():
+        monkeypatch.setenv(name, value)
+    config = config_from_env(ExampleConfig, "EXAMPLE", switch="EXAMPLE")
+    assert config == ExampleConfig(enabled=True, mode="replay", size=3, scale=0.5, verbose=False, limit=2.5, names=["x", "y"])
+
+
+def test_switch_wins_over_prefixed_enabled(monkeypatch):
+    monkeypatch.setenv("EXAMPLE", "0")
+    monkeypatch.setenv("EXAMPLE_ENABLED", "1")
+    assert config_from_env(ExampleConfig, "EXAMPLE", switch="EXAMPLE").enabled is False
+
+
+def test_empty_list_keeps_the_default(monkeypatch):
+    monkeypatch.setenv("EXAMPLE_NAMES", "")
+    assert config_from_env(ExampleConfig, "EXAMPLE").names == ["a"]
@@ -0,0 +1,61 @@
+import pytest
+from core import GameState, interpret_local_action, parse_move_action
+from grid import Grid
+
+
+@pytest.mark.parametrize("action, move", [
+    ("move north", ("north", 1)),
+    ("go left 2", ("west", 2)),
+    ("W", ("west", 1)),
+    ("walk east three steps", ("east", 3)),
+    ("  Head to the south.  ", ("south", 1)),
+    ("run down 4 tiles!", ("south", 4)),
+])
+def test_moves(action, move):
+    assert parse_move_action(action) == move
+
+
+@pytest.mark.parametrize("action", ["open the chest", "move north and open the door", "go north 0", "jump", "", "northwest"])
+def test_not_a_plain_move(action):
+    assert parse_move_action(action) is None
+
+
+ROWS = [
+    "🌾 🌾 🌾 🌾 🌾 🌾",
+    "🌾 🌊 🌾 🪑 . ❔",
+    "🌾 🌾 🌾 🌾 🌾 🌾",
+    "🌾 🌾 🏜️ 🌾 🧙 🌾",
+    "🌾 🌾 🌾 🌾 🌾 🌾",
+    "🌾 🌾 🌾 🌾 🌾 🌾",
+]
+
+
+def state_at(pos):
+    return GameState(battlemap=Grid.from_rows(ROWS), player_pos=pos, log=["Start."])
+
+
+def test_local_move_over_open_ground():
+    state = state_at((0, 2))
+    moved = interpret_local_action(state, "go east 2")
+    assert moved.player_pos == (2, 2)
+    assert moved.battlemap == state.battlemap
+    assert moved.last_action == "go east 2"
+    assert moved.log[-1] == "AI response: You walk 2 tiles east."
+
+
+def test_impassable_tile_stops_the_move():
+    moved = interpret_local_action(state_at((1, 3)), "north 2")
+    assert moved.player_pos == (1, 2)
+    assert moved.log[-1] == "AI response: You walk north. The water blocks you from going further."
+
+
+@pytest.mark.parametrize("pos, action", [
+    ((3, 2), "north"),  # non-legend furniture
+    ((4, 2), "north"),  # empty cell, possibly a tile that was lost
+    ((5, 2), "north"),  # unknown tile
+    ((4, 4), "north"),  # NPC
+    ((0, 0), "north"),  # map edge
+    ((0, 0), "open the chest"),
+])
+def test_model_decides(pos, action):
+    assert interpret_local_action(state_at(pos), action) is None
@@ -0,0 +1,89 @@
+import json
+import re
+import pytest
+from grid import EMPTY_TILE, UNKNOWN_TILE, Grid, TileTable
+from prompt import system_prompt
+
+ROWS = [
+    "🌳 🌳 🌾 🌾 🌊 🌊",
+    "🌳 . 🌾 🌾 🌊 🌊",
+    "🌾 🌾 🌾 🌾 🌾 🌾",
+    "🌾 🌾 🗻 🗻 🌾 🌾",
+    "🌾 🌾 🌾 🌾 🌾 🌾",
+    "🌾 🌾 🌾 🌾 🌾 🌾",
+]
+
+
+def test_round_trip():
+    grid = Grid.from_rows(ROWS)
+    assert grid.to_rows() == ROWS
+    assert grid[(0, 0)] == "🌳"
+    assert grid[(1, 1)] == EMPTY_TILE
+    assert grid[(3, 3)] == "🗻"
+
+
+def test_rows_without_separators():
+    assert Grid.from_rows([row.replace(" ", "") for row in ROWS]) == Grid.from_rows(ROWS)
+
+
+def test_variation_selector_is_ignored():
+    rows = list(ROWS)
+    rows[5] = "🏜️ 🏜 🌾 🌾 🌾 🌾"
+    grid = Grid.from_rows(rows)
+    assert grid[(0, 5)] == grid[(1, 5)]
+
+
+def test_wrong_size_is_rejected():
+    with pytest.raises(ValueError):
+        Grid.from_rows(ROWS[:-1])
+    with pytest.raises(ValueError):
+        Grid.from_rows(ROWS[:-1] + ["🌾 🌾 🌾"])
+
+
+def test_non_legend_tiles_keep_their_identity():
+    rows = list(ROWS)
+    rows[0] = "🪑 🛋️ 🛏 🚪 🪨 ⛰️"
+    grid = Grid.from_rows(rows)
+    assert grid.to_rows()[0] == rows[0]
+    assert grid[(0, 0)] == "🪑"
+    assert grid[(3, 0)] == "🚪"
+
+
+def test_words_become_the_unknown_tile():
+    rows = list(ROWS)
+    rows[0] = "wall 🌳 🌾 🌾 🌊 🌊"
+    assert Grid.from_rows(rows)[(0, 0)] == UNKNOWN_TILE
+
+
+def test_tile_table_is_bounded():
+    table = TileTable(["🌾"], max_extra=2)
+    codes = [table.code(symbol) for symbol in ("🪑", "🚪", "🪨", "🛏️")]
+    assert codes[:2] == [table.fixed, table.fixed + 1]
+    assert codes[2:] == [table.unknown, table.unknown]
+    assert len(table) == table.fixed + 2
+    assert table.code("🚪") == codes[1]
+
+
+def test_prompt_example_maps_round_trip():
+    maps = [json.loads("[" + rows + "]") for rows in re.findall(r'"battlemap": \[(.*?)\]', system_prompt, re.S)]
+    assert maps
+    for rows in maps:
+        grid = Grid.from_rows(rows)
+        assert [row.replace("\ufe0f", "") for row in grid.to_rows()] == [row.replace("\ufe0f", "") for row in rows]
+        assert UNKNOWN_TILE not in grid.to_dict().values()
+        assert Grid.from_rows([row.replace(" ", "") for row in rows]) == grid
+
+
+def test_diff():
+    before = Grid.from_rows(ROWS)
+    after = before.copy()
+    after[(2, 0)] = "🌳"
+    after[(5, 5)] = "🌊"
+    assert before.diff(after) == [((2, 0), "🌳"), ((5, 5), "🌊")]
+    assert before.diff(before.copy()) == []
+    assert before != after
+
+
+def test_diff_of_a_different_size_is_the_whole_map():
+    small = Grid(2, 2)
+    assert len(Grid.from_rows(ROWS).diff(small)) == 4
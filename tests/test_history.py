@@ -0,0 +1,44 @@
+from history import CHUNK_SIZE, History
+
+
+def test_append_and_index():
+    entries = [f"entry {i}" for i in range(3 * CHUNK_SIZE + 5)]
+    history = History()
+    for entry in entries:
+        history = history + [entry]
+    assert len(history) == len(entries)
+    assert list(history) == entries
+    assert history[0] == entries[0]
+    assert history[-1] == entries[-1]
+    assert history[CHUNK_SIZE] == entries[CHUNK_SIZE]
+    assert history[-10:] == entries[-10:]
+    assert history[5:CHUNK_SIZE + 7] == entries[5:CHUNK_SIZE + 7]
+    assert history[::2] == entries[::2]
+
+
+def test_appending_leaves_the_original_unchanged():
+    base = History(["a", "b"])
+    longer = base + ["c"]
+    other = base + ["d", "e"]
+    assert list(base) == ["a", "b"]
+    assert list(longer) == ["a", "b", "c"]
+    assert list(other) == ["a", "b", "d", "e"]
+
+
+def test_full_chunks_are_shared():
+    base = History(f"entry {i}" for i in range(CHUNK_SIZE * 2))
+    longer = base + ["next"]
+    assert longer._chunks is base._chunks
+
+
+def test_equality_and_bounds():
+    history = History(["a", "b"])
+    assert history == ["a", "b"]
+    assert history == History(["a", "b"])
+    assert history != ["a"]
+    try:
+        history[2]
+    except IndexError:
+        pass
+    else:
+        raise AssertionError("expected IndexError")
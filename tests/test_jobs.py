@@ -0,0 +1,92 @@
+import asyncio
+from jobs import JobQueue, JobQueueConfig
+
+
+def make_queue(**overrides):
+    return JobQueue(JobQueueConfig(**overrides))
+
+
+def test_identical_jobs_in_flight_are_shared():
+    async def scenario():
+        jobs = make_queue(max_workers=1)
+        release = asyncio.Event()
+        calls = []
+
+        async def generate(job):
+            calls.append(job.key)
+            await release.wait()
+            return f"adventure for {job.key}"
+
+        first = jobs.submit("adventure", "session-a", generate)
+        assert jobs.submit("adventure", "session-a", generate) is first
+        other = jobs.submit("adventure", "session-b", generate)
+        assert other is not first
+        assert jobs.position(other) == 2
+        jobs.start()
+        await asyncio.sleep(0)
+        assert first.status == "running" and jobs.position(other) == 1
+        assert jobs.submit("adventure", "session-a", generate) is first
+        release.set()
+        while other.status != "done":
+            await asyncio.sleep(0)
+        assert calls == ["session-a", "session-b"]
+        assert first.result == "adventure for session-a"
+        assert jobs.stats()["deduplicated"] == 2
+        # Once finished the key is free again, but the old job stays pollable
+        again = jobs.submit("adventure", "session-a", generate)
+        assert again is not first
+        assert jobs.get(first.id) is first
+        await jobs.stop()
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_new_jobs():
+    async def scenario():
+        jobs = make_queue(max_queued=1)
+
+        async def generate(job):
+            return None
+
+        assert jobs.submit("adventure", "a", generate) is not None
+        assert jobs.submit("adventure", "b", generate) is None
+        assert jobs.submit("adventure", "a", generate) is not None  # joining needs no room
+        assert jobs.stats()["rejected"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_failed_job_frees_its_key():
+    async def scenario():
+        jobs = make_queue()
+
+        async def generate(job):
+            raise RuntimeError("model error")
+
+        job = jobs.submit("initial_state", "a", generate)
+        jobs.start()
+        while job.finished is None:
+            await asyncio.sleep(0)
+        assert (job.status, job.error) == ("failed", "model error")
+        assert jobs.submit("initial_state", "a", generate) is not job
+        await jobs.stop()
+
+    asyncio.run(scenario())
+
+
+def test_finished_jobs_expire():
+    async def scenario():
+        jobs = make_queue(result_ttl=0)
+
+        async def generate(job):
+            return None
+
+        job = jobs.submit("adventure", "a", generate)
+        jobs.start()
+        while job.finished is None:
+            await asyncio.sleep(0)
+        job.finished -= 1
+        assert jobs.get(job.id) is None
+        await jobs.stop()
+
+    asyncio.run(scenario())
@@ -0,0 +1,33 @@
+import json
+from partial_json import PartialJSONObjectParser
+
+
+def test_fields_complete_as_they_stream():
+    parser = PartialJSONObjectParser()
+    assert parser.feed('{"description": "A dark ') == {}
+    assert parser.feed('room", "player_pos": [1,') == {"description": "A dark room"}
+    assert parser.feed(' 2], "change_type": "same_') == {"player_pos": [1, 2]}
+    assert parser.feed('map"') == {"change_type": "same_map"}
+    assert not parser.done
+    assert parser.feed("}") == {}
+    assert parser.done
+
+
+def test_scalars_strings_with_escapes_and_nested_values():
+    document = {"a": 1.5, "b": True, "c": None, "d": 'say "hi", {ok}', "e": {"x": [1, {"y": "]"}]}, "f": -3}
+    text = json.dumps(document)
+    parser = PartialJSONObjectParser()
+    completed = {}
+    for char in text:
+        completed.update(parser.feed(char))
+    assert completed == document
+    assert parser.fields == document
+    assert parser.done
+
+
+def test_each_field_is_reported_once():
+    parser = PartialJSONObjectParser()
+    first = parser.feed('{"a": "x", "b": ')
+    second = parser.feed('"y"}')
+    assert first == {"a": "x"}
+    assert second == {"b": "y"}
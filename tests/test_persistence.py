@@ -0,0 +1,73 @@
+from core import GameState, advance_state
+from grid import Grid
+from persistence import GameEventStore, GameEventStoreConfig, state_to_snapshot
+
+
+def make_store(path, **overrides):
+    return GameEventStore(GameEventStoreConfig(**{"path": str(path), "snapshot_interval": 3, "flush_interval": 0.01, **overrides}))
+
+
+def play(store, session_id, turns):
+    state = GameState(battlemap=Grid.from_rows(["🌾" * 6] * 6), log=["You wake up."], adventure={"title": "Test"})
+    store.start_game(session_id, state)
+    states = [state]
+    for turn in range(turns):
+        battlemap = state.battlemap.copy()
+        battlemap[(turn % 6, 0)] = "🌲"
+        previous, state = state, advance_state(state, f"action {turn}", battlemap, (turn % 6, 1), f"reaction {turn}", "same_map", 1)
+        store.record_turn(session_id, previous, state)
+        states.append(state)
+    return states
+
+
+def assert_same(restored, expected):
+    assert restored.battlemap == expected.battlemap
+    assert restored.player_pos == expected.player_pos
+    assert restored.last_action == expected.last_action
+    assert list(restored.log) == list(expected.log)
+    assert list(restored.conversation_history) == list(expected.conversation_history)
+    assert restored.adventure == expected.adventure
+
+
+def test_restore_from_a_later_snapshot_without_log(tmp_path):
+    store = make_store(tmp_path / "games.sqlite3")
+    states = play(store, "s", 8)
+    history = store.restore("s", history_length=2)  # starts from snapshot 6, which has no log
+    assert len(history) == 2
+    for restored, expected in zip(history, states[-2:]):
+        assert_same(restored, expected)
+    assert store.turns("s") == 8
+    store.close()
+
+
+def test_restore_in_a_new_process(tmp_path):
+    store = make_store(tmp_path / "games.sqlite3")
+    states = play(store, "s", 5)
+    store.close()
+    store = make_store(tmp_path / "games.sqlite3")
+    history = store.restore("s", history_length=50)  # only snapshot 0 leaves enough states
+    assert len(history) == 6
+    for restored, expected in zip(history, states):
+        assert_same(restored, expected)
+    assert store.restore("other") is None
+    store.close()
+
+
+def test_restore_from_an_old_snapshot_with_log(tmp_path):
+    # Snapshots written before periodic ones dropped the log still restore from themselves
+    store = make_store(tmp_path / "games.sqlite3", snapshot_interval=100)
+    states = play(store, "s", 5)
+    store._queue.put(("snapshot", "s", 3, state_to_snapshot(states[3])))
+    history = store.restore("s", history_length=2)
+    assert len(history) == 2
+    for restored, expected in zip(history, states[-2:]):
+        assert_same(restored, expected)
+    store.close()
+
+
+def test_ended_game_is_not_restored(tmp_path):
+    store = make_store(tmp_path / "games.sqlite3")
+    play(store, "s", 2)
+    store.end_game("s")
+    assert store.restore("s") is None
+    store.close()
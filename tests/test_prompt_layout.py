@@ -0,0 +1,32 @@
+from prompt_layout import CONVERSATION_WINDOW, EPHEMERAL, conversation_layers, conversation_window_start
+
+
+def history(interactions):
+    return [entry for i in range(interactions) for entry in (f"User action: {i}", f"AI response: {i}")]
+
+
+def test_short_conversation_is_sent_whole():
+    layers = conversation_layers(history(2))
+    assert layers[0]["text"] == "Recent conversation:"
+    assert [layer["text"] for layer in layers[1:]] == ["User action: 0\nAI response: 0", "User action: 1\nAI response: 1"]
+
+
+def test_last_two_blocks_are_cache_breakpoints():
+    layers = conversation_layers(history(4))
+    assert [layer.get("cache_control") for layer in layers] == [None, None, None, EPHEMERAL, EPHEMERAL]
+    assert all(layer["layer"] == "conversation" for layer in layers)
+
+
+def test_window_start_moves_in_steps():
+    starts = [conversation_window_start(length) for length in range(0, 4 * CONVERSATION_WINDOW + 1, 2)]
+    assert starts == sorted(starts)
+    assert all(start % CONVERSATION_WINDOW == 0 for start in starts)
+    assert all(length - start < 2 * CONVERSATION_WINDOW for length, start in zip(range(0, 4 * CONVERSATION_WINDOW + 1, 2), starts))
+
+
+def test_next_turn_keeps_the_previous_prefix():
+    # Between window steps the new prompt extends the old one, so the cached prefix stays valid
+    entries = history(7)
+    before = [layer["text"] for layer in conversation_layers(entries)]
+    after = [layer["text"] for layer in conversation_layers(entries + ["User action: 7", "AI response: 7"])]
+    assert after[:len(before)] == before
@@ -0,0 +1,107 @@
+import asyncio
+import time
+import anthropic
+import httpx
+import pytest
+from aiutilities import LLMConfig
+from resilience import DeadlineExceeded, Resilience
+
+
+def make_config(**overrides):
+    return LLMConfig(**{"client": "anthropic", "stage": "test", "retry_backoff": 0.001, "retry_backoff_max": 0.001, **overrides})
+
+
+def flaky(failures, result="ok", error=lambda: httpx.ConnectError("connection refused")):
+    calls = []
+
+    def attempt(options):
+        calls.append(options)
+        if len(calls) <= failures:
+            raise error()
+        return result
+
+    return attempt, calls
+
+
+def test_retries_retryable_errors():
+    attempt, calls = flaky(2)
+    assert Resilience().call(attempt, make_config(max_retries=2), "model") == "ok"
+    assert len(calls) == 3
+
+
+def test_gives_up_after_max_retries():
+    attempt, calls = flaky(3)
+    with pytest.raises(httpx.ConnectError):
+        Resilience().call(attempt, make_config(max_retries=2), "model")
+    assert len(calls) == 3
+
+
+def test_does_not_retry_other_errors():
+    attempt, calls = flaky(1, error=lambda: ValueError("bad request body"))
+    with pytest.raises(ValueError):
+        Resilience().call(attempt, make_config(), "model")
+    assert len(calls) == 1
+
+
+def test_retry_delay_honours_retry_after_and_the_deadline():
+    response = httpx.Response(429, headers={"retry-after": "2"}, request=httpx.Request("POST", "https://api.example.com"))
+    error = anthropic.RateLimitError("rate limited", response=response, body=None)
+    resilience = Resilience()
+    config = make_config()
+    assert resilience.retry_delay(error, 0, config, "model", None) >= 2
+    assert resilience.retry_delay(error, 0, config, "model", time.monotonic() + 1) is None
+    assert resilience.retry_delay(error, config.max_retries, config, "model", None) is None
+
+
+def test_deadline_bounds_the_whole_call():
+    def attempt(options):
+        assert 0 < options["timeout"] <= 0.05
+        time.sleep(0.03)
+        raise httpx.ReadTimeout("read timed out")
+
+    with pytest.raises(DeadlineExceeded):
+        Resilience().call(attempt, make_config(deadline=0.05, max_retries=10), "model")
+
+
+def test_async_deadline_cancels_the_attempt():
+    cancelled = []
+
+    async def attempt(options):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(Resilience().call_async(attempt, make_config(deadline=0.05), "model"))
+    assert cancelled == [True]
+
+
+def test_hedge_wins_over_a_slow_attempt_and_cancels_it():
+    calls, cancelled = [], []
+
+    async def attempt(options):
+        calls.append(options)
+        if len(calls) == 1:
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(True)
+                raise
+        return f"attempt {len(calls)}"
+
+    result = asyncio.run(Resilience().call_async(attempt, make_config(hedge=True, hedge_after=0.01), "model"))
+    assert result == "attempt 2"
+    assert cancelled == [True]
+
+
+def test_no_hedge_when_the_first_attempt_is_fast():
+    calls = []
+
+    async def attempt(options):
+        calls.append(options)
+        return "ok"
+
+    assert asyncio.run(Resilience().call_async(attempt, make_config(hedge=True, hedge_after=1.0), "model")) == "ok"
+    assert len(calls) == 1
@@ -0,0 +1,72 @@
+import asyncio
+import sqlite3
+import time
+from response_cache import ResponseCache, ResponseCacheConfig, canonical_key
+
+
+def make_cache(tmp_path, **overrides):
+    return ResponseCache(ResponseCacheConfig(path=str(tmp_path / "cache.sqlite3"), flush_interval=0.01, **overrides))
+
+
+def rows(tmp_path):
+    db = sqlite3.connect(str(tmp_path / "cache.sqlite3"))
+    try:
+        return [key for key, in db.execute("SELECT key FROM responses ORDER BY key")]
+    finally:
+        db.close()
+
+
+def test_canonical_key_ignores_dict_order():
+    assert canonical_key("anthropic", {"a": 1, "b": [1, 2]}) == canonical_key("anthropic", {"b": [1, 2], "a": 1})
+    assert canonical_key("anthropic", {"a": 1}) != canonical_key("openai", {"a": 1})
+
+
+def test_memory_then_disk_hits(tmp_path):
+    cache = make_cache(tmp_path, max_memory_entries=1)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})  # pushes "a" out of memory
+    cache.flush()
+    assert cache.get("b") == {"v": 2}
+    assert cache.get("a") == {"v": 1}
+    assert asyncio.run(cache.get_async("b")) == {"v": 2}
+    assert cache.get("missing") is None
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (1, 2, 1)
+    cache.close()
+
+
+def test_expired_entries_are_misses_and_deleted(tmp_path):
+    cache = make_cache(tmp_path, ttl_seconds=0.05, max_memory_entries=0)
+    cache.set("a", {"v": 1})
+    cache.flush()
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    cache.flush()
+    assert rows(tmp_path) == []
+    cache.close()
+
+
+def test_disk_size_is_bounded_by_last_access(tmp_path):
+    cache = make_cache(tmp_path, max_memory_entries=0, max_disk_bytes=40, evict_every=1)
+    for key in ("a", "b"):
+        cache.set(key, {"v": "x" * 5})
+        cache.flush()
+        time.sleep(0.01)
+    assert cache.get("a") is not None  # "b" is now the least recently used
+    cache.flush()
+    cache.set("c", {"v": "x" * 5})
+    cache.flush()
+    assert rows(tmp_path) == ["a", "c"]
+    cache.close()
+
+
+def test_sweep_runs_every_n_inserts(tmp_path):
+    cache = make_cache(tmp_path, max_memory_entries=0, max_disk_bytes=0, evict_every=3)
+    for key in ("a", "b"):
+        cache.set(key, {"v": 1})
+    cache.flush()
+    assert rows(tmp_path) == ["a", "b"]
+    cache.set("c", {"v": 1})
+    cache.flush()
+    assert rows(tmp_path) == []
+    cache.close()
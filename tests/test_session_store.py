@@ -0,0 +1,78 @@
+import asyncio
+from session_store import SessionStore, SessionStoreConfig
+
+
+def make_store(**overrides):
+    store = SessionStore(SessionStoreConfig(**overrides))
+    evicted = []
+    store.on_evict.append(evicted.append)
+    return store, evicted
+
+
+def test_evicts_least_recently_used():
+    store, evicted = make_store(max_sessions=2)
+    store.get_or_create("a")
+    store.get_or_create("b")
+    store.get("a")
+    store.get_or_create("c")
+    assert evicted == ["b"]
+    assert store.get("b") is None
+
+
+def test_session_in_the_middle_of_a_turn_is_not_evicted():
+    async def scenario():
+        store, evicted = make_store(max_sessions=2)
+        playing = store.get_or_create("a")
+        await playing.lock.acquire()
+        store.get_or_create("b")
+        store.get_or_create("c")
+        assert evicted == ["b"]
+        assert store.get("a") is playing
+
+    asyncio.run(scenario())
+
+
+def test_new_session_survives_when_every_other_one_is_locked():
+    async def scenario():
+        store, evicted = make_store(max_sessions=1)
+        playing = store.get_or_create("a")
+        await playing.lock.acquire()
+        session = store.get_or_create("b")
+        assert evicted == []
+        assert store.get("b") is session
+        playing.lock.release()
+        store.enforce_limits()
+        assert evicted == ["a"]
+
+    asyncio.run(scenario())
+
+
+def test_idle_sessions_are_dropped_unless_locked():
+    async def scenario():
+        store, evicted = make_store(idle_timeout=60)
+        idle, playing = store.get_or_create("idle"), store.get_or_create("playing")
+        await playing.lock.acquire()
+        idle.last_access -= 120
+        playing.last_access -= 120
+        store.enforce_limits()
+        assert evicted == ["idle"]
+        assert store.stats()["idle_evictions"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_open_waits_for_on_create_work():
+    async def scenario():
+        store, _ = make_store()
+        restored = []
+
+        async def restore(session):
+            await asyncio.sleep(0.01)
+            restored.append(session.session_id)
+
+        store.on_create.append(restore)
+        sessions = await asyncio.gather(store.open("a"), store.open("a"))
+        assert sessions[0] is sessions[1]
+        assert restored == ["a"]
+
+    asyncio.run(scenario())
@@ -0,0 +1,20 @@
+import pytest
+from speculation import canonical_action
+
+
+@pytest.mark.parametrize("action", ["move north", "Go up", "walk north", "north", "move north.", "N", "head to the north"])
+def test_movement_phrasings(action):
+    assert canonical_action(action) == "move north"
+
+
+@pytest.mark.parametrize("action, canonical", [
+    ("take the gem", "pick gem"),
+    ("Grab a gem!", "pick gem"),
+    ("pick up the gem", "pick gem"),
+    ("speak with the monk", "talk monk"),
+    ("attack the goblin", "fight goblin"),
+    ("", ""),
+    ("!!!", ""),
+])
+def test_other_actions(action, canonical):
+    assert canonical_action(action) == canonical
@@ -0,0 +1,8 @@
+from core import _initial_state_request
+from story_generation import _adventure_request
+
+
+def test_generation_stages_bypass_the_response_cache():
+    # Same prompt, new content: only deterministic turns may be replayed from the cache
+    assert _adventure_request("a haunted forest")[1].use_response_cache is False
+    assert _initial_state_request({"title": "The Haunted Forest"})[1].use_response_cache is False
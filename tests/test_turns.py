@@ -0,0 +1,183 @@
+import asyncio
+from core import GameState
+from grid import Grid
+from turns import TurnRegistry, TurnRegistryConfig
+
+
+def make_registry(**overrides):
+    return TurnRegistry(TurnRegistryConfig(**{"poll_interval": 0.01, **overrides}))
+
+
+def make_state():
+    return GameState(battlemap=Grid())
+
+
+async def never_disconnected():
+    return False
+
+
+def start(registry, lock, play, action="look", seen=1, state=None):
+    with registry.waiting("s", seen, action) as turn:
+        return registry.start(turn, state or make_state(), seen + 1, lock, play)
+
+
+def test_identical_action_joins_the_running_turn():
+    async def scenario():
+        registry = make_registry()
+        lock = asyncio.Lock()
+        state = make_state()
+        await lock.acquire()
+        release = asyncio.Event()
+
+        async def play(turn):
+            await release.wait()
+            return f"played {turn.action}"
+
+        turn = start(registry, lock, play, state=state)
+        assert registry.find("s", 1, "look") is turn
+        assert registry.find("s", 1, "search") is None
+        assert registry.find("s", 3, "look") is None  # sent after the turn's step reached the page
+        assert registry.find("other", 1, "look") is None
+        waiters = [asyncio.ensure_future(registry.wait(turn, never_disconnected)) for _ in range(2)]
+        release.set()
+        assert await asyncio.gather(*waiters) == ["played look", "played look"]
+        await asyncio.sleep(0)
+        assert not lock.locked()  # the finished turn hands the session lock back
+        assert registry.running() == 0
+        assert registry.find("s", 1, "look") is None
+
+    asyncio.run(scenario())
+
+
+def test_resubmit_after_commit_joins_the_finishing_turn():
+    async def scenario():
+        registry = make_registry()
+        lock = asyncio.Lock()
+        await lock.acquire()
+        committed, release = asyncio.Event(), asyncio.Event()
+
+        async def play(turn):
+            committed.set()  # the session is at the turn's step from here on, but its result is still being pushed out
+            await release.wait()
+
+        turn = start(registry, lock, play)
+        await committed.wait()
+        assert registry.find("s", 2, "look") is turn
+        release.set()
+        await asyncio.wait({turn.task})
+        await asyncio.sleep(0)
+        assert registry.find("s", 2, "look") is None
+
+    asyncio.run(scenario())
+
+
+def test_identical_actions_queued_behind_a_turn_share_one():
+    async def scenario():
+        registry = make_registry()
+        lock = asyncio.Lock()
+        await lock.acquire()
+        release = asyncio.Event()
+        played = []
+
+        async def play(turn):
+            played.append(turn.action)
+            await release.wait()
+            return turn.action
+
+        running = start(registry, lock, play, action="look")
+
+        async def submit(action):
+            # What the /action handler does: join an identical turn, or queue for the lock and start one
+            turn = registry.find("s", 1, action)
+            if turn is not None:
+                return await registry.wait(await registry.joined(turn), never_disconnected)
+            with registry.waiting("s", 1, action) as turn:
+                await lock.acquire()
+                registry.start(turn, make_state(), 3, lock, play)
+            return await registry.wait(turn, never_disconnected)
+
+        first = asyncio.ensure_future(submit("dance"))
+        await asyncio.sleep(0)
+        second = asyncio.ensure_future(submit("dance"))
+        await asyncio.sleep(0)
+        assert registry.stats()["waiting"] == 1
+        release.set()
+        assert await asyncio.gather(first, second) == ["dance", "dance"]
+        assert await registry.wait(running, never_disconnected) == "look"
+        assert played == ["look", "dance"]
+
+    asyncio.run(scenario())
+
+
+def test_queued_action_that_never_starts_fails_its_joiners():
+    async def scenario():
+        registry = make_registry()
+        with registry.waiting("s", 1, "look") as turn:
+            assert registry.find("s", 1, "look") is turn
+        assert await registry.joined(turn) is None
+        with registry.waiting("s", 1, "look") as turn:
+            registry.settle(turn, "Game has not been initialized.")
+        assert await registry.joined(turn) == "Game has not been initialized."
+        assert registry.find("s", 1, "look") is None
+
+    asyncio.run(scenario())
+
+
+def test_admit_limits_waiting_actions():
+    async def scenario():
+        registry = make_registry(max_queued=1)
+        assert registry.admit("s")
+        with registry.waiting("s", 1, "look"):
+            assert not registry.admit("s")
+            assert registry.admit("other")
+        assert registry.admit("s")
+        assert registry.stats()["waiting"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_last_waiter_leaving_cancels_the_turn():
+    async def scenario():
+        registry = make_registry()
+        lock = asyncio.Lock()
+        await lock.acquire()
+        turn = start(registry, lock, lambda turn: asyncio.sleep(60))
+
+        async def disconnected():
+            return True
+
+        assert await registry.wait(turn, disconnected) is None
+        await asyncio.wait({turn.task})
+        assert turn.task.cancelled()
+        assert not lock.locked()
+
+    asyncio.run(scenario())
+
+
+def test_cancel_stops_a_sessions_turns():
+    async def scenario():
+        registry = make_registry()
+        lock = asyncio.Lock()
+        await lock.acquire()
+        turn = start(registry, lock, lambda turn: asyncio.sleep(60))
+        assert registry.cancel("other") == 0
+        assert registry.cancel("s") == 1
+        assert await registry.wait(turn, never_disconnected) is None
+        assert not lock.locked()
+
+    asyncio.run(scenario())
+
+
+def test_failed_turn_waits_to_none():
+    async def scenario():
+        registry = make_registry()
+        lock = asyncio.Lock()
+        await lock.acquire()
+
+        async def play(turn):
+            raise RuntimeError("model error")
+
+        turn = start(registry, lock, play)
+        assert await registry.wait(turn, never_disconnected) is None
+
+    asyncio.run(scenario())
@@ -0,0 +1,191 @@
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+from pydantic import BaseModel
+from config import config_from_env
+from core import GameState
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Turn:
+    """One /action of a session, from the moment it queues for the session lock until its model turn ends.
+
+    Every identical /action that arrives meanwhile shares it. `seen` is the step the session was at when the action
+    arrived; `state` and `step` are only known once it holds the lock, and `outcome` resolves then: to the Turn itself
+    when it starts a model turn, to the response when it was settled without one, or to None when it failed.
+    """
+
+    def __init__(self, session_id: str, action: str, seen: int):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.action = action
+        self.seen = seen
+        self.state: Optional[GameState] = None  # the state it is played from
+        self.step: Optional[int] = None  # the step it plays
+        self.task: Optional[asyncio.Task] = None
+        self.outcome: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.cancelled = False
+        self.waiters = 0
+        self.started = time.monotonic()
+
+    def live(self) -> bool:
+        return not self.cancelled and (self.task is None or not self.task.done())
+
+    def cancel(self):
+        self.cancelled = True
+        if self.task is not None:
+            self.task.cancel()
+        elif not self.outcome.done():
+            self.outcome.set_result(None)
+
+
+class TurnRegistryConfig(BaseModel):
+    max_queued: int = 2  # other actions a session may have waiting behind its current turn before new ones are refused
+    orphan_grace: float = 15.0  # seconds a streamed turn keeps running with no /events client, longer than a reconnect
+    poll_interval: float = 0.5  # how often waiting requests check for a client disconnect
+
+    @classmethod
+    def from_env(cls) -> "TurnRegistryConfig":
+        return config_from_env(cls, "TURNS")
+
+
+class TurnRegistry:
+    """Single-flight model turns per session.
+
+    The /action handler that starts a turn hands the session lock over to it and the turn releases it when it ends,
+    so queued actions run strictly after it. An identical action joins a queued or running turn instead of paying
+    for a second completion, as long as it was sent from a step between the one the turn was sent from and the one
+    it plays: its result has not reached the client yet, even after it was committed and while it is still being
+    pushed out, so the repeat is a resubmission, not a second move. Cancelling a turn's task cancels its model request, which closes the HTTP
+    connection; that happens on /restart, on eviction, when every request waiting on a turn has disconnected, and
+    when a streamed turn has had no /events client for `orphan_grace` seconds.
+    """
+
+    def __init__(self, config: Optional[TurnRegistryConfig] = None):
+        self.config = config or TurnRegistryConfig.from_env()
+        self._turns: Dict[str, List[Turn]] = {}
+        self._waiting: Dict[str, List[Turn]] = {}
+        self.outcomes = metrics.turn_requests
+
+    def find(self, session_id: str, seen: int, action: str) -> Optional[Turn]:
+        # A queued or running turn that an identical action sent from step `seen` should join
+        for turn in (*self._turns.get(session_id, ()), *self._waiting.get(session_id, ())):
+            if turn.action == action and turn.live() and turn.seen <= seen and (turn.step is None or seen <= turn.step):
+                self.outcomes.inc("joined")
+                return turn
+        return None
+
+    def admit(self, session_id: str) -> bool:
+        # Whether another action may queue for the session lock
+        if len(self._waiting.get(session_id, ())) >= self.config.max_queued:
+            self.outcomes.inc("rejected")
+            return False
+        return True
+
+    @contextmanager
+    def waiting(self, session_id: str, seen: int, action: str):
+        # Registers the action while it waits for the session lock and the handler decides what it is;
+        # it fails for its joiners if the handler leaves without starting or settling it
+        turn = Turn(session_id, action, seen)
+        self._waiting.setdefault(session_id, []).append(turn)
+        try:
+            yield turn
+        finally:
+            self._waiting[session_id].remove(turn)
+            if not self._waiting[session_id]:
+                del self._waiting[session_id]
+            if not turn.outcome.done():
+                turn.outcome.set_result(None)
+
+    def settle(self, turn: Turn, response: Any):
+        # The action was answered without a model turn (local move, speculation hit or an error message)
+        if not turn.outcome.done():
+            turn.outcome.set_result(response)
+
+    def start(self, turn: Turn, state: GameState, step: int, lock: asyncio.Lock, play: Callable[[Turn], Awaitable[Any]]) -> Turn:
+        # The caller holds `lock`; from here on the turn owns it
+        session_id = turn.session_id
+        turn.state = state
+        turn.step = step
+        turn.task = asyncio.create_task(play(turn))
+        self._turns.setdefault(session_id, []).append(turn)
+        if not turn.outcome.done():
+            turn.outcome.set_result(turn)
+        self.outcomes.inc("started")
+
+        def finished(task: asyncio.Task):
+            lock.release()
+            turns = self._turns.get(session_id, [])
+            if turn in turns:
+                turns.remove(turn)
+            if not turns:
+                self._turns.pop(session_id, None)
+
+        turn.task.add_done_callback(finished)
+        return turn
+
+    async def joined(self, turn: Turn) -> Any:
+        # What a joined action resolved to; see Turn.outcome
+        return await asyncio.shield(turn.outcome)
+
+    async def wait(self, turn: Turn, disconnected: Callable[[], Awaitable[bool]]) -> Any:
+        # The turn's result, or None when it failed, was cancelled or this client went away.
+        # The last waiter to leave cancels the turn: nobody would see its result.
+        turn.waiters += 1
+        try:
+            while True:
+                done, _ = await asyncio.wait({turn.task}, timeout=self.config.poll_interval)
+                if done:
+                    return None if turn.task.cancelled() or turn.task.exception() is not None else turn.task.result()
+                if await disconnected():
+                    return None
+        finally:
+            turn.waiters -= 1
+            if turn.waiters == 0 and not turn.task.done():
+                turn.cancel()
+                self.outcomes.inc("abandoned")
+                logger.info(f"Cancelled turn {turn.id}: its client disconnected")
+
+    async def watch(self, turn: Turn, connected: Callable[[], bool]):
+        # Runs alongside a streamed turn and cancels it once no client has been listening for `orphan_grace`
+        alone_since = None
+        while not turn.task.done():
+            await asyncio.sleep(self.config.poll_interval)
+            if connected():
+                alone_since = None
+            elif alone_since is None:
+                alone_since = time.monotonic()
+            elif time.monotonic() - alone_since >= self.config.orphan_grace:
+                turn.cancel()
+                self.outcomes.inc("orphaned")
+                logger.info(f"Cancelled turn {turn.id}: no client connected for {self.config.orphan_grace}s")
+                return
+
+    def cancel(self, session_id: str) -> int:
+        cancelled = 0
+        for turn in self._turns.get(session_id, ()):
+            if not turn.task.done():
+                turn.cancel()
+                cancelled += 1
+        if cancelled:
+            self.outcomes.inc("cancelled", amount=cancelled)
+        return cancelled
+
+    async def stop(self):
+        for session_id in list(self._turns):
+            self.cancel(session_id)
+
+    def running(self) -> int:
+        return sum(len(turns) for turns in self._turns.values())
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "running": self.running(),
+            "waiting": sum(len(turns) for turns in self._waiting.values()),
+            **{outcome: self.outcomes.value(outcome) for outcome in ("started", "joined", "rejected", "cancelled", "abandoned", "orphaned")},
+        }